@@ -0,0 +1,106 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+import warnings
+warnings.filterwarnings("ignore")
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import logic.planner as planner
+import logic.project as project
+import logic.profiling as profiling
+import logic.solution as solution
+
+GEOM_SUFFIX = '.geom.txt'
+EXCT_SUFFIX = '.exct.txt'
+SUMMARY_FILE = 'summary.json'
+
+def find_cases(directory, exct_file = None):
+    # every geometry of the directory with the excitation of the same name, 
+    # else exct_file, else the default excitation of the application
+    cases = []
+    for geom_file in sorted(glob.glob(os.path.join(directory, '*' + GEOM_SUFFIX))):
+        name = os.path.basename(geom_file)[:-len(GEOM_SUFFIX)]
+        pair = os.path.join(directory, name + EXCT_SUFFIX)
+        cases.append((name, geom_file, pair if os.path.exists(pair) else exct_file))
+    return cases
+
+def run_case(name, geom_file, exct_file, out, profile = False, memory_limit = None):
+    # solves one case and writes <out>/<name>.json, errors are reported in the file instead of raised;
+    # the fastest strategy within memory_limit (bytes, None for the available memory) is used, 
+    # a case that may not fit is solved with the leanest one and a warning;
+    # profile adds the time, CPU time, peak memory and sizes of the solver stages
+    start = time.perf_counter()
+    report = {'case': name, 'geometry': geom_file, 'excitation': exct_file}
+    try:
+        with (profiling.record() if profile else contextlib.nullcontext()) as recorded:
+            (geom, exct, inductances) = project.loadCase(geom_file, exct_file)
+            # cases already run in parallel, a case does not start its own pool
+            strategy = planner.plan(geom, exct, memory_limit, workers=1, envelope=True)
+            report['plan'] = strategy.asdict()
+            if not strategy.fits:
+                report['warning'] = 'the solve may run out of memory, it needs about %.1f MB' % (strategy.memory_bytes/2**20)
+            envelope = solution.solveEnvelope(geom, exct, **strategy.options)
+        # the signed peak is the extreme of larger magnitude
+        peak = np.where(np.abs(envelope.Fmax) >= np.abs(envelope.Fmin), envelope.Fmax, envelope.Fmin)
+        report.update({
+            'status': 'ok',
+            'phases': int(geom.getCircuitPhaseCount()),
+            'inductances': {'L': inductances.L.tolist(), 'M': inductances.M.tolist()},
+            'peak_forces': {'phase': envelope.N.tolist(), 'Fx': peak[0].tolist(), 'Fy': peak[1].tolist(), 'Fz': peak[2].tolist()},
+            'force_envelope': {'max': envelope.Fmax.tolist(), 't_max': envelope.tFmax.tolist(), 'min': envelope.Fmin.tolist(), 
+                               't_min': envelope.tFmin.tolist(), 'rms': envelope.Frms.tolist(), 'impulse': envelope.Fimpulse.tolist()},
+            'peak_fields': {'B': envelope.B.tolist(), 't': envelope.tB.tolist()}
+        })
+        if profile:
+            report['profile'] = [s.asdict() for s in recorded.stages]
+    except (Exception, SystemExit) as error:
+        report.update({'status': 'error', 'error': ('%s: %s' % (type(error).__name__, error)).strip()})
+    report['seconds'] = time.perf_counter() - start
+    with open(os.path.join(out, name + '.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    return report
+
+def run(directory, out, workers = 1, exct_file = None, profile = False, memory_limit = None):
+    # runs all cases of the directory, in a process pool with workers > 1, and writes the summary;
+    # memory_limit (bytes) is shared by the cases running at once, None shares the available memory
+    os.makedirs(out, exist_ok=True)
+    cases = find_cases(directory, exct_file)
+    workers = max(min(workers, len(cases)), 1)
+    memory_limit = planner.available_memory() if memory_limit is None else memory_limit
+    memory_limit = None if memory_limit is None else memory_limit//workers
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_case, *case, out, profile, memory_limit) for case in cases]
+            reports = [future.result() for future in futures]
+    else:
+        reports = [run_case(*case, out, profile, memory_limit) for case in cases]
+    summary = [{k: r[k] for k in ('case', 'status', 'seconds', 'warning', 'error') if k in r} for r in reports]
+    with open(os.path.join(out, SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f, indent=1)
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description='Solves every *.geom.txt (with its *.exct.txt) of a directory and writes peak forces, peak fields and inductances as JSON.')
+    parser.add_argument('directory', help='directory of the project files, e.g. data')
+    parser.add_argument('--out', default='results', help='output directory (default: results)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='cases solved in parallel (default: CPU count)')
+    parser.add_argument('--exct', default=None, help='excitation of the geometries without their own *.exct.txt (default: application defaults)')
+    parser.add_argument('--profile', action='store_true', help='add the time and memory of the solver stages to every case')
+    parser.add_argument('--memory', type=float, default=None, help='memory shared by the running cases in MB, each solve uses the fastest strategy within its share (default: available memory)')
+    args = parser.parse_args()
+    
+    memory_limit = None if args.memory is None else int(args.memory*2**20)
+    reports = run(args.directory, args.out, args.workers, args.exct, args.profile, memory_limit)
+    for r in reports:
+        print('%-24s %-6s %6.2f s %-8s %s' % (r['case'], r['status'], r['seconds'], r.get('plan', {}).get('strategy', ''), r.get('error', r.get('warning', ''))))
+    failed = sum(r['status'] != 'ok' for r in reports)
+    print('%d cases, %d failed, results in %s' % (len(reports), failed, args.out))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,204 @@
+import argparse
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import warnings
+warnings.filterwarnings("ignore")
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import logic.geometry as geometry
+import logic.excitation as excitation
+import logic.project as project
+import logic.solution as solution
+from logic.cache import KernelCache
+
+try:
+    import resource
+except ImportError:     # not on Windows, peak RSS is then not reported
+    resource = None
+
+KERNELS = ('neumann3d', 'biotsavart3d', 'ampere3d')
+SOURCES = ('rlc', 'gen')
+# synthetic families: one size varies, the others stay at the base (segments per phase, field points, time steps)
+BASE = {'segments': 30, 'points': 30, 'steps': 201}
+FAMILIES = {'segments': [10, 30, 100, 300, 1000], 'points': [10, 100, 1000, 10000], 'steps': [101, 1001, 10001, 100001]}
+QUICK_FAMILIES = {'segments': [10, 30, 100], 'points': [10, 100, 1000], 'steps': [101, 1001]}
+DATA_STEPS = 201
+REGRESSION_RATIO = 1.2  # slower than the baseline by more than this is reported
+REGRESSION_SECONDS = 0.005  # shorter runs are timer noise, not counted as regressions
+
+def syntheticGeometry(segments, points, phases = 3):
+    # phases parallel staircases of axis-aligned segments (steps along Y and Z, one phase every 0.1 along X),
+    # a force mask over the inner segments of each phase, the field points on a line below them
+    conductors = []
+    for k in range(phases):
+        steps = np.arange(segments + 1)
+        Y = 0.05*((steps + 1)//2)
+        Z = 0.05*(steps//2)
+        conductors.append(geometry.Conductor([0.1*k]*(segments + 1), Y, Z, k, [[0] + [1]*(segments - 2) + [0]], 0.02))
+    t = np.linspace(0, 1, points)
+    field_points = geometry.WayPoints(0.1*(phases - 1)*t, 0.05*segments/2*t, -0.1 + 0*t)
+    return geometry.fromConductorsWP(conductors, field_points)
+
+def pairCount(geom, kernel):
+    # segment pairs (or field point x segment pairs) evaluated by a kernel
+    S = geom.XS.size
+    if kernel == 'neumann3d':
+        return S*S
+    if kernel == 'biotsavart3d':
+        return geom.X.size*S
+    return int(np.count_nonzero(np.any(geom.NF != 0, axis=0)))*S
+
+def _peak_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss*1024
+
+def _unit_currents(geom, exct):
+    # the source current on every branch, the kernel costs do not depend on the current split
+    current = exct.current if exct.current.ndim > 1 else exct.current[np.newaxis,:]
+    exct.I = current[np.arange(geom.getCircuitPhaseCount()) % current.shape[0]]
+
+def _build(case):
+    if case['suite'] == 'data':
+        exct = project.ExcitationProject()
+        exct.init()
+        exct.load('')
+        exct.discret_var.set(str(case['steps']))
+        exct.excitation_type_var.set(exct.SRC_TYPE_GEN if case['source'] == 'gen' else exct.SRC_TYPE_RLC)
+        geom_project = project.GeometryProject()
+        geom_project.init()
+        geom_project.load(case['file'])
+        geom_project.schema = exct.geometry_schema()
+        return ( geom_project.build(), exct.build_excitation() )
+    geom = syntheticGeometry(case['segments'], case['points'])
+    return ( geom, excitation.build(20.0, case['steps'], 80.0, source_type=case['source']) )
+
+def _timed(run, cache):
+    start = time.perf_counter()
+    run(cache)
+    return time.perf_counter() - start
+
+def _run_kernel(case, kernel, options, repeat = 1):
+    # one kernel of one case in a fresh process: cold runs (kernel and time-domain step, the fastest of repeat),
+    # warm run (time-domain step with the cached kernel), the pair evaluations are credited to the difference
+    (geom, exct) = _build(case)
+    if kernel == 'neumann3d':
+        run = lambda cache: solution.evalBranchCurrents(geom, exct, cache=cache, **options)
+    else:
+        _unit_currents(geom, exct)
+        stage = solution.biotsavart3d if kernel == 'biotsavart3d' else solution.ampere3d
+        run = lambda cache: stage(geom, exct, cache=cache, **options)
+    rss_base = _peak_rss()
+    cache = KernelCache()
+    cold = min([_timed(run, KernelCache()) for i in range(repeat - 1)] + [_timed(run, cache)])
+    rss_peak = _peak_rss()
+    warm = _timed(run, cache)
+    pairs = pairCount(geom, kernel)
+    kernel_seconds = cold - warm if cold > warm else cold
+    return {'seconds': cold, 'apply_seconds': warm, 'pairs': pairs, 'pairs_per_s': pairs/kernel_seconds if kernel_seconds > 0 else None,
+            'rss_base': rss_base, 'rss_peak': rss_peak,
+            'sizes': {'S': int(geom.XS.size), 'P': int(geom.getCircuitPhaseCount()), 'T': int(exct.current.shape[-1]),
+                      'masks': int(geom.NF.shape[0]), 'points': int(geom.X.size)}}
+
+def cases(suites, data_dir, quick = False):
+    found = []
+    if 'data' in suites:
+        for file in sorted(glob.glob(os.path.join(data_dir, '*.geom.txt'))):
+            name = os.path.basename(file)[:-len('.geom.txt')]
+            found += [{'suite': 'data', 'name': name, 'source': s, 'file': file, 'steps': DATA_STEPS} for s in SOURCES]
+    if 'scaling' in suites:
+        for (family, sizes) in (QUICK_FAMILIES if quick else FAMILIES).items():
+            for size in sizes:
+                case = dict(BASE, **{family: size})
+                found += [dict(case, suite='scaling', name='%s=%d' % (family, size), source=s) for s in SOURCES]
+    return found
+
+def run(found, options, repeat = 1, log = print):
+    # every kernel of every case in its own spawned process, so the peak RSS and the caches are its own
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in found:
+        kernels = {}
+        for kernel in KERNELS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    kernels[kernel] = pool.submit(_run_kernel, case, kernel, options, repeat).result()
+                except (Exception, SystemExit) as error:
+                    kernels[kernel] = {'error': ('%s: %s' % (type(error).__name__, error)).strip()}
+        result = {k: v for k, v in case.items() if k in ('suite', 'name', 'source')}
+        result['kernels'] = kernels
+        results.append(result)
+        log(_format(result))
+    return results
+
+def _format(result):
+    cells = []
+    for kernel in KERNELS:
+        r = result['kernels'][kernel]
+        if 'error' in r:
+            cells.append('%s: %s' % (kernel, r['error']))
+            continue
+        rate = '%8.2e' % r['pairs_per_s'] if r['pairs_per_s'] else '       -'
+        rss = '%6.0f MB' % (r['rss_peak']/2**20) if r['rss_peak'] else '     -'
+        cells.append('%s %8.4f s %s pairs/s %s' % (kernel, r['seconds'], rate, rss))
+    return '%-8s %-22s %-4s %s' % (result['suite'], result['name'], result['source'], ' | '.join(cells))
+
+def compare(results, baseline, ratio = REGRESSION_RATIO, log = print):
+    # per kernel time ratios against a saved run, returns the number of regressions
+    base = {(r['suite'], r['name'], r['source']): r['kernels'] for r in baseline['results']}
+    regressions = 0
+    for result in results:
+        kernels = base.get((result['suite'], result['name'], result['source']))
+        if kernels is None:
+            continue
+        cells = []
+        for kernel in KERNELS:
+            (new, old) = (result['kernels'][kernel], kernels.get(kernel, {}))
+            if 'seconds' not in new or 'seconds' not in old:
+                continue
+            r = new['seconds']/old['seconds'] if old['seconds'] > 0 else 1.0
+            slower = r > ratio and new['seconds'] > REGRESSION_SECONDS
+            regressions += slower
+            cells.append('%s x%.2f%s' % (kernel, r, ' SLOWER' if slower else ''))
+        log('%-8s %-22s %-4s %s' % (result['suite'], result['name'], result['source'], ' | '.join(cells)))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the Neumann, Biot-Savart and Ampere kernels over the data files and synthetic scaling families.')
+    parser.add_argument('--suite', choices=['data', 'scaling', 'all'], default='all')
+    parser.add_argument('--data', default='data', help='directory of the *.geom.txt files (default: data)')
+    parser.add_argument('--quick', action='store_true', help='smaller scaling families')
+    parser.add_argument('--backend', default=None, help='numpy or numba (default: SOLUTION_BACKEND or numpy)')
+    parser.add_argument('--workers', type=int, default=None, help='kernel worker processes')
+    parser.add_argument('--max-bytes', type=int, default=None, help='working memory bound of the kernels')
+    parser.add_argument('--repeat', type=int, default=3, help='cold runs per kernel, the fastest counts (default: 3)')
+    parser.add_argument('--save', default=None, help='write the results to this JSON file (a baseline)')
+    parser.add_argument('--compare', default=None, help='JSON file of a previous run to compare with')
+    parser.add_argument('--ratio', type=float, default=REGRESSION_RATIO, help='time ratio reported as a regression (default: %.1f)' % REGRESSION_RATIO)
+    args = parser.parse_args()
+    
+    suites = ('data', 'scaling') if args.suite == 'all' else (args.suite,)
+    options = {'backend': args.backend, 'workers': args.workers, 'max_bytes': args.max_bytes}
+    results = run(cases(suites, args.data, args.quick), options, args.repeat)
+    if args.save:
+        meta = {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                'numpy': np.__version__, 'machine': platform.platform(), 'cpus': os.cpu_count(), 'options': options, 'repeat': args.repeat}
+        with open(args.save, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.ratio)
+        print('%d regressions' % regressions)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
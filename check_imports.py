@@ -0,0 +1,55 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# the numeric core, importable with NumPy only
+CORE_MODULES = ('logic.geometry', 'logic.excitation', 'logic.solution', 'logic.project')
+# loaded on first use only: plotting, GUI, special functions, compiled kernels, process pools
+LAZY_MODULES = ('matplotlib', 'tkinter', 'mpmath', 'numba', 'concurrent.futures', 'multiprocessing')
+BUDGET_MS = 60  # import time of the core on top of NumPy, per cold start
+
+def measure():
+    # (NumPy ms, core ms, lazy modules loaded) of one cold interpreter
+    code = 'import sys, numpy; import %s; print(",".join(m for m in %r if m in sys.modules))' % (', '.join(CORE_MODULES), LAZY_MODULES)
+    run = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    if run.returncode != 0:
+        raise SystemExit(run.stderr)
+    numpy_us = 0
+    core_us = 0
+    for line in run.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        (self_us, cumulative_us, name) = line[len('import time:'):].split('|')
+        if not cumulative_us.strip().isdigit():
+            continue
+        # top level entries only, the cumulative time includes their dependencies
+        if name.rstrip() == ' numpy':
+            numpy_us += int(cumulative_us)
+        elif name.rstrip() in [ ' ' + m for m in CORE_MODULES ]:
+            core_us += int(cumulative_us)
+    return ( numpy_us/1000, core_us/1000, [m for m in run.stdout.strip().split(',') if m] )
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks that the numeric core imports with NumPy only and within an import time budget.')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='milliseconds allowed for the core on top of NumPy (default: %d)' % BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=5, help='cold starts measured, the fastest counts (default: 5)')
+    args = parser.parse_args()
+    
+    runs = [ measure() for i in range(args.repeat) ]
+    ( numpy_ms, core_ms, loaded ) = min(runs, key=lambda r: r[1])
+    print('numpy %6.1f ms, core %6.1f ms (budget %.0f ms)' % (numpy_ms, core_ms, args.budget))
+    failed = False
+    if loaded:
+        print('FAIL: the core imports %s' % ', '.join(loaded))
+        failed = True
+    if core_ms > args.budget:
+        print('FAIL: the core import exceeds the budget')
+        failed = True
+    if not failed:
+        print('OK')
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TIMEOUT_S = 120  # a hung solve fails instead of blocking the check
+
+# regression checks of the solver, each runs in a fresh interpreter and fails with a message
+CHECKS = {}
+
+def check(function):
+    CHECKS[function.__name__[len('check_'):]] = function
+    return function
+
+def run_python(code, timeout = TIMEOUT_S):
+    # (return code, output) of code run in a fresh interpreter from the repository root, -1 on timeout
+    try:
+        run = subprocess.run([sys.executable, '-c', textwrap.dedent(code)], capture_output=True, text=True, cwd=ROOT, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return ( -1, 'timed out after %d s' % timeout )
+    return ( run.returncode, run.stdout + run.stderr )
+
+def sample_case():
+    return sorted(glob.glob(os.path.join(ROOT, 'data', '*.geom.txt')))[0]
+
+@check
+def check_parallel_after_numba():
+    # a process pool started after the numba kernels ran must not hang the interpreter at exit
+    if importlib.util.find_spec('numba') is None:
+        return 'skipped, numba is not installed'
+    (code, output) = run_python('''
+        import logic.project as project, logic.solution as solution
+        (geom, exct, _) = project.loadCase(%r)
+        solution.solve(geom, exct, cache=None, backend="numba")
+        solution.solve(geom, exct, cache=None, workers=2)
+    ''' % sample_case())
+    assert code == 0, 'numba then parallel solve: ' + output
+
+@check
+def check_parallel_cancel():
+    # a parallel solve cancelled from its progress callback returns without evaluating the queued tiles
+    (code, output) = run_python('''
+        import time, benchmark, logic.excitation as excitation, logic.parallel as parallel, logic.solution as solution
+        geom = benchmark.syntheticGeometry(1000, 30)
+        exct = excitation.build(20.0, 11, 80.0, source_type='rlc')
+        benchmark._unit_currents(geom, exct)
+        start = time.perf_counter()
+        solution.solve(geom, exct, cache=None, workers=2, max_bytes=2**20)
+        full = time.perf_counter() - start
+        def progress(fraction):
+            # first tile of the forces, the larger kernel
+            if fraction > 0.5:
+                raise parallel.Cancelled()
+        start = time.perf_counter()
+        try:
+            solution.solve(geom, exct, cache=None, workers=2, max_bytes=2**20, progress=progress)
+        except parallel.Cancelled:
+            pass
+        print(full, time.perf_counter() - start)
+    ''')
+    assert code == 0, output
+    (full, cancelled) = map(float, output.split()[-2:])
+    assert cancelled < full/2, 'cancelled solve took %.2f s, the full solve %.2f s' % (cancelled, full)
+    return 'cancelled in %.2f s, full solve %.2f s' % (cancelled, full)
+
+@check
+def check_missing_project_files():
+    # a missing geometry or explicit excitation file is an error, not the sample project of the GUI
+    (code, output) = run_python('''
+        import json, os, tempfile, batch, logic.project as project
+        for files in [('missing.geom.txt',), (%r, 'missing.exct.txt')]:
+            try:
+                project.loadCase(*files)
+                print('loaded', files)
+            except FileNotFoundError:
+                pass
+        out = tempfile.mkdtemp()
+        report = batch.run_case('missing', 'missing.geom.txt', None, out)
+        print(report['status'], report['error'])
+    ''' % sample_case())
+    assert code == 0, output
+    assert 'loaded' not in output, output
+    assert output.startswith('error FileNotFoundError'), output
+
+@check
+def check_parallel_branch_swap():
+    # two return branches, mirror images of each other across the middle of the source conductor: swapping 
+    # them must swap their currents, and since the swapped geometry is the mirror image of the original one 
+    # the currents must not change either (the collinear terms of the Neumann kernel are one-sided)
+    (code, output) = run_python('''
+        import numpy as np, logic.geometry as geometry, logic.solution as solution, logic.excitation as excitation
+        def currents(near, far):
+            conductors = [geometry.Conductor([0, 2], [0, 0], [0, 0], 0, R=0.01),
+                          geometry.Conductor(near, [0.1, 0.1], [0, 0], 1, R=0.01),
+                          geometry.Conductor(far, [0.1, 0.1], [0, 0], 2, R=0.01)]
+            geom = geometry.fromConductorsWP(conductors, geometry.WayPoints([1], [0.05], [0]))
+            exct = excitation.build(20.0, 11, 80.0, source_type='rlc')
+            solution.evalBranchCurrents(geom, exct, cache=None)
+            return exct.K[:,0]
+        K = currents([0, 0.9], [1.1, 2])
+        swapped = currents([1.1, 2], [0, 0.9])
+        print(max(np.max(np.abs(swapped - K[[0, 2, 1]])), np.max(np.abs(swapped - K))), K)
+    ''')
+    assert code == 0, output
+    assert float(output.split()[0]) < 1e-12, 'branch currents depend on the branch order: ' + output
+
+@check
+def check_cache_in_place_edit():
+    # a conductor moved by editing the arrays of the solved geometry in place must update the cached kernels 
+    # from the state stored with them, not from the edited arrays
+    (code, output) = run_python('''
+        import numpy as np, logic.geometry as geometry, logic.solution as solution, logic.excitation as excitation
+        from logic.cache import KernelCache
+        conductors = [geometry.Conductor([0.1*c, 0.1*c, 0.1*c + 0.5], [0.0, 1.0, 1.0], [0.0, 0.0, 0.0], c % 3, [[1, 1]] if c < 2 else None, R=0.01) 
+                      for c in range(12)]
+        geom = geometry.fromConductorsWP(conductors, geometry.WayPoints([0.3, 0.6], [0.5, 0.5], [0.1, 0.1]))
+        exct = excitation.build(20.0, 11, 80.0, source_type='rlc')
+        cache = KernelCache()
+        solution.evalBranchCurrents(geom, exct, cache=cache)
+        solution.solve(geom, exct, cache=cache)
+        s = geom.NC == 7
+        for A in (geom.XS, geom.XE):
+            A[s] += 0.013
+        cached = solution.solve(geom, exct, cache=cache)
+        fresh = solution.solve(geom, exct, cache=None)
+        relative = lambda A, B: np.max(np.abs(A - B))/np.max(np.abs(B))
+        error = max(relative(solution.neumann3d(geom, exct, cache=cache).M, solution.neumann3d(geom, exct, cache=None).M), 
+                    relative(cached.fields.Bmag, fresh.fields.Bmag), relative(cached.forces.Fx, fresh.forces.Fx))
+        size = lambda value: value.nbytes if isinstance(value, np.ndarray) else sum(size(v) for v in value)
+        kernels = sum(size(value) for (value, _) in cache.entries.values())
+        print(error, cache.nbytes > kernels)
+    ''')
+    assert code == 0, output
+    [error, counted] = output.split()
+    assert float(error) < 1e-9, 'cached kernels of the edited geometry differ: ' + output
+    assert counted == 'True', 'cached states are not counted in the cache size: ' + output
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the regression checks of the solver.')
+    parser.add_argument('names', nargs='*', help='checks to run (default: all of %s)' % ', '.join(CHECKS))
+    args = parser.parse_args()
+    
+    failed = 0
+    for name in args.names or CHECKS:
+        try:
+            note = CHECKS[name]()
+            print('%-28s ok %s' % (name, note or ''))
+        except AssertionError as error:
+            print('%-28s FAIL: %s' % (name, error))
+            failed += 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
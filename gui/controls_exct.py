@@ -1,50 +1,40 @@
-from tkinter import Frame, Label, Entry, Button, StringVar, BooleanVar, OptionMenu, Checkbutton
+from tkinter import Frame, Label, Entry, Button, StringVar, BooleanVar, OptionMenu, Checkbutton, messagebox
 from tkinter import ttk
 import tkinter as tk
 from typing import Final
-import os.path
+import copy
+import queue
+import threading
 
 import matplotlib.pyplot as plt
-import logic.excitation as excitation
 import logic.presentation as presentation
 import logic.solution as solution
-from utils.formats import str_to_flt, str_to_int, float_input_validate, positive_int_input_validate, nonneg_float_input_validate, flt_arr_to_str
+import logic.parallel as parallel
+import logic.planner as planner
+from logic.project import ExcitationProject
+from gui.pipeline import Pipeline
+from utils.formats import float_input_validate, positive_int_input_validate, nonneg_float_input_validate, flt_arr_to_str
 
-class ControlExctPanel(Frame):
-        
-    DURATION_VAR_NAME       : Final = 'Duration'
-    DISCRET_VAR_NAME        : Final = 'Discret'
-    CURRENT_VAR_NAME        : Final = 'Current'
-    FREQ_VAR_NAME           : Final = 'Frequency'
-    ALPHA_VAR_NAME          : Final = 'Alpha'
-    CURRENT_TYPE_VAR_NAME   : Final = 'Current_value_type'
-    EXCT_TYPE_VAR_NAME      : Final = 'Source_type'
-    K_OVERRIDE_VAL_VAR_NAME : Final = 'K_value_override'
-    K_OVERRIDE_VAR_NAME     : Final = 'K_override'
-    SCHEMA_VAR_NAME         : Final = 'Schema'
-        
-    MAX_FORCE_PER_PHASE : Final[int] = 6    
-    
-    CUR_TYPE_RMS : Final = "RMS"
-    CUR_TYPE_PEAK : Final = "Peak"
+class ControlExctPanel(Frame, ExcitationProject):
     
-    SCHEMA_A_BC : Final = "A(BC)"
-    SCHEMA_B_AC : Final = "B(AC)"
-    SCHEMA_C_AB : Final = "C(AB)"
-    
-    SRC_TYPE_RLC : Final = "RLC 1Ph Circuit"
-    SRC_TYPE_GEN : Final = "3ph Generator"
+    SOLVE_POLL_MS : Final[int] = 50
     
     def __init__(self, master, app, update_plot_callback):
         super().__init__(master)
         self.app = app        
         self.update_plot_callback = update_plot_callback
         
+        # background solve: cancel event of the running solve and messages of its worker thread
+        self.solve_cancel = None
+        self.solve_queue = queue.Queue()
+        
         self.init()
         self.load()                
         self.create()
         self.update()
-        self.app.control_geom_panel.schema = "ABC" if self.excitation_type_var.get() == self.SRC_TYPE_GEN else self.schema_var.get()   
+        # excitation edits rebuild the excitation, geometry and schema edits only the branch currents
+        self.pipeline = Pipeline(self, [('excitation', self.update_excitation), ('currents', self.update_currents), ('plot', self.draw_excitation)])
+        self.app.control_geom_panel.schema = self.geometry_schema()
         
 
     def create(self):
@@ -59,6 +49,8 @@ class ControlExctPanel(Frame):
         panel.pack(side = tk.TOP, expand=False, fill=tk.X)              
         self.solve_btn = Button(panel, text="SOLVE", background="blue", command=self.solve)
         self.solve_btn.pack(expand=False, fill=tk.X)
+        self.solve_progress = ttk.Progressbar(panel, orient=tk.HORIZONTAL, mode="determinate", maximum=1.0)
+        self.solve_progress.pack(expand=False, fill=tk.X)
                 
         panel = Frame(self)  
         panel.pack(side = tk.TOP, expand=False, fill=tk.X)       
@@ -87,6 +79,8 @@ class ControlExctPanel(Frame):
         self.discret_entry.config(validate="key", validatecommand=(self.register(positive_int_input_validate), '%P'))
         self.discret_entry.pack(side=tk.RIGHT)#.grid(row=2, column=1)
         Label(panel, text="Diskret points:").pack(side=tk.RIGHT)#.grid(row=2, column=0)
+        self.adaptive_grid_entry = Checkbutton(panel, text="Adaptive", variable=self.adaptive_grid_var, command=self.on_change)
+        self.adaptive_grid_entry.pack(side=tk.RIGHT)
         
         panel = Frame(self)  
         panel.pack(side = tk.TOP, expand=False, fill=tk.X)     
@@ -144,133 +138,115 @@ class ControlExctPanel(Frame):
         Label(panel, text="L [mkH] (A, B, C)").pack(side=tk.RIGHT)#.grid(row=7, column=1)
                 
     def on_change(self, event=None):            
-        self.update_plot()
+        self.pipeline.invalidate('excitation')
         
     def on_schema_change(self, event=None):  
-        self.app.control_geom_panel.schema = "ABC" if self.excitation_type_var.get() == self.SRC_TYPE_GEN else self.schema_var.get()   
-        self.app.control_geom_panel.update_plot()
+        self.app.control_geom_panel.schema = self.geometry_schema()
+        self.app.control_geom_panel.on_change()
+        self.pipeline.invalidate('excitation')
                 
     def solve(self):        
+        # pending edits are applied before solving
+        self.app.control_geom_panel.pipeline.flush()
+        self.pipeline.flush()
         if  hasattr(self.app.control_geom_panel, 'geometry'):
             geom = self.app.control_geom_panel.geometry
         valid = self.app.control_geom_panel.valid
         if  valid and not geom == None:
-            results = solution.solve(geom, self.exitation)
-            presentation.plotResults(results)
+            # the fastest strategy that fits the available memory, the user confirms a solve that may not fit
+            strategy = planner.plan(geom, self.exitation)
+            if not strategy.fits and not messagebox.askokcancel("Solve may run out of memory",
+                    "The solve needs about %.0f MB, %.0f MB are available.\nSolve anyway?" % (strategy.memory_bytes/2**20, (planner.available_memory() or 0)/2**20)):
+                return
+            # a newer request cancels the running one, its late messages are dropped by the token check
+            if self.solve_cancel is not None:
+                self.solve_cancel.set()
+            else:
+                self.after(self.SOLVE_POLL_MS, self.poll_solve)
+            cancel = threading.Event()
+            self.solve_cancel = cancel
+            self.solve_progress.config(value=0)
+            # the worker gets snapshots, the panels rebind geometry and excitation on edits
+            worker = threading.Thread(target=self.solve_worker, args=(copy.copy(geom), self.exitation, cancel, strategy.options), daemon=True)
+            worker.start()
         else:
             self.app.control_geom_panel.show_errors()
+            
+    def solve_worker(self, geom, exct, cancel, options):
+        # runs in the worker thread, Tk is touched only by poll_solve in the main thread
+        def progress(fraction):
+            if cancel.is_set():
+                raise parallel.Cancelled()
+            self.solve_queue.put((cancel, 'progress', fraction))
+        try:
+            results = solution.solve(geom, exct, progress=progress, **options)
+            self.solve_queue.put((cancel, 'done', results))
+        except parallel.Cancelled:
+            pass
+        except (Exception, SystemExit) as error:
+            self.solve_queue.put((cancel, 'error', error))
+            
+    def poll_solve(self):
+        while not self.solve_queue.empty():
+            (token, kind, value) = self.solve_queue.get_nowait()
+            if token is not self.solve_cancel:
+                continue
+            if kind == 'progress':
+                self.solve_progress.config(value=max(value, self.solve_progress['value']))
+                continue
+            self.solve_cancel = None
+            self.solve_progress.config(value=0)
+            if kind == 'done':
+                presentation.plotResults(value)
+            else:
+                messagebox.showerror("Solve failed", str(value))
+        if self.solve_cancel is not None:
+            self.after(self.SOLVE_POLL_MS, self.poll_solve)
         
     def update(self):
+        self.update_excitation()
+        self.update_currents()
+        
+    def update_excitation(self):
+        self.exitation = self.build_excitation()
+        return True
+        
+    def update_currents(self):
         if  hasattr(self.app.control_geom_panel, 'geometry'):
             geom = self.app.control_geom_panel.geometry
         if  not geom == None:
             Nph = geom.getCircuitPhaseCount()
         else:
             Nph = 1
-        T = str_to_flt( self.duration_var.get() )
-        N = str_to_int( self.discret_var.get() )
-        I = str_to_flt( self.current_var.get() )
-        current_type = "rms" if (self.current_type_var.get() == self.CUR_TYPE_RMS) else "peak"
-        excitation_type = "gen" if (self.excitation_type_var.get() == self.SRC_TYPE_GEN) else "rlc"
         
         state = "normal" if (Nph==3) else "disabled"
         self.schema_menu.config(state = state)
         
-        peakPhaseNumber = 0 if self.schema_var.get()==self.SCHEMA_A_BC else (1 if self.schema_var.get()==self.SCHEMA_B_AC else 2)
-        
         self.k_override_entry.config(state = state)
         
-        asymK_override =  self.excitation_type_var.get()==self.SRC_TYPE_RLC and Nph==3 and self.k_override_var.get()  
-        
-        state = "normal" if asymK_override else "disabled"
+        state = "normal" if self.asymK_override(Nph) else "disabled"
         self.k_override_value_entry.config(state = state)
         
-        asymK_value = str_to_flt(self.k_override_value_var.get()) if asymK_override else None
-        
-        self.exitation = excitation.build(T, N, I, source_type = excitation_type, current=current_type, alpha=str_to_flt(self.alpha_var.get())/180*3.1415, freq=str_to_flt(self.freq_var.get()))
-        
-        if  not geom == None:
-            inductances = solution.evalBranchCurrents(geom, self.exitation, peakPhaseNumber = peakPhaseNumber , asymK_override = asymK_value)
+        # branch currents are set on a copy, a running solve keeps the excitation it was given
+        ( self.exitation, inductances ) = self.build_currents(geom, self.exitation)
+        if  not inductances == None:
             self.ind_var.set(  flt_arr_to_str(inductances.L, 1e6) )
             
         self.k_natural_value_var.set( "%6.2f" % self.exitation.asymK )
+        return True
         
+    def draw_excitation(self):
+        self.update_plot_callback(self.exitation)
                 
     def update_plot(self):
-        self.update()
-        self.update_plot_callback(self.exitation)
+        self.pipeline.run('excitation')
         
     def save(self, file = "work.exct.txt"):   
         self.update_plot() 
-        f = open(file, "w")
-        f.write( ''.join([self.DURATION_VAR_NAME, ' = ', self.duration_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.DISCRET_VAR_NAME, ' = ', self.discret_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.FREQ_VAR_NAME, ' = ', self.freq_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.CURRENT_VAR_NAME, ' = ', self.current_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.CURRENT_TYPE_VAR_NAME, ' = ', self.current_type_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.ALPHA_VAR_NAME, ' = ', self.alpha_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.EXCT_TYPE_VAR_NAME, ' = ', self.excitation_type_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.K_OVERRIDE_VAL_VAR_NAME, ' = ', self.k_override_value_var.get() ]) ); f.write( '\n' )
-        f.write( ''.join([self.K_OVERRIDE_VAR_NAME, ' = ', 'True' if self.k_override_var.get() else 'False' ]) ); f.write( '\n' )
-        f.write( ''.join([self.SCHEMA_VAR_NAME, ' = ', self.schema_var.get() ]) ); f.write( '\n' )
-        f.close()
-        
-    def init(self):        
-        self.duration_var = StringVar()        
-        self.discret_var = StringVar()        
-        self.current_var = StringVar()     
-        self.alpha_var = StringVar()        
-        self.freq_var = StringVar()
-        self.current_type_var = StringVar()   
-        self.excitation_type_var = StringVar()        
-        self.k_natural_value_var = StringVar()       
-        self.k_override_value_var = StringVar()      
-        self.k_override_var = BooleanVar()        
-        self.schema_var = StringVar()      
-        self.ind_var = StringVar()        
-                
-    def load(self, file = "work.exct.txt"):
-        
-        self.duration_var.set(value="20.0")        
-        self.discret_var.set(value="21")        
-        self.current_var.set(value="80.0")        
-        self.alpha_var.set(value="0.0")          
-        self.freq_var.set(value="60")        
-        self.current_type_var.set(value=self.CUR_TYPE_PEAK)        
-        self.excitation_type_var.set(value=self.SRC_TYPE_RLC)        
-        self.k_natural_value_var.set(value="0.0")       
-        self.k_override_value_var.set(value="0.0")      
-        self.k_override_var.set(value=False)        
-        self.schema_var.set(value = self.SCHEMA_A_BC)  
-        self.ind_var.set(value="0.0,    0.0,    0.0")       
-        
-        if os.path.exists(file):  
-            with open(file) as f:
-                for l in f:
-                    (key, val) = tuple([ s.strip() for s in l.split('=') ])
-                    val =  val.strip('[]') 
-                    print(key, '=', val )                     
-                    if (key == self.DURATION_VAR_NAME):
-                        self.duration_var.set(val)
-                    elif (key == self.DISCRET_VAR_NAME):
-                        self.discret_var.set(val)
-                    elif (key == self.CURRENT_VAR_NAME):
-                        self.current_var.set(val)
-                    elif (key == self.FREQ_VAR_NAME):
-                        self.freq_var.set(val)
-                    elif (key == self.CURRENT_TYPE_VAR_NAME):
-                        self.current_type_var.set(val)
-                    elif (key == self.EXCT_TYPE_VAR_NAME):
-                        self.excitation_type_var.set(val)   
-                    if (key == self.ALPHA_VAR_NAME):
-                        self.alpha_var.set(val)
-                    elif (key == self.K_OVERRIDE_VAL_VAR_NAME):
-                        self.k_override_value_var.set(val)
-                    elif (key == self.K_OVERRIDE_VAR_NAME):
-                        self.k_override_var.set(val == 'True')
-                    elif (key == self.SCHEMA_VAR_NAME):
-                        self.schema_var.set(val)
-                           
-            
-
+        super().save(file)
         
+    def new_str_var(self, value = ''):
+        return StringVar(value = value)
+    
+    def new_bool_var(self, value = False):
+        return BooleanVar(value = value)
@@ -0,0 +1,46 @@
+from typing import Final
+
+DEBOUNCE_MS : Final[int] = 250
+
+class Pipeline:
+    # ordered recompute stages of a panel (name, function) with dirty flags; a stage runs when it was
+    # invalidated or when a stage upstream of it reported a changed output (function returned True),
+    # invalidations are coalesced by a timer of the widget, so a burst of edits gives one recompute
+    def __init__(self, widget, stages, delay_ms = DEBOUNCE_MS):
+        self.widget = widget
+        self.stages = stages
+        self.delay_ms = delay_ms
+        self.dirty = set()
+        self.timer = None
+        self.running = False
+
+    def invalidate(self, name, delay_ms = None):
+        self.dirty.add(name)
+        if self.running:
+            return
+        if self.timer is not None:
+            self.widget.after_cancel(self.timer)
+        self.timer = self.widget.after(self.delay_ms if delay_ms is None else delay_ms, self.flush)
+
+    def run(self, *names):
+        # recompute now, starting at the given stages
+        self.dirty.update(names)
+        self.flush()
+
+    def flush(self):
+        if self.timer is not None:
+            self.widget.after_cancel(self.timer)
+            self.timer = None
+        self.running = True
+        try:
+            changed = False
+            for (name, function) in self.stages:
+                if not (changed or name in self.dirty):
+                    continue
+                self.dirty.discard(name)
+                changed = bool(function())
+        finally:
+            self.running = False
+        # stages invalidated while running (by themselves or by other panels) are recomputed later
+        if self.dirty:
+            self.invalidate(next(iter(self.dirty)), 0)
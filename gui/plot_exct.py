@@ -16,14 +16,43 @@ class PlotExctArea(Frame):
         self.axul = plt.subplot(grid[1,0])
         self.canvas = FigureCanvasTkAgg(self.figure, self)
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        # lines and annotations are animated artists blitted over the cached static layer (axes, ticks, legends)
+        self.artists = [None, None, None]
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
       
     def update_plot(self, e : Excitation, g : Geometry):
-        self.axi.cla()
-        self.axu.cla()
-        self.axul.cla()
-        presentation.plotVoltagePhase(e, self.axu, self.figure)
-        presentation.plotVoltageLinear(e, self.axul, self.figure)
+        limits = self.get_limits()
+        self.artists[0] = presentation.plotVoltagePhase(e, self.axu, self.figure, self.artists[0])
+        self.artists[1] = presentation.plotVoltageLinear(e, self.axul, self.figure, self.artists[1])
         if not g is None:
-            presentation.plotCurrent(e, self.axi, self.figure)
-        self.canvas.draw()
-        # print("Update plot completed: %s, axes %s, figure %s" % (  traceback.format_stack()[-1].splitlines()[0], self.ax  , self.figure  ))
\ No newline at end of file
+            self.artists[2] = presentation.plotCurrent(e, self.axi, self.figure, self.artists[2])
+        elif not self.artists[2] is None:
+            self.axi.cla()
+            self.artists[2] = None
+            limits = None
+        for artist in self.get_animated():
+            artist.set_animated(True)
+        # the static layer is redrawn only when the limits (and so the ticks) change
+        if self.background is None or not limits == self.get_limits():
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_animated()
+            self.canvas.blit(self.figure.bbox)
+        # print("Update plot completed: %s, axes %s, figure %s" % (  traceback.format_stack()[-1].splitlines()[0], self.ax  , self.figure  ))
+        
+    def get_limits(self):
+        return [ (ax.get_xlim(), ax.get_ylim()) for ax in (self.axi, self.axu, self.axul) ]
+        
+    def get_animated(self):
+        return [ artist for artists in self.artists if not artists is None for artist in artists['lines'] + artists['annotations'] ]
+        
+    def draw_animated(self):
+        for artist in self.get_animated():
+            self.figure.draw_artist(artist)
+        
+    def on_draw(self, event):
+        # full draws (updates, resizes) skip the animated artists, the background is kept and they are drawn over it
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_animated()
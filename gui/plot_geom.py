@@ -15,10 +15,14 @@ class PlotGeomArea(Frame):
         self.ax = plt.subplot(projection='3d')
         self.canvas = FigureCanvasTkAgg(self.figure, self)
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.artists = None
 
     def update_plot(self, g : Geometry):
-        self.ax.cla()
-        if not g is None:
-            presentation.plotGeometry(g, self.ax)
-        self.canvas.draw()
+        # the artists of the geometry are updated in place, the axes are cleared only when it disappears
+        if g is None:
+            self.ax.cla()
+            self.artists = None
+        else:
+            self.artists = presentation.plotGeometry(g, self.ax, self.artists)
+        self.canvas.draw_idle()
         # print("Update plot completed: %s, axes %s, figure %s" % (  traceback.format_stack()[-1].splitlines()[0], self.ax  , self.figure  ))
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""Cache of geometric kernels shared by the solver calls.
+
+The geometric terms of the solution (Biot-Savart coupling of field points to phases,
+Ampere pair coefficients of force masks, Neumann partial inductances) depend on the
+geometry only, while excitation edits change just the phase currents. Kernels are kept
+under a key built from the content hash of the geometry arrays they use, so changing the
+current magnitude, frequency, alpha or schema reuses them and costs only the time-domain step.
+Entries can also be grouped in families of related geometries, so that a kernel missing from the
+cache can be updated from the latest one of its family instead of being computed from scratch.
+
+Typical usage:
+    >>> K = kernel_cache.fetch(('biotsavart3d', geometry.getContentHash(), P), lambda: compute(...))
+    >>> kernel_cache.hits, kernel_cache.misses
+"""
+
+import numpy as np
+import threading
+from collections import OrderedDict
+from typing import Final
+
+DEFAULT_CACHE_BYTES : Final = 256*2**20
+
+
+class KernelCache:
+    """Least recently used store of kernel arrays with a bound on their total size.
+
+    Attributes:
+        max_bytes (int): Bound on the summed size of the stored arrays, least recently used
+            entries are evicted to keep it. An entry larger than the bound is not stored.
+        nbytes (int): Summed size of the stored arrays, kernels and their states.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that computed the kernel.
+    """
+
+    def __init__(self, max_bytes = DEFAULT_CACHE_BYTES):
+        """Create an empty cache.
+
+        Args:
+            max_bytes (int, optional): Bound on the summed size of the stored arrays.
+                Defaults to DEFAULT_CACHE_BYTES.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.states = {}
+        self.families = {}
+        # the GUI solves in a worker thread while the main thread evaluates inductances
+        self.lock = threading.RLock()
+
+    def fetch(self, key, compute, family = None, state = None):
+        """Return the kernel stored under key, computing and storing it on a miss.
+
+        Stored arrays are made read-only since the same objects are returned to every caller.
+
+        Args:
+            key (tuple): Hashable key, kernel name with the geometry hash and the phase count.
+            compute (callable): Function without arguments returning the kernel, an array or
+                a (nested) tuple/list of arrays.
+            family (tuple, optional): Hashable group of related kernels, the entry becomes the
+                latest one of its family (see latest).
+            state (optional): Data kept with a computed entry for updates of later family
+                members, e.g. a snapshot of the geometry. Its arrays count in the size of the entry.
+
+        Returns:
+            The stored or the computed kernel.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                if family is not None:
+                    self.families[family] = key
+                return self.entries[key][0]
+            self.misses += 1
+
+        # computed outside the lock, concurrent misses of one key may compute it twice
+        value = compute()
+        size = _freeze(value) + _nbytes(state)
+        with self.lock:
+            if size <= self.max_bytes and key not in self.entries:
+                self.entries[key] = (value, size)
+                self.states[key] = state
+                if family is not None:
+                    self.families[family] = key
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    (evicted_key, (_, evicted)) = self.entries.popitem(last=False)
+                    del self.states[evicted_key]
+                    self.nbytes -= evicted
+        return value
+
+    def latest(self, family):
+        """Return the latest kernel of a family that is still stored, with its state.
+
+        Args:
+            family (tuple): Family given to fetch.
+
+        Returns:
+            tuple: (kernel, state), or None when the family has no stored kernel.
+        """
+        with self.lock:
+            key = self.families.get(family)
+            if key not in self.entries:
+                return None
+            return self.entries[key][0], self.states[key]
+
+    def clear(self):
+        """Drop all stored kernels and reset the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.states.clear()
+            self.families.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def _freeze(value):
+    # size of the arrays in value, which are made read-only
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value.nbytes
+    return sum(_freeze(v) for v in value)
+
+
+def _nbytes(state):
+    # size of the arrays held by a state, directly, in (nested) tuples/lists or as attributes of an object
+    if isinstance(state, np.ndarray):
+        return state.nbytes
+    if isinstance(state, (tuple, list)):
+        return sum(_nbytes(s) for s in state)
+    return sum(v.nbytes for v in getattr(state, '__dict__', {}).values() if isinstance(v, np.ndarray))
+
+
+# cache used by the solver unless another one (or None) is passed
+kernel_cache = KernelCache()
@@ -1,6 +1,48 @@
 import numpy as np
-from numpy import atan, sin, pi, exp
+from numpy import atan, sin, cos, pi, exp
 from dataclasses import dataclass
+from typing import Final
+
+GRID_PILOT_PER_PERIOD : Final = 64 # samples per period of the pilot grid locating the current peaks
+GRID_PEAK_FRACTION : Final = 0.9 # peaks of currents and their products refined when above this share of the largest one
+GRID_PEAK_WIDTH : Final = 1/32 # width of the refined zone around a peak, share of the period
+GRID_BASE_SHARE : Final = 0.1 # share of samples spread over the whole duration (a tenth of it before the fault)
+
+@dataclass
+class Waveform:
+    source_type: str
+    amplitude: float
+    omega: float
+    tau: float
+    phi: float
+    delta: float
+    alpha: float
+    
+    def __init__(self, source_type, amplitude, omega, tau, phi = 0, delta = 0, alpha = 0):
+        # closed form of the source current: amplitude [A], omega [rad/ms], tau [ms], delta [ms], alpha [rad]
+        self.source_type = source_type
+        self.amplitude = amplitude
+        self.omega = omega
+        self.tau = tau
+        self.phi = phi
+        self.delta = delta
+        self.alpha = alpha
+        
+    def basis(self, T):
+        # source current is A*cos(alpha) + B*sin(alpha) for any closing angle alpha (the rlc current does 
+        # not depend on it: A is the current, B = 0), returns A, B and their time derivatives (source phases x T)
+        if self.source_type == "rlc":
+            [A, dA] = current_rlc_basis(T, self.amplitude, self.omega, self.tau, self.delta)
+            return A[np.newaxis], np.zeros((1,)+A.shape), dA[np.newaxis], np.zeros((1,)+A.shape)
+        return current_gen_basis(T, self.amplitude, self.omega, self.tau, self.phi)
+        
+    def phasors(self):
+        # complex amplitudes X of the steady oscillation Re(X*exp(j*omega*t)) of the source phases 
+        # (... x source phases): AC part of the generator currents, undamped RLC oscillation
+        if self.source_type == "rlc":
+            return np.reshape(-1j*self.amplitude*exp(-1j*self.omega*self.delta), (1,))
+        j = np.arange(3)
+        return -1j*self.amplitude*2**0.5*exp( 1j*( np.reshape(self.alpha, np.shape(self.alpha) + (1,)) - self.phi - 2*pi/3*j ) )
 
 @dataclass  
 class Excitation:
@@ -12,24 +54,70 @@ class Excitation:
     U: float   
     K: float
     asymK : float = 0                       
+    waveform : Waveform = None
         
-    def __init__(self, T, I, TU, U):
-        if not( (T.shape==I.shape) ) and not( (T.shape[0]==I.shape[1]) ) and \
-            not( (TU.shape[0]==U.shape[1]) )and not( (TU.shape[0]==U.shape[1]) ):
+    def __init__(self, T, I, TU, U, waveform = None):
+        if not( (T.shape==I.shape) ) and not( (T.shape[0]==I.shape[-1]) ) and \
+            not( (TU.shape[0]==U.shape[-1]) )and not( (TU.shape[0]==U.shape[-1]) ):
             exit('Exit on error: Exitation definition - Input vectors dimensions must agree')     
         self.T = T
         self.current = I
         self.TU = TU
         self.voltage = U
+        self.waveform = waveform
 
 def current_gen(T, Isc, omega, tau, alpha, phi):
     [j, t] = np.meshgrid([1,2,3], T, indexing='ij')
     return Isc*2**0.5*(sin( omega*t + alpha - phi - 2*pi/3 * (j - 1) ) - exp( -t / tau ) * sin( alpha - phi - 2*pi/3 * (j - 1) ) ) 
 
+def current_gen_basis(T, Isc, omega, tau, phi):
+    # current_gen = A*cos(alpha) + B*sin(alpha), returns A, B, dA/dt, dB/dt
+    [j, t] = np.meshgrid([1,2,3], T, indexing='ij')
+    p = phi + 2*pi/3 * (j - 1)
+    A = Isc*2**0.5*( sin( omega*t - p ) + exp( -t / tau ) * sin( p ) )
+    B = Isc*2**0.5*( cos( omega*t - p ) - exp( -t / tau ) * cos( p ) )
+    dA = Isc*2**0.5*( omega*cos( omega*t - p ) - exp( -t / tau ) * sin( p ) / tau )
+    dB = Isc*2**0.5*( - omega*sin( omega*t - p ) + exp( -t / tau ) * cos( p ) / tau )
+    return A, B, dA, dB
+
 def current_rlc(t, I0, omega, tau, delta):
     return I0*exp(-(t-delta)/tau)*sin(omega*(t-delta))*(t>delta)
+
+def current_rlc_basis(t, I0, omega, tau, delta):
+    # current_rlc and its time derivative
+    A = current_rlc(t, I0, omega, tau, delta)
+    dA = I0*exp(-(t-delta)/tau)*( omega*cos(omega*(t-delta)) - sin(omega*(t-delta))/tau )*(t>delta)
+    return A, dA
+
+def adaptive_grid(TIME, T_SIZE : int, waveform : Waveform, alpha = 0):
+    # T_SIZE samples of [0, TIME] concentrated around the largest peaks of the phase currents and of their 
+    # pairwise products (forces are combinations of the products), sparse in the decayed tail and before the fault
+    period = 2*pi/waveform.omega
+    if TIME <= 0 or T_SIZE < 3:
+        return np.linspace(0, TIME, T_SIZE)
+    T = np.linspace(0, TIME, max(int(GRID_PILOT_PER_PERIOD*np.ceil(TIME/period)), 8*T_SIZE) + 1)
+    [A, B, _, _] = waveform.basis(T)
+    alpha = np.ravel(alpha if waveform.source_type == "gen" else 0)[:, np.newaxis, np.newaxis]
+    I = np.reshape(A*cos(alpha) + B*sin(alpha), (-1, T.size))
+    [p, q] = np.triu_indices(I.shape[0])
+    S = np.abs(np.concatenate([I, I[p]*I[q]]))
+    Sn = np.pad(S, ((0,0),(1,1)))
+    peaks = (S >= Sn[:,:-2]) & (S >= Sn[:,2:]) & (S > 0) & (S >= GRID_PEAK_FRACTION*np.max(S, axis=1, keepdims=True))
+    tp = np.unique(T[np.nonzero(peaks)[1]])
+    
+    fault = waveform.delta if waveform.source_type == "rlc" else 0
+    base = np.where(T >= fault, 1.0, 0.1)
+    integral = lambda f: np.sum( (f[1:] + f[:-1])/2*np.diff(T) )
+    zones = np.sum(exp( -0.5*( (T[:,np.newaxis] - tp[np.newaxis,:])/(GRID_PEAK_WIDTH*period) )**2 ), axis=1)
+    rho = GRID_BASE_SHARE*base/integral(base)
+    if tp.size > 0:
+        rho = rho + (1 - GRID_BASE_SHARE)*zones/integral(zones)
+    
+    # samples equidistribute the density
+    c = np.concatenate([[0], np.cumsum( (rho[1:] + rho[:-1])/2*np.diff(T) )])
+    return np.interp(np.linspace(0, c[-1], T_SIZE), c, T)
     
-def build(TIME, T_SIZE : int, I, current = "peak", source_type = "gen", freq = 50, delta = 5, alpha = 0, tau = None, tau_std = 45):
+def build(TIME, T_SIZE : int, I, current = "peak", source_type = "gen", freq = 50, delta = 5, alpha = 0, tau = None, tau_std = 45, grid = "uniform"):
         
     tau_rlc_default = 27
     valid_types  = {"rlc", "gen"}
@@ -38,7 +126,12 @@ def build(TIME, T_SIZE : int, I, current = "peak", source_type = "gen", freq = 5
     valid_currents  = {"rms", "peak"}
     if current not in valid_currents:
         raise ValueError("error: Excitation.build - type must be one of %s." % valid_types)
+    valid_grids  = {"uniform", "adaptive"}
+    if grid not in valid_grids:
+        raise ValueError("error: Excitation.build - grid must be one of %s." % valid_grids)
             
+    # an array of closing angles builds a batch of cases: generator currents are (alpha x phases x T)
+    alpha = np.asarray(alpha, dtype=float)[..., np.newaxis, np.newaxis]
     omega = 2*pi*freq
     tau = (tau_std if source_type=="gen" else tau_rlc_default) if (tau == None) else tau
     phi = atan(omega*tau/1000)           
@@ -47,8 +140,13 @@ def build(TIME, T_SIZE : int, I, current = "peak", source_type = "gen", freq = 5
     Ip  = I if (current == "peak") else I*Kp
     Isc = I if (current ==  "rms") else I/Kp      
     I0 = Ip/( exp(-phi/omega*1000/tau)*sin(phi) )           
-    T = np.linspace(0,TIME,T_SIZE)
     TU = np.linspace(-1/freq,0,21)
+    
+    if  source_type == "rlc":
+        waveform = Waveform(source_type, I0*1000, omega/1000, tau, delta = delta)
+    else:
+        waveform = Waveform(source_type, Isc*1000, omega/1000, tau, phi = phi, alpha = np.squeeze(alpha, (-2, -1)))
+    T = np.linspace(0,TIME,T_SIZE) if (grid == "uniform") else adaptive_grid(TIME, T_SIZE, waveform, alpha)
 
     if  source_type == "rlc":
         I = current_rlc(T, I0, omega/1000, tau, delta)
@@ -60,4 +158,4 @@ def build(TIME, T_SIZE : int, I, current = "peak", source_type = "gen", freq = 5
     else:
         raise ValueError("error: Excitation.build - type must be one of %s." % valid_types) 
     
-    return Excitation(T, I*1000, TU, U )
\ No newline at end of file
+    return Excitation(T, I*1000, TU, U, waveform)
\ No newline at end of file
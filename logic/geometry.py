@@ -18,6 +18,7 @@ Typical usage:
 """
 
 import numpy as np
+import hashlib
 from dataclasses import dataclass
 from typing import Final
 
@@ -37,6 +38,8 @@ COND_LETTERS : Final = 'ABCS'
 GND_VAR_NAME : Final = 'GNDP'
 SRC_VAR_NAME : Final = 'SRCP'
 
+HASH_FIELDS : Final = ('XS', 'XE', 'YS', 'YE', 'ZS', 'ZE', 'R', 'NP', 'NF', 'NL', 'NC', 'X', 'Y', 'Z')
+
 
 @dataclass
 class Geometry:
@@ -64,6 +67,11 @@ class Geometry:
         Z (np.ndarray): Z coordinates of field observation points (shape: [n_points]).
         R (np.ndarray): Conductor radius for each segment (shape: [n_segments]). Used for
             corner approximation and field calculations.
+        NA (np.ndarray): Orientation code for each segment (shape: [n_segments]): 0, 1, 2 for
+            segments along X, Y, Z and -1 for zero-length or not axis-aligned segments. Kept
+            in sync with the coordinates by the rotation methods.
+        NC (np.ndarray): Index of the conductor each segment comes from (shape: [n_segments]).
+            Segments of a conductor are contiguous, so an edited conductor maps to one range.
     """
     XS: np.ndarray
     XE: np.ndarray
@@ -80,8 +88,10 @@ class Geometry:
     # T: float
     # I: float
     R: np.ndarray
+    NA: np.ndarray
+    NC: np.ndarray
         
-    def __init__(self, XS, XE, YS, YE, ZS, ZE, R, NP, NF, X, Y, Z, NL=np.array([])):
+    def __init__(self, XS, XE, YS, YE, ZS, ZE, R, NP, NF, X, Y, Z, NL=np.array([]), NC=None):
         """Initialize a Geometry object with segment and field point definitions.
         
         Validates that all input arrays have compatible shapes and initializes the geometry.
@@ -102,6 +112,8 @@ class Geometry:
             Y (np.ndarray): Y coordinates of field observation points.
             Z (np.ndarray): Z coordinates of field observation points.
             NL (np.ndarray, optional): Phase logical array. Defaults to empty array.
+            NC (np.ndarray, optional): Conductor index of each segment. Defaults to a single
+                conductor.
         
         Raises:
             SystemExit: If input array dimensions are inconsistent.
@@ -127,7 +139,57 @@ class Geometry:
         self.Y = Y #Y coordinates of field output points
         self.Z = Z #Z coordinates of field output points
         self.R = R #default radius of conductor using for corner approximation
+        self.NA = self.getSegmentAxes() #orientation of segments (0 - X, 1 - Y, 2 - Z, -1 - none)
+        self.NC = np.zeros(XS.shape, dtype=int) if NC is None else NC #index of conductor for segments
+        
+    def getSegmentAxes(self):
+        """Classify segments by the coordinate axis they are parallel to.
+        
+        Returns:
+            np.ndarray: Integer array (shape: [n_segments]) with 0, 1, 2 for segments along
+                X, Y, Z and -1 for zero-length or not axis-aligned segments.
+        """
+        DX = self.XE - self.XS
+        DY = self.YE - self.YS
+        DZ = self.ZE - self.ZS
+        NA = np.full(DX.shape, -1)
+        NA[(DX != 0) & (DY == 0) & (DZ == 0)] = 0
+        NA[(DX == 0) & (DY != 0) & (DZ == 0)] = 1
+        NA[(DX == 0) & (DY == 0) & (DZ != 0)] = 2
+        return NA
         
+    def getConductorSegments(self):
+        """Group segment indices by conductor.
+        
+        Kernels cached for a previous version of the geometry are updated from the segments
+        of the conductors that differ, instead of being recomputed over all segment pairs.
+        
+        Returns:
+            list[np.ndarray]: Index array of the segments of every conductor, in conductor order.
+        """
+        if self.NC.size == 0:
+            return []
+        return [np.flatnonzero(self.NC == c) for c in range(int(self.NC.max()) + 1)]
+
+    def getContentHash(self, fields = HASH_FIELDS):
+        """Hash the content of the geometry arrays.
+
+        Two geometries with equal arrays get equal hashes regardless of object identity,
+        so the hash can key geometric terms computed for one of them.
+
+        Args:
+            fields (tuple[str], optional): Names of the hashed arrays. Defaults to all of them.
+
+        Returns:
+            str: Hex digest of the shapes, types and values of the selected arrays.
+        """
+        h = hashlib.sha1()
+        for name in fields:
+            A = np.ascontiguousarray(getattr(self, name))
+            h.update(( '%s%s%s' % (name, A.shape, A.dtype.str) ).encode())
+            h.update(A.tobytes())
+        return h.hexdigest()
+
     def getCircuitPhaseCount(self):
         """Calculate the number of phases in the circuit.
         
@@ -151,6 +213,7 @@ class Geometry:
         self.ZE = self.YE
         self.YS = ys
         self.YE = ye
+        self.NA = self.getSegmentAxes()
                 
     def rotateY(self):
         """Rotate the geometry 90 degrees around the Y axis.
@@ -164,6 +227,7 @@ class Geometry:
         self.ZE = -self.XE
         self.XS = xs
         self.XE = xe        
+        self.NA = self.getSegmentAxes()
         
     def rotateZ(self):
         """Rotate the geometry 90 degrees around the Z axis.
@@ -177,6 +241,7 @@ class Geometry:
         self.YE = self.XE
         self.XS = xs
         self.XE = xe
+        self.NA = self.getSegmentAxes()
             
     def mirrorZ(self):
         """Mirror the geometry across the XY plane (negate Z coordinates).
@@ -334,7 +399,7 @@ def fromConductorsWP(conductors : list[Conductor], field_points: WayPoints):
     
     The function:
     1. Extracts segment start and end points from each conductor's waypoints
-    2. Collects conductor radii and phase indices
+    2. Collects conductor radii, phase indices and conductor indices (NC)
     3. Expands force masks to full width (all segments) with zeros for other conductors
     4. Creates phase logical arrays (NL) indicating phase presence
     5. Returns a unified Geometry object
@@ -362,12 +427,12 @@ def fromConductorsWP(conductors : list[Conductor], field_points: WayPoints):
     X1_list, X2_list = [], []
     Y1_list, Y2_list = [], []
     Z1_list, Z2_list = [], []
-    R_list, N_list = [], []
+    R_list, N_list, C_list = [], [], []
     all_segs = 0
     # Sseg = slice(None, -1, +1)
     # Eseg = slice(+1, None, +1)
 
-    for conductor in conductors:
+    for c, conductor in enumerate(conductors):
         # Extract segment start and end points
         X1_list.extend(conductor.X[:-1])
         X2_list.extend(conductor.X[1:])
@@ -377,6 +442,7 @@ def fromConductorsWP(conductors : list[Conductor], field_points: WayPoints):
         Z2_list.extend(conductor.Z[1:])
         R_list.extend(conductor.R)
         N_list.extend([conductor.N] * conductor.segs)
+        C_list.extend([c] * conductor.segs)
         all_segs += conductor.segs
 
     # Convert to numpy arrays for consistent interface
@@ -388,6 +454,7 @@ def fromConductorsWP(conductors : list[Conductor], field_points: WayPoints):
     Z2 = np.array(Z2_list)
     R = np.array(R_list)
     N = np.array(N_list)
+    C = np.array(C_list, dtype=int)
     
     # Convert field points to arrays
     X = np.array(field_points.X)
@@ -412,4 +479,4 @@ def fromConductorsWP(conductors : list[Conductor], field_points: WayPoints):
     max_phase = int(N.max())
     NL = np.stack([N == i for i in range(max_phase + 1)])
     
-    return Geometry(X1, X2, Y1, Y2, Z1, Z2, R, N, NF, X, Y, Z, NL)
+    return Geometry(X1, X2, Y1, Y2, Z1, Z2, R, N, NF, X, Y, Z, NL, C)
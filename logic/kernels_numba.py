@@ -0,0 +1,166 @@
+"""Numba-compiled geometric kernels, an optional backend of logic.solution.
+
+The functions evaluate the same Biot-Savart, Ampere and Neumann closed forms as the NumPy
+kernels of logic.solution, but pair by pair in fused parallel loops, so no (points x segments)
+or (segments x segments) temporaries are created. Compiled code is cached on disk next to
+this module. The NumPy kernels stay the reference implementation; results agree with them
+up to the summation order.
+
+Importing this module requires numba, logic.solution imports it only when the backend is
+selected and falls back to NumPy when it is not installed.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def _caf(A, X, r):
+    # scalar version of logic.solution.caf
+    if A - X != 0:
+        return A - X
+    if A != 0:
+        return 0.5*r*r/A
+    return r
+
+
+@njit(cache=True)
+def _log(A):
+    # log of distances, zero radius gives no singular contribution
+    return np.log(A) if A > 0 else 0.0
+
+
+@njit(parallel=True, cache=True)
+def biotsavart3d_coupling(S, E, Q, NA, NP, P):
+    """(3 x points x phases) field of unit phase currents.
+
+    S, E (3 x segments) are segment start/end points, Q (3 x points) field points,
+    NA segment orientations, NP segment phases and P the phase count.
+    """
+    K = np.zeros((3, Q.shape[1], P))
+    for i in prange(Q.shape[1]):
+        for j in range(S.shape[1]):
+            a = NA[j]
+            if a < 0:
+                continue
+            b = (a+1)%3
+            c = (a+2)%3
+            u1 = Q[a,i] - S[a,j]
+            u2 = Q[a,i] - E[a,j]
+            v = Q[b,i] - S[b,j]
+            w = Q[c,i] - S[c,j]
+            rr = v*v + w*w
+            if rr > 0:
+                g = ( u2/np.sqrt(u2*u2 + rr) - u1/np.sqrt(u1*u1 + rr) )/rr
+                K[b,i,NP[j]] += 1e-7*w*g
+                K[c,i,NP[j]] -= 1e-7*v*g
+    return K
+
+
+@njit(parallel=True, cache=True)
+def ampere3d_coefficients(S, E, R, NA, NP, NF, P):
+    """(3 x masks x phases x phases) force coefficients of the masks.
+
+    C[k,m,p,q] sums the force along k on segments of mask m on phase p from segments
+    outside the mask on phase q. NF (masks x segments) holds the mask weights.
+    """
+    n = S.shape[1]
+    m = NF.shape[0]
+    # W[i,mm,k,q]: force on segment i from the segments on phase q outside mask mm
+    W = np.zeros((n, m, 3, P))
+    for i in prange(n):
+        a1 = NA[i]
+        if a1 < 0:
+            continue
+        inside = False
+        for mm in range(m):
+            inside = inside or NF[mm,i] != 0
+        if not inside:
+            continue
+        for j in range(n):
+            a2 = NA[j]
+            if a2 < 0:
+                continue
+            q = NP[j]
+            if a1 == a2:
+                b = (a1+1)%3
+                c = (a1+2)%3
+                SSa = S[a1,j] - S[a1,i]
+                ESa = S[a1,j] - E[a1,i]
+                SEa = E[a1,j] - S[a1,i]
+                EEa = E[a1,j] - E[a1,i]
+                SSb = S[b,j] - S[b,i]
+                SSc = S[c,j] - S[c,i]
+                rr = SSb*SSb + SSc*SSc
+                if rr > 0:
+                    D = 1e-7*( np.sqrt(SEa*SEa + rr) - np.sqrt(SSa*SSa + rr) + np.sqrt(ESa*ESa + rr) - np.sqrt(EEa*EEa + rr) )/rr
+                    for mm in range(m):
+                        weight = NF[mm,i]*(1 - NF[mm,j])
+                        if weight != 0:
+                            W[i,mm,b,q] += weight*D*SSb
+                            W[i,mm,c,q] += weight*D*SSc
+            else:
+                c = 3 - a1 - a2
+                SSa1 = S[a1,j] - S[a1,i]
+                ESa1 = S[a1,j] - E[a1,i]
+                SSa2 = S[a2,j] - S[a2,i]
+                SEa2 = E[a2,j] - S[a2,i]
+                SSc = S[c,j] - S[c,i]
+                r = R[j]
+                SS = np.sqrt(SSa1*SSa1 + SSa2*SSa2 + SSc*SSc)
+                ES = np.sqrt(ESa1*ESa1 + SSa2*SSa2 + SSc*SSc)
+                SE = np.sqrt(SSa1*SSa1 + SEa2*SEa2 + SSc*SSc)
+                EE = np.sqrt(ESa1*ESa1 + SEa2*SEa2 + SSc*SSc)
+                f = 1e-7*( _log(_caf(SS, SSa2, r)) - _log(_caf(ES, SSa2, r)) - _log(_caf(SE, SEa2, r)) + _log(_caf(EE, SEa2, r)) )
+                for mm in range(m):
+                    weight = NF[mm,i]*(1 - NF[mm,j])
+                    if weight != 0:
+                        W[i,mm,a2,q] += weight*f
+
+    C = np.zeros((3, m, P, P))
+    for i in range(n):
+        for mm in range(m):
+            if NF[mm,i] != 0:
+                for k in range(3):
+                    for q in range(P):
+                        C[k,mm,NP[i],q] += W[i,mm,k,q]
+    return C
+
+
+@njit(parallel=True, cache=True)
+def neumann3d_mutual(S, E, NA, NP, P):
+    """(phases x phases) sums of the mutual partial inductances of parallel segments."""
+    n = S.shape[1]
+    Row = np.zeros((n, P))
+    for i in prange(n):
+        a = NA[i]
+        if a < 0:
+            continue
+        b = (a+1)%3
+        c = (a+2)%3
+        for j in range(n):
+            if NA[j] != a:
+                continue
+            SSa = S[a,j] - S[a,i]
+            ESa = S[a,j] - E[a,i]
+            SEa = E[a,j] - S[a,i]
+            EEa = E[a,j] - E[a,i]
+            SSb = S[b,j] - S[b,i]
+            SSc = S[c,j] - S[c,i]
+            rr = SSb*SSb + SSc*SSc
+            # collinear segments are coupled only when the second one lies entirely ahead of the first one
+            if rr > 0 or ( SSa > 0 and ESa > 0 and SEa > 0 and EEa > 0 ):
+                ES = np.sqrt(ESa*ESa + rr)
+                SS = np.sqrt(SSa*SSa + rr)
+                EE = np.sqrt(EEa*EEa + rr)
+                SE = np.sqrt(SEa*SEa + rr)
+                Row[i,NP[j]] += 1e-7*( + ESa*np.log( ESa + ES ) - ES
+                                       - SSa*np.log( SSa + SS ) + SS
+                                       - EEa*np.log( EEa + EE ) + EE
+                                       + SEa*np.log( SEa + SE ) - SE )
+
+    Mutual = np.zeros((P, P))
+    for i in range(n):
+        for q in range(P):
+            Mutual[NP[i],q] += Row[i,q]
+    return Mutual
@@ -0,0 +1,254 @@
+"""Barnes-Hut evaluation of the far field of current segments over an octree.
+
+Segments are sorted into an octree over their midpoints. A target (field point, or target
+segment of a force) sees a tree node as one expansion when the node is well separated,
+radius of the node + half length of the target < theta * distance to the node centre, and the
+segments of the node one by one otherwise (near pairs, evaluated by the caller with the exact
+closed forms). Far nodes are expanded to second order in the offsets of the segment points (and
+of the target points) from the node centre using the current moments of the node: sum of the
+current elements, their first and second spatial moments.
+
+The Taylor remainder bounds the error of every far interaction by 4*theta**3/(1 - theta)**5 times
+the scale of the node, 1e-7 * sum of |current element| / distance**2, so the result comes with a
+rigorous bound on its error against the exact kernel. theta is chosen from the tolerance on
+this ratio; the number of evaluated pairs grows as O(N log N) for a fixed theta.
+
+Typical usage:
+    >>> tree = Octree(S, E, W)
+    >>> (far_t, far_n, near_t, near_j) = tree.interactions(X, h, opening_angle(1e-3))
+    >>> (B, bound) = tree.far_field(X, u, h, far_t, far_n)
+"""
+
+import numpy as np
+from typing import Final
+
+LEAF_SIZE : Final = 16 # segments of a leaf node
+PAIR_BLOCK : Final = 2**14 # far (target, node) pairs expanded at once
+TARGET_BLOCK : Final = 2**12 # targets traversed at once by the callers, bounds the near pair lists
+
+
+def opening_angle(tolerance):
+    """Largest theta whose far interaction error bound 4*theta**3/(1 - theta)**5 is within tolerance.
+
+    Args:
+        tolerance (float): Bound on the error of a far interaction relative to the node scale.
+
+    Returns:
+        float: Opening angle theta in (0, 1).
+    """
+    lo = 0.0
+    hi = 1.0
+    for _ in range(60):
+        theta = (lo + hi)/2
+        if 4*theta**3 > tolerance*(1 - theta)**5:
+            hi = theta
+        else:
+            lo = theta
+    return lo
+
+
+class Octree:
+    """Octree over segment midpoints with the current moments of every node.
+
+    Currents are given per column (e.g. per phase): segment j carries the current W[j,c] in column c.
+
+    Attributes:
+        center (np.ndarray): (nodes x 3) expansion centres.
+        radius (np.ndarray): (nodes) largest distance of a segment point of the node from its centre.
+        start (np.ndarray): (nodes) first position of the node segments in order.
+        stop (np.ndarray): (nodes) position after the last node segment in order.
+        child_ptr (np.ndarray): (nodes + 1) ranges of the children of every node in child_idx.
+        child_idx (np.ndarray): child node indices, leaves have none.
+        order (np.ndarray): segment indices sorted so that every node holds a contiguous range.
+        M (np.ndarray): (nodes x columns*3 x 13) moments about the centre: for every column and
+            component of the current elements W*(E - S), their sum, first moments (3) and second
+            moments (3 x 3, with the spread along every segment).
+        A (np.ndarray): (nodes x columns) sums of |W|*length, scale of the error bound.
+    """
+
+    def __init__(self, S, E, W, leaf_size = LEAF_SIZE):
+        """Build the tree and the moments of its nodes.
+
+        Args:
+            S (np.ndarray): (segments x 3) start points.
+            E (np.ndarray): (segments x 3) end points.
+            W (np.ndarray): (segments x columns) currents of the segments.
+            leaf_size (int, optional): Largest number of segments of a leaf. Defaults to LEAF_SIZE.
+        """
+        self.midpoint = (S + E)/2
+        self.dl = E - S
+        self.length = np.linalg.norm(self.dl, axis=1)
+        self.W = W
+        self.leaf_size = leaf_size
+        self.order = np.arange(S.shape[0])
+
+        self._center = []
+        self._radius = []
+        self._start = []
+        self._stop = []
+        self._children = []
+        if S.shape[0] > 0:
+            self._split(0, S.shape[0])
+
+        self.center = np.reshape(np.array(self._center), (-1, 3))
+        self.radius = np.array(self._radius, dtype=float)
+        self.start = np.array(self._start, dtype=int)
+        self.stop = np.array(self._stop, dtype=int)
+        counts = np.array([len(c) for c in self._children], dtype=int)
+        self.child_ptr = np.concatenate([[0], np.cumsum(counts)]).astype(int)
+        self.child_idx = np.array([n for c in self._children for n in c], dtype=int)
+        self._moments()
+
+    def _split(self, lo, hi):
+        # appends the node of the segments order[lo:hi] and its subtree, returns the node index
+        idx = self.order[lo:hi]
+        c = self.midpoint[idx]
+        center = (c.min(axis=0) + c.max(axis=0))/2
+        node = len(self._center)
+        self._center.append(center)
+        self._radius.append(np.max(np.linalg.norm(c - center, axis=1) + self.length[idx]/2))
+        self._start.append(lo)
+        self._stop.append(hi)
+        self._children.append([])
+        if hi - lo <= self.leaf_size or np.all(c == c[0]):
+            return node
+
+        octant = (c[:,0] > center[0]) + 2*(c[:,1] > center[1]) + 4*(c[:,2] > center[2])
+        sort = np.argsort(octant, kind='stable')
+        self.order[lo:hi] = idx[sort]
+        bounds = lo + np.searchsorted(octant[sort], np.arange(9))
+        self._children[node] = [self._split(bounds[k], bounds[k+1]) for k in range(8) if bounds[k+1] > bounds[k]]
+        return node
+
+    def _moments(self):
+        # moments of every node from its own segments about its centre
+        nodes = self.center.shape[0]
+        cols = self.W.shape[1]
+        self.M = np.zeros((nodes, cols, 3, 13))
+        self.A = np.zeros((nodes, cols))
+        u = np.divide(self.dl, self.length[:,np.newaxis], out=np.zeros_like(self.dl), where=self.length[:,np.newaxis]>0)
+        for n in range(nodes):
+            idx = self.order[self.start[n]:self.stop[n]]
+            d = self.midpoint[idx] - self.center[n]
+            L = self.length[idx]
+            wdl = self.W[idx,:,np.newaxis]*self.dl[idx,np.newaxis,:]
+            # averages of the offset and of its square along the segments
+            Q = ( d[:,:,np.newaxis]*d[:,np.newaxis,:] + (L**2/12)[:,np.newaxis,np.newaxis]*u[idx,:,np.newaxis]*u[idx,np.newaxis,:] )/2
+            self.M[n,:,:,0] = np.sum(wdl, axis=0)
+            self.M[n,:,:,1:4] = np.einsum('jcb,jk->cbk', wdl, d)
+            self.M[n,:,:,4:] = np.einsum('jcb,jk->cbk', wdl, np.reshape(Q, (-1, 9)))
+            self.A[n] = np.abs(self.W[idx]).T @ L
+        self.M = np.reshape(self.M, (nodes, cols*3, 13))
+
+    def interactions(self, X, h, theta):
+        """Split the interactions of targets with the tree into far nodes and near segments.
+
+        Args:
+            X (np.ndarray): (targets x 3) target points (midpoints of target segments).
+            h (np.ndarray): (targets) half lengths of the target segments, zeros for points.
+            theta (float): Opening angle, see opening_angle.
+
+        Returns:
+            tuple: Far pairs (target indices, node indices) and near pairs (target indices,
+                segment indices).
+        """
+        far_t = []
+        far_n = []
+        near_t = []
+        near_n = []
+        t = np.arange(X.shape[0]) if self.center.shape[0] > 0 else np.zeros(0, dtype=int)
+        n = np.zeros(t.shape, dtype=int)
+        while t.size > 0:
+            r = np.linalg.norm(X[t] - self.center[n], axis=1)
+            far = self.radius[n] + h[t] < theta*r
+            far_t.append(t[far])
+            far_n.append(n[far])
+            [t, n] = [t[~far], n[~far]]
+            leaf = self.child_ptr[n+1] == self.child_ptr[n]
+            near_t.append(t[leaf])
+            near_n.append(n[leaf])
+            [t, n] = [t[~leaf], n[~leaf]]
+            counts = self.child_ptr[n+1] - self.child_ptr[n]
+            t = np.repeat(t, counts)
+            n = self.child_idx[_ranges(self.child_ptr[n], counts)]
+
+        near_t = np.concatenate(near_t + [np.zeros(0, dtype=int)])
+        near_n = np.concatenate(near_n + [np.zeros(0, dtype=int)])
+        counts = self.stop[near_n] - self.start[near_n]
+        near_j = self.order[_ranges(self.start[near_n], counts)]
+        return (np.concatenate(far_t + [np.zeros(0, dtype=int)]), np.concatenate(far_n + [np.zeros(0, dtype=int)]),
+                np.repeat(near_t, counts), near_j)
+
+    def far_field(self, X, u, h, far_t, far_n):
+        """Field of the far nodes at the targets, averaged along the target segments.
+
+        Args:
+            X (np.ndarray): (targets x 3) target points (midpoints of target segments).
+            u (np.ndarray): (targets x 3) unit directions of the target segments, any for points.
+            h (np.ndarray): (targets) half lengths of the target segments, zeros for points.
+            far_t (np.ndarray): Target indices of the far pairs.
+            far_n (np.ndarray): Node indices of the far pairs.
+
+        Returns:
+            tuple: (targets x columns x 3) field of unit column currents and the (targets x columns)
+                bound on the norm of its error.
+        """
+        cols = self.W.shape[1]
+        B = np.zeros((X.shape[0], cols, 3))
+        bound = np.zeros((X.shape[0], cols))
+        # pairs of one node are applied together, as one product with the node moments
+        sort = np.argsort(far_n, kind='stable')
+        far_t = far_t[sort]
+        far_n = far_n[sort]
+        for k in range(0, far_t.size, PAIR_BLOCK):
+            t = far_t[k:k+PAIR_BLOCK]
+            n = far_n[k:k+PAIR_BLOCK]
+            R = X[t] - self.center[n]
+            r = np.linalg.norm(R, axis=1)
+            D = _expansion(R, r, u[t], h[t])
+            V = np.zeros((t.size, 3, cols*3))
+            runs = np.concatenate([[0], np.flatnonzero(np.diff(n)) + 1, [t.size]])
+            for (lo, hi) in zip(runs[:-1], runs[1:]):
+                V[lo:hi] = np.tensordot(D[lo:hi], self.M[n[lo]], axes=([1], [1]))
+            # v[p,i,c,b]: component i of the field direction weighted by component b of the current elements
+            v = np.reshape(V, (t.size, 3, cols, 3))
+            Bk = 1e-7*np.stack([v[:,2,:,1] - v[:,1,:,2], v[:,0,:,2] - v[:,2,:,0], v[:,1,:,0] - v[:,0,:,1]], axis=-1)
+            # third order remainder, |d3 f| <= 24/r**5 along any direction
+            e = self.radius[n] + h[t]
+            bk = 1e-7*self.A[n]*(4*e**3/(r - e)**5)[:,np.newaxis]
+            for c in range(cols):
+                for a in range(3):
+                    B[:,c,a] += np.bincount(t, Bk[:,c,a], minlength=X.shape[0])
+                bound[:,c] += np.bincount(t, bk[:,c], minlength=X.shape[0])
+        return B, bound
+
+
+def _ranges(starts, counts):
+    # concatenated aranges starts[i]:starts[i]+counts[i]
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(np.sum(counts))
+
+
+def _expansion(R, r, u, h):
+    # (pairs x 13 x 3) terms of f(R - e), f = R/r**3 the field direction of a current element, expanded in the 
+    # offset e: f - J e + H[e,e]/2 with the target segment spread h**2/6*H[u,u] added to f, rows follow Octree.M
+    s = R/r[:,np.newaxis]
+    r3 = r[:,np.newaxis,np.newaxis]**3
+    r4 = r[:,np.newaxis,np.newaxis]**4
+    D = np.zeros((R.shape[0], 13, 3))
+    # -J[k,i] = (3 s_k s_i - delta_ki)/r**3
+    ss = s[:,:,np.newaxis]*s[:,np.newaxis,:]
+    D[:,1:4] = ( 3*ss - np.eye(3) )/r3
+    # H[k,l,i] = (15 s_k s_l s_i - 3 (delta_kl s_i + delta_ki s_l + delta_li s_k))/r**4
+    H = 15*ss[:,:,:,np.newaxis]*s[:,np.newaxis,np.newaxis,:]
+    for k in range(3):
+        H[:,k,k,:] -= 3*s
+        H[:,k,:,k] -= 3*s
+        H[:,:,k,k] -= 3*s
+    D[:,4:] = np.reshape(H, (-1, 9, 3))/r4
+    # H[u,u] = (15 (s.u)**2 s - 3 (u.u) s - 6 (s.u) u)/r**4
+    su = np.sum(s*u, axis=1)[:,np.newaxis]
+    uu = np.sum(u*u, axis=1)[:,np.newaxis]
+    Huu = ( 15*su**2*s - 3*uu*s - 6*su*u )/r4[:,:,0]
+    D[:,0] = R/r[:,np.newaxis]**3 + (h**2/6)[:,np.newaxis]*Huu
+    return D
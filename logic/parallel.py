@@ -0,0 +1,131 @@
+"""Process pool evaluation of kernel tiles over arrays in shared memory.
+
+The solver kernels split their pair spaces (field points x segments, segments x segments)
+into tiles. With several workers the input arrays are copied once into
+multiprocessing.shared_memory blocks, the workers attach to them without copying and
+evaluate tiles, and the partial sums come back in task order, so the caller reduces them in
+the same order as the serial loop and gets bit-identical results.
+
+Tile completion can be reported to a callback registered for the calling thread, which also
+lets a caller running the solver in a background thread abandon it between tiles.
+
+Typical usage:
+    >>> for task, part in zip(tasks, map_tiles(tile_function, tasks, {'X': X, 'Y': Y}, workers=8)):
+    ...     total[task] += part
+    >>> with reporting(lambda done, total: print(done, '/', total)):
+    ...     results = solution.solve(geometry, excitation)
+"""
+
+import numpy as np
+import threading
+from contextlib import contextmanager
+
+# arrays attached by a worker process, by name
+_arrays = {}
+_blocks = []
+# progress callback of the calling thread
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """Raised by a progress callback to abandon the running computation."""
+
+
+@contextmanager
+def reporting(callback):
+    """Report the tiles evaluated by map_tiles in this thread to callback.
+
+    Args:
+        callback (callable): Called as callback(done, total) after every tile of a map_tiles
+            call. It may raise (e.g. Cancelled) to abandon the computation, the exception
+            propagates out of map_tiles. None disables reporting.
+    """
+    previous = getattr(_local, 'callback', None)
+    _local.callback = callback
+    try:
+        yield
+    finally:
+        _local.callback = previous
+
+
+def map_tiles(function, tasks, arrays, workers = None):
+    """Evaluate function(arrays, task) for every task, results in task order.
+
+    Every evaluated tile is reported to the callback registered with reporting by the
+    calling thread.
+
+    Args:
+        function (callable): Module level function (it is sent to the workers by reference)
+            taking the dict of arrays and one task.
+        tasks (list): Tile descriptions, each must be picklable.
+        arrays (dict[str, np.ndarray]): Read-only inputs shared by all tiles.
+        workers (int, optional): Number of worker processes. None or 1 evaluates the tiles
+            lazily in this process. The workers are started by a fork server (spawned where
+            there is none), so a script calling this needs an if __name__ == "__main__" guard.
+
+    Returns:
+        Iterable of the tile results in the order of tasks.
+    """
+    callback = getattr(_local, 'callback', None)
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        return _reported((function(arrays, task) for task in tasks), len(tasks), callback)
+
+    # the process pool modules are imported on first use, serial solves do not load them
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    blocks = []
+    try:
+        specs = {}
+        for name, A in arrays.items():
+            A = np.ascontiguousarray(A)
+            shm = shared_memory.SharedMemory(create=True, size=max(A.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(A.shape, A.dtype, buffer=shm.buf)[...] = A
+            specs[name] = (shm.name, A.shape, A.dtype.str)
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=_context(multiprocessing), 
+                                   initializer=_attach, initargs=(specs,))
+        try:
+            chunk = max(1, len(tasks)//(4*workers))
+            results = list(_reported(pool.map(_evaluate, [function]*len(tasks), tasks, chunksize=chunk), len(tasks), callback))
+        except BaseException:
+            # a cancelled (or failed) computation drops the queued tiles instead of waiting for them,
+            # the workers exit after their running tiles
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+        return results
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def _context(multiprocessing):
+    # workers are not forked from the caller: a fork copies the threads of the numba (and BLAS) pools 
+    # in an unusable state and the interpreter hangs at exit, forkserver forks from a clean process
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _reported(results, total, callback):
+    # results passed through, callback told after each one
+    for done, result in enumerate(results, 1):
+        yield result
+        if callback is not None:
+            callback(done, total)
+
+
+def _attach(specs):
+    # worker initializer: read-only views of the shared blocks, the creating process unlinks them
+    from multiprocessing import shared_memory
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _blocks.append(shm)
+        A = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        A.flags.writeable = False
+        _arrays[name] = A
+
+
+def _evaluate(function, task):
+    return function(_arrays, task)
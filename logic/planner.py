@@ -0,0 +1,238 @@
+"""Estimates of the memory and runtime of a solve and choice of the strategy that fits.
+
+solution.solve() runs the same time-separable computation in several ways: its geometric
+kernels are evaluated in one block per axis group (dense, max_bytes=None), in tiles bounded by
+max_bytes (tiled), in tiles shared by a process pool (parallel, workers > 1) or by the compiled
+kernels (numba, backend="numba"); the histories of the fields (points x T) and of the forces
+(masks x T) are allocated in full by all of them. The estimates below model the largest block of
+pair temporaries, the histories and the pool or compiler overheads, so a caller can pick the
+fastest strategy that fits the free memory before starting a solve that would swap or fail.
+
+The rates are calibrated on the scaling suite of benchmark.py (one core, NumPy 2 and numba 0.6x)
+and describe a solve with an empty kernel cache; rerun the suite and update them when the
+kernels change.
+
+Typical usage:
+    >>> chosen = plan(geometry, excitation)
+    >>> if not chosen.fits:
+    ...     print('may run out of memory:', chosen)
+    >>> results = solution.solve(geometry, excitation, **chosen.options)
+"""
+
+import importlib.util
+import math
+import os
+import sys
+import numpy as np
+from typing import Final
+
+import logic.solution as solution
+
+# kernel pairs evaluated per second and core: Biot-Savart (field point x segment), Ampere
+# (segment x segment for NumPy, mask segment x segment for numba)
+PAIR_RATES : Final = {'numpy': {'biotsavart3d': 5e7, 'ampere3d': 1.1e7},
+                      'numba': {'biotsavart3d': 5e7, 'ampere3d': 2.2e7}}
+# NumPy blocks of pair temporaries larger than BLOCK_BYTES run out of the CPU caches, slower by BLOCK_PENALTY
+BLOCK_BYTES : Final = 32*2**20
+BLOCK_PENALTY : Final = {'biotsavart3d': 3.0, 'ampere3d': 1.5}
+# bytes of temporaries per pair of a NumPy block (solution.PAIR_TEMPS floats bound them when tiling)
+PAIR_BYTES : Final = {'biotsavart3d': 64, 'ampere3d': 112}
+TILE_SECONDS : Final = {'biotsavart3d': 7.5e-5, 'ampere3d': 3.5e-4} # overhead of one NumPy tile
+TILE_BYTES : Final = 8*2**20 # tile budget of the tiled strategy, the fastest of 0.25-64 MiB tiles in the benchmark
+FIELD_STEP_SECONDS : Final = 1e-8 # per field point, time step and phase
+FORCE_STEP_SECONDS : Final = 8e-9 # per mask, time step and phase pair
+ENVELOPE_STEP_SECONDS : Final = 3.5e-9 # per field point, time step and phase when no history is stored
+FIELD_HISTORIES : Final = 6 # points x T arrays alive while the fields are built (5 kept)
+POOL_START_SECONDS : Final = 0.02 # per process pool, a solve starts one for the fields and one for the forces
+WORKER_BYTES : Final = 32*2**20 # private memory of a worker process
+NUMBA_START_SECONDS : Final = 0.5 # import of numba and load of the compiled kernels, once per process
+NUMBA_START_BYTES : Final = 72*2**20
+MIN_TILE_BYTES : Final = 2**20 # smallest tile budget offered, below it the tile overhead dominates
+
+
+class Strategy:
+    """Solver options of a strategy with their estimated cost.
+
+    Attributes:
+        name (str): 'dense', 'tiled', 'parallel' or 'numba'.
+        options (dict): Keyword arguments of solution.solve() and solution.solveEnvelope()
+            (max_bytes, workers, backend).
+        memory_bytes (int): Estimated peak of the memory allocated by the solve.
+        seconds (float): Estimated wall time of the solve.
+        fits (bool): Whether memory_bytes is within the memory limit of the plan.
+    """
+
+    def __init__(self, name, options, memory_bytes, seconds, fits = True):
+        self.name = name
+        self.options = options
+        self.memory_bytes = memory_bytes
+        self.seconds = seconds
+        self.fits = fits
+
+    def asdict(self):
+        return {'strategy': self.name, 'options': self.options, 'memory_bytes': self.memory_bytes,
+                'seconds': self.seconds, 'fits': self.fits}
+
+    def __str__(self):
+        options = ', '.join('%s=%s' % item for item in self.options.items())
+        return '%s (%s): %.1f MB, %.2f s' % (self.name, options, self.memory_bytes/2**20, self.seconds)
+
+
+def available_memory():
+    """Return the memory available to a new allocation [bytes], or None when unknown."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1])*1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def estimate(geometry, excitation, max_bytes = None, workers = None, backend = None, envelope = False):
+    """Estimate the peak memory and the wall time of solution.solve() with the given options.
+
+    Args:
+        geometry (Geometry): Geometry of the solve.
+        excitation (Excitation): Excitation with its branch currents.
+        max_bytes (int, optional): Tile budget of the kernels, as in solution.solve().
+        workers (int, optional): Process pool size, as in solution.solve().
+        backend (str, optional): Kernel backend, None reads SOLUTION_BACKEND.
+        envelope (bool, optional): Estimate solution.solveEnvelope() instead, which keeps one
+            time chunk instead of the histories. Defaults to False.
+
+    Returns:
+        tuple: (memory_bytes, seconds).
+    """
+    backend = os.environ.get(solution.BACKEND_ENV_VAR, "numpy") if backend is None else backend
+    if backend == "numba" and importlib.util.find_spec('numba') is None:
+        backend = "numpy"
+    [P, T] = excitation.I.shape
+    points = geometry.X.size
+    masks = geometry.NF.shape[0] if geometry.NF.size > 0 else 0
+    G = np.bincount(geometry.NA[geometry.NA >= 0].astype(int), minlength=3)
+    pair = solution.PAIR_TEMPS*solution.FLOAT_BYTES
+    step = solution.FLOAT_BYTES*T
+
+    # histories: Bx, By, Bz, Btr, Bmag with the temporaries of |B|, then Fx, Fy, Fz with the
+    # (masks x phases x T) temporaries of the quadratic forms, tiled in time by max_bytes
+    fields = FIELD_HISTORIES*points*step
+    forces = 3*masks*step + min(2*masks*P*step, math.inf if max_bytes is None else max_bytes)
+    kept = (FIELD_HISTORIES - 1)*points*step
+    if envelope:
+        # one time chunk of fields and forces, the kernels are evaluated before it
+        item = (4*points + 9*masks + P*P)*solution.FLOAT_BYTES
+        chunk = item*min(T, max((solution.ENVELOPE_CHUNK_BYTES if max_bytes is None else max_bytes)//item, 1))
+        (fields, forces, kept) = (chunk, chunk, 0)
+    apply = (ENVELOPE_STEP_SECONDS if envelope else FIELD_STEP_SECONDS)*points*T*P + FORCE_STEP_SECONDS*masks*T*P*P
+
+    biot_pairs = points*int(G.sum())
+    if backend == "numba":
+        ampere_pairs = int(np.count_nonzero(np.any(geometry.NF != 0, axis=0)))*int(G.sum()) if masks else 0
+        rates = PAIR_RATES['numba']
+        cpus = os.cpu_count() or 1
+        # the compiled kernels hold no pair temporaries, the Ampere one a (segments x masks x 3 x phases) array
+        started = 'logic.kernels_numba' in sys.modules
+        memory = max(fields, kept + forces + 3*geometry.XS.size*masks*P*solution.FLOAT_BYTES) + (0 if started else NUMBA_START_BYTES)
+        seconds = (biot_pairs/rates['biotsavart3d'] + ampere_pairs/rates['ampere3d'])/cpus + apply + (0 if started else NUMBA_START_SECONDS)
+        return int(memory), seconds
+
+    # blocks of pairs per axis group: field points x segments along a, segments along a1 x along a2
+    blocks = {'biotsavart3d': [points*g for g in G], 'ampere3d': [g1*g2 for g1 in G for g2 in G] if masks else []}
+    pool = workers is not None and workers > 1
+    tile_bytes = solution.PARALLEL_TILE_BYTES if (max_bytes is None and pool) else max_bytes
+    rates = PAIR_RATES['numpy']
+    memory = 0
+    seconds = apply
+    for (name, sizes) in blocks.items():
+        # pairs of the tiles of every block, sized by the tile budget of the kernels
+        tiled = [(n, n if tile_bytes is None else max(min(n, tile_bytes//pair), 1)) for n in sizes if n > 0]
+        tile = PAIR_BYTES[name]*max((m for (n, m) in tiled), default=0)
+        tiles = 0
+        compute = 0
+        for (n, m) in tiled:
+            tiles += math.ceil(n/m)
+            compute += n/rates[name]*(BLOCK_PENALTY[name] if PAIR_BYTES[name]*m > BLOCK_BYTES else 1)
+        compute += TILE_SECONDS[name]*tiles
+        if pool and tiles > 0:
+            busy = min(workers, tiles, os.cpu_count() or 1)
+            tile = min(workers, tiles)*(tile + WORKER_BYTES)
+            compute = compute/busy + POOL_START_SECONDS
+        # the fields kernel runs before any history is allocated, the forces kernel after the fields
+        memory = max(memory, tile if name == 'biotsavart3d' else kept + tile)
+        seconds += compute
+    memory = max(memory, fields, kept + forces)
+    return int(memory), seconds
+
+
+def strategies(geometry, excitation, memory_limit = None, workers = None, envelope = False):
+    """Estimate the strategies available for a solve.
+
+    Args:
+        geometry (Geometry): Geometry of the solve.
+        excitation (Excitation): Excitation with its branch currents.
+        memory_limit (int, optional): Memory the solve may use [bytes], sizes the tiles of the
+            tiled and parallel strategies. None means no limit.
+        workers (int, optional): Process pool size of the parallel strategy. Defaults to the
+            CPU count, which gives no parallel strategy on one core.
+        envelope (bool, optional): Strategies of solution.solveEnvelope() instead of
+            solution.solve(). Defaults to False.
+
+    Returns:
+        list[Strategy]: dense, tiled, then parallel and numba when they apply; a backend set
+            by SOLUTION_BACKEND excludes the strategies of the other one.
+    """
+    limit = math.inf if memory_limit is None else memory_limit
+    workers = os.cpu_count() if workers is None else workers
+    T = excitation.I.shape[1]
+    masks = geometry.NF.shape[0] if geometry.NF.size > 0 else 0
+    # budget left to the kernel tiles besides the kept histories
+    budget = limit if envelope else limit - (FIELD_HISTORIES - 1)*geometry.X.size*solution.FLOAT_BYTES*T - 3*masks*solution.FLOAT_BYTES*T
+
+    configured = os.environ.get(solution.BACKEND_ENV_VAR)
+
+    options = []
+    if configured != 'numba':
+        options.append(('dense', {'max_bytes': None, 'workers': None, 'backend': 'numpy'}))
+        options.append(('tiled', {'max_bytes': int(max(min(budget, TILE_BYTES), MIN_TILE_BYTES)), 'workers': None, 'backend': 'numpy'}))
+        if workers is not None and workers > 1:
+            share = budget/workers - WORKER_BYTES
+            max_bytes = None if share >= solution.PARALLEL_TILE_BYTES else int(max(share, MIN_TILE_BYTES))
+            options.append(('parallel', {'max_bytes': max_bytes, 'workers': workers, 'backend': 'numpy'}))
+    if configured != 'numpy' and importlib.util.find_spec('numba') is not None:
+        options.append(('numba', {'max_bytes': None, 'workers': None, 'backend': 'numba'}))
+
+    found = []
+    for (name, kwargs) in options:
+        (memory_bytes, seconds) = estimate(geometry, excitation, **kwargs, envelope=envelope)
+        found.append(Strategy(name, kwargs, memory_bytes, seconds, memory_bytes <= limit))
+    return found
+
+
+def plan(geometry, excitation, memory_limit = None, workers = None, envelope = False):
+    """Choose the fastest strategy of a solve that fits the memory limit.
+
+    Args:
+        geometry (Geometry): Geometry of the solve.
+        excitation (Excitation): Excitation with its branch currents.
+        memory_limit (int, optional): Memory the solve may use [bytes]. Defaults to the
+            available memory, no limit when it is unknown.
+        workers (int, optional): Process pool size of the parallel strategy. Defaults to the
+            CPU count.
+        envelope (bool, optional): Plan solution.solveEnvelope() instead of solution.solve().
+            Defaults to False.
+
+    Returns:
+        Strategy: The fastest fitting strategy, else the one needing the least memory with
+            fits False, so the caller can warn before starting it.
+    """
+    memory_limit = available_memory() if memory_limit is None else memory_limit
+    found = strategies(geometry, excitation, memory_limit, workers, envelope)
+    fitting = [s for s in found if s.fits]
+    if fitting:
+        return min(fitting, key=lambda s: s.seconds)
+    return min(found, key=lambda s: (s.memory_bytes, s.seconds))
@@ -2,13 +2,20 @@ import numpy as np
 import colorsys
 import matplotlib as mpl
 import matplotlib.colors as mcolors
-mpl.rcParams['axes3d.mouserotationstyle'] = 'trackball' # , 'trackball', 'azel', 'sphere', or 'arcball'
-    
-import matplotlib.pyplot as plt
+import functools
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 from numpy import log10
 from logic.geometry import Geometry
 from logic.excitation import Excitation
 from logic.solution import Results
+from typing import Final
+
+RENDER_SIZE : Final = (12.8, 7.2) # inches of the figures written by saveResults
+RENDER_DPI : Final = 100
 
 def change_lightness(color, lightness=0.5):    
     """"
@@ -36,9 +43,7 @@ def change_lightness(color, lightness=0.5):
 
 
 
-def annot_abs_max(x, f, ax: plt.Axes ):
-    (xmax, xmin) = ax.get_xlim()
-    (ymax, ymin) = ax.get_ylim()
+def annot_abs_max(x, f, ax: Axes ):
     C = f.shape[0]
     xa = np.zeros(C)
     ya = np.zeros(C)
@@ -50,6 +55,7 @@ def annot_abs_max(x, f, ax: plt.Axes ):
     imax =  np.argmax(ya)
     imin =  np.argmin(ya)
     mid = abs(ya[i]-ya[imax])<abs(ya[i]-ya[imin])
+    annotations = []
     for i in range(C):
         text= "{:.3f}| t = {:.3f}".format(ya[i], xa[i])
         fc = mcolors.to_rgba('white')
@@ -63,97 +69,108 @@ def annot_abs_max(x, f, ax: plt.Axes ):
                 ha="right" if i==imin else ( "left" if i==imax else ( "right" if mid else "left" ) ),
                 va="bottom" if i==imin else ( "top" if i==imax else ( "bottom" if mid else "top" ) ),
                 xytext=(  15 * (-1 if i==imin else ( 1 if i==imax else ( -1 if mid else 1 ) ) )  , 15*(-1 if i==imin else ( 1 if i==imax else ( -1 if mid else 1 ) ) ) ) )
-        ax.annotate(text, xy=(xa[i], ya[i]),  **kw )
+        annotations.append( ax.annotate(text, xy=(xa[i], ya[i]),  **kw ) )
+    return annotations
+    
+def time_markers(T):
+    # samples are marked on non-uniform time grids, straight lines between them would hide the sparse parts
+    uniform = T.shape[0] < 3 or np.allclose(np.diff(T), T[1]-T[0])
+    return {} if uniform else dict(marker='.', markersize=4)
     
-def plotCurrent(e : Excitation, ax : plt.Axes, fig : plt.Figure = None):
-    ax.set_xlim([e.T[0],e.T[-1]])
-    ax.grid(True)
-    colors = ['r', 'b', 'g']; labels = ['A', 'B', 'C']
-    C = e.I.shape[0]
+# widest y tick label of a set of label texts, measured once
+_tick_widths = {}
 
-    for i in range(C):
-        ax.plot(e.T, e.I[i,:]/1000 ,colors[i]+'-', linewidth=2.0)
-            
-    if not fig == None:
+def label_pad(ax : Axes, fig : Figure = None):
+    # pad placing the y label over the tick labels
+    if fig == None:
+        return 0
+    labels = [ label for label in ax.get_yticklabels() if label.get_text() ]
+    key = (fig.dpi,) + tuple( label.get_text() for label in labels )
+    if key not in _tick_widths:
         renderer = fig.canvas.get_renderer()
-        tick_widths = [
-            label.get_window_extent(renderer).width for label in ax.get_yticklabels() if label.get_text()
-        ]
-        max_tick_width = max(tick_widths) if tick_widths else 0
-        labelpad = -max_tick_width-10   # Convert from points to inches
+        _tick_widths[key] = max( [ label.get_window_extent(renderer).width for label in labels ], default=0 )
+    return -_tick_widths[key]-10
+
+def plot_lines(ax : Axes, X, Y, colors, labels, artists = None, **kw):
+    # lines of the rows of Y, artists of a previous call on the same axes are updated with set_data
+    C = Y.shape[0]
+    if not artists == None and not len(artists['lines']) == C:
+        ax.cla()
+        artists = None
+    if artists == None:
+        ax.grid(True)
+        artists = dict(lines = [ ax.plot(X, Y[i,:] ,colors[i]+'-', linewidth=2.0, **kw)[0] for i in range(C) ], annotations = [])
+        ax.legend(labels[0:C], loc = 'upper right') 
     else:
-        labelpad = 0
-        
-    ax.set_ylabel("current [kA] ", loc="top", labelpad=labelpad)
-    ax.legend(labels[0:C], loc = 'upper right') 
+        for line, y in zip(artists['lines'], Y):
+            line.set_data(X, y)
+            line.set_marker(kw.get('marker', 'None'))
+            line.set_markersize(kw.get('markersize', mpl.rcParams['lines.markersize']))
+        ax.relim()
+        ax.autoscale_view()
+    ax.set_xlim([X[0],X[-1]])
+    for annotation in artists['annotations']:
+        annotation.remove()
+    artists['annotations'] = []
+    return artists
+    
+def plotCurrent(e : Excitation, ax : Axes, fig : Figure = None, artists = None):
+    # artists returned by a previous call on the same axes are updated in place
+    artists = plot_lines(ax, e.T, e.I/1000, ['r', 'b', 'g'], ['A', 'B', 'C'], artists, **time_markers(e.T))
+    ax.set_ylabel("current [kA] ", loc="top", labelpad=label_pad(ax, fig))
     
-    annot_abs_max(e.T[(e.T<20)*(e.T> 0)], e.I[:,(e.T<20)*(e.T> 0)]/1000, ax)
+    artists['annotations'] += annot_abs_max(e.T[(e.T<20)*(e.T> 0)], e.I[:,(e.T<20)*(e.T> 0)]/1000, ax)
     if (max(e.T)>40):
-        annot_abs_max(e.T[(e.T<40)*(e.T> 20)], e.I[:,(e.T<40)*(e.T> 20)]/1000, ax)
+        artists['annotations'] += annot_abs_max(e.T[(e.T<40)*(e.T> 20)], e.I[:,(e.T<40)*(e.T> 20)]/1000, ax)
     if (max(e.T)>60):
-        annot_abs_max(e.T[(e.T<60)*(e.T> 40)], e.I[:,(e.T<60)*(e.T> 40)]/1000, ax)
+        artists['annotations'] += annot_abs_max(e.T[(e.T<60)*(e.T> 40)], e.I[:,(e.T<60)*(e.T> 40)]/1000, ax)
+    return artists
 
-def plotVoltagePhase(e : Excitation, ax : plt.Axes, fig : plt.Figure = None):
-    ax.set_xlim([e.TU[0],e.TU[-1]])
-    ax.grid(True)
-    colors = ['r', 'b', 'g']; labels = ['UA', 'UB', 'UC']
-    C = e.U.shape[0]
-
-    for i in range(C):
-        ax.plot(e.TU, e.U[i,:] ,colors[i]+'-', linewidth=2.0)
-            
-    if not fig == None:
-        renderer = fig.canvas.get_renderer()
-        tick_widths = [
-            label.get_window_extent(renderer).width for label in ax.get_yticklabels() if label.get_text()
-        ]
-        max_tick_width = max(tick_widths) if tick_widths else 0
-        labelpad = -max_tick_width-10   # Convert from points to inches
-    else:
-        labelpad = 0
-        
-    ax.set_ylabel("phase voltage [a.u.] ", loc="top", labelpad=labelpad)
-    ax.legend(labels[0:C], loc = 'upper right') 
-    
+def plotVoltagePhase(e : Excitation, ax : Axes, fig : Figure = None, artists = None):
+    artists = plot_lines(ax, e.TU, e.U, ['r', 'b', 'g'], ['UA', 'UB', 'UC'], artists)
+    ax.set_ylabel("phase voltage [a.u.] ", loc="top", labelpad=label_pad(ax, fig))
+    return artists
     
-def plotVoltageLinear(e : Excitation, ax : plt.Axes, fig : plt.Figure = None):
-    ax.set_xlim([e.TU[0],e.TU[-1]])
-    ax.grid(True)
-    colors = ['r', 'b', 'g']; labels = ['Uab', 'Ubc', 'Uca']
+def plotVoltageLinear(e : Excitation, ax : Axes, fig : Figure = None, artists = None):
     C = e.U.shape[0]
-
-    for i in range(C):
-        ax.plot(e.TU, e.U[i,:]-e.U[(i+1)%C,:] ,colors[i]+'-', linewidth=2.0)
-            
-    if not fig == None:
-        renderer = fig.canvas.get_renderer()
-        tick_widths = [
-            label.get_window_extent(renderer).width for label in ax.get_yticklabels() if label.get_text()
-        ]
-        max_tick_width = max(tick_widths) if tick_widths else 0
-        labelpad = -max_tick_width-10   # Convert from points to inches
-    else:
-        labelpad = 0
-        
-    ax.set_ylabel("line voltage [a.u.] ", loc="top", labelpad=labelpad)
-    ax.legend(labels[0:C], loc = 'upper right') 
+    artists = plot_lines(ax, e.TU, e.U - e.U[(np.arange(C)+1)%C,:], ['r', 'b', 'g'], ['Uab', 'Ubc', 'Uca'], artists)
+    ax.set_ylabel("line voltage [a.u.] ", loc="top", labelpad=label_pad(ax, fig))
+    return artists
 
 def field_colors( M ):
-    cmap = mpl.cm.get_cmap('Set1')
+    cmap = mpl.colormaps['Set1']
     return [ cmap(k) for k in range(M) ]
 
 def force_colors( P, R ):
     cmap_name = ['Reds', 'Blues', 'Greens', 'Greys']
-    cmap = mpl.cm.get_cmap(cmap_name[P])      
+    cmap = mpl.colormaps[cmap_name[P]]      
     return [ cmap(0.33 + 0.66/R/2 + 0.66/R*i ) for i in range(R) ]
 
 
-def plotGeometry(g : Geometry, ax : plt.Axes):
+def plotGeometry(g : Geometry, ax : Axes, artists = None):
+    # the view is a few batched artists (field points, segments, phase lines, force masks, arrows), 
+    # passing the artists returned by a previous call on the same axes updates them in place
+    # instead of clearing the axes, so redrawing costs about the same for any number of segments
+    created = artists is None
+    if created:
+        artists = dict(
+            points   = ax.scatter([], [], [], marker='d', depthshade=False),
+            masks    = [],
+            segments = ax.add_collection3d(Line3DCollection([], color='k', linewidth=1), autolim=False),
+            ends     = ax.scatter([], [], [], marker='o', color='k', s=25, depthshade=False),
+            phases   = ax.add_collection3d(Line3DCollection([], linewidth=2, linestyle=':'), autolim=False),
+            arrows   = None)
+    
+    S = np.stack((g.XS, g.YS, g.ZS), axis=-1)
+    E = np.stack((g.XE, g.YE, g.ZE), axis=-1)
+    segments = np.stack((S, E), axis=1)
+    
     M = g.X.shape[0]
-    colors = field_colors(M)    
-    for x0, y0, z0, nc in zip(g.X, g.Y, g.Z, np.arange(0, M) ):
-        ax.plot([x0], [y0], [z0], marker='d', color=colors[nc])
+    artists['points'].set_offsets(np.stack((g.X, g.Y), axis=-1))
+    artists['points'].set_3d_properties(g.Z, 'z')
+    artists['points'].set_color(field_colors(M))
     
+    masks = []
     if len(g.NF)>0:            
         [_, nc] = np.meshgrid(np.linspace(1,g.NF.shape[0], g.NF.shape[0])-1  ,g.NP, indexing='ij')
         nc = nc.reshape(g.NF.shape[0], g.NP.shape[0])
@@ -168,42 +185,103 @@ def plotGeometry(g : Geometry, ax : plt.Axes):
         for i in range(len(N)):        
             c = int(N[i])-C0
             r = int((N[:i]==N[i]).sum())        
-            color = colors[c][r]
-            for x1, y1, z1, x2, y2, z2, nc, a in zip(g.XS, g.YS, g.ZS, g.XE, g.YE, g.ZE, g.NP, g.NF[i]):           
-                if a:
-                    ax.plot([x1, x2], [y1, y2], [z1, z2], color=color, alpha=0.7, linewidth=10, ls ="-")
+            masks.append( (segments[g.NF[i]!=0], colors[c][r]) )
+    # one collection per mask, created or dropped when the number of masks changes
+    for collection in artists['masks'][len(masks):]:
+        collection.remove()
+    artists['masks'] = artists['masks'][:len(masks)]
+    while len(artists['masks']) < len(masks):
+        artists['masks'].append( ax.add_collection3d(Line3DCollection([], alpha=0.7, linewidth=10, linestyle='-'), autolim=False) )
+    for collection, (lines, color) in zip(artists['masks'], masks):
+        collection.set_segments(lines)
+        collection.set_color(color)
     
-    C = g.getCircuitPhaseCount() #int(max(g.NP)-min(g.NP)) + 1
+    colors = [ "rbg"[int(nc)%3] for nc in g.NP ]
+    artists['segments'].set_segments(segments)
+    ends = np.concatenate((S, E))
+    artists['ends'].set_offsets(ends[:,:2])
+    artists['ends'].set_3d_properties(ends[:,2], 'z')
+    artists['phases'].set_segments(segments)
+    artists['phases'].set_color(colors)
+    
+    # arrows are sized by the view of the field points and the force masks, then all segments are shown
+    XYZ = np.concatenate([np.stack((g.X, g.Y, g.Z), axis=-1)] + [np.reshape(lines, (-1, 3)) for (lines, _) in masks])
+    ax.auto_scale_xyz(XYZ[:,0], XYZ[:,1], XYZ[:,2], had_data=False)
     sizeX = np.diff(ax.get_xlim())[0]
     sizeY = np.diff(ax.get_ylim())[0]
     sizeZ = np.diff(ax.get_zlim())[0]
-    size = ( sizeX**2 +  sizeY**2 +  sizeZ**2)**0.5
-    for x1, y1, z1, x2, y2, z2, nc, ncprev, ncnext in zip(g.XS, g.YS, g.ZS, g.XE, g.YE, g.ZE, g.NP, np.concatenate(([-1],g.NP[:-1])), np.concatenate((g.NP[1:],[g.NP[-1]+1])) ):
-        color="rbg"[int(nc)%3]
-        ax.plot([x1, x2], [y1, y2], [z1, z2], marker='o', color='k'  , linewidth=1, markersize = 5)
-        ax.plot([x1, x2], [y1, y2], [z1, z2],             color=color, linewidth=2, ls=':')
-        l = (((x2-x1)/sizeX)**2 + ((y2-y1)/sizeY)**2 + ((z2-z1)/sizeZ)**2)**0.5
-        ax.quiver((x2+x1)/2, (y2+y1)/2, (z2+z1)/2, 0.01*(x2-x1)/l*sizeX, 0.01*(y2-y1)/l*sizeY, 0.01*(z2-z1)/l*sizeZ, fc='none', ec=color, ls='-', linewidth=2, arrow_length_ratio = 10, axlim_clip=False, normalize = False)
-
+    XYZ = np.concatenate((S, E))
+    ax.auto_scale_xyz(XYZ[:,0], XYZ[:,1], XYZ[:,2], had_data=True)
     
+    D = E - S
+    l = ((D[:,0]/sizeX)**2 + (D[:,1]/sizeY)**2 + (D[:,2]/sizeZ)**2)**0.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        U = np.nan_to_num(0.01*D/l[:,np.newaxis]*np.array([sizeX, sizeY, sizeZ]))
+    # all arrows in one quiver, its lines are the shafts followed by the left and the right heads
+    if artists['arrows'] is not None:
+        artists['arrows'].remove()
+    C = (S + E)/2
+    artists['arrows'] = ax.quiver(C[:,0], C[:,1], C[:,2], U[:,0], U[:,1], U[:,2], fc='none', ec=colors*3, ls='-', linewidth=2, arrow_length_ratio = 10, axlim_clip=False, normalize = False)
     
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.view_init( elev=20, azim=-60, vertical_axis="y"  )
-    #ax.set_aspect('equal') 
+    if created:
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_zlabel('Z')
+        ax.view_init( elev=20, azim=-60, vertical_axis="y"  )
+        #ax.set_aspect('equal') 
+    return artists
   
 
 def plotResults(res: Results, block = False):   
-    #fields  
+    # one window per figure, sized to half of the screen; pyplot (and its GUI backend) is imported on first use
+    import matplotlib.pyplot as plt
+    for (plot, count) in ((plotFields, res.fields.Bmag.shape[0]), (plotForces, res.forces.N.shape[0])):
+        if (count>0):
+            fig = plt.figure()
+            plot(res, fig)
+            window = plt.get_current_fig_manager().window
+            screen_x, screen_y = window.wm_maxsize()
+            fig.set_size_inches([screen_x/2/fig.dpi, screen_y/2/fig.dpi]) 
+            window.wm_geometry("+0+0")
+            fig.show()
+    plt.show(block=block)
+
+def saveResults(res: Results, path, formats = ('png',), size = RENDER_SIZE, dpi = RENDER_DPI):
+    # field and force figures written to path + '.fields.<format>' and path + '.forces.<format>' (png, svg, pdf), 
+    # figures are made outside pyplot on an Agg canvas at a fixed size, so no window manager is needed; 
+    # returns the written files
+    files = []
+    for (name, plot, count) in (('fields', plotFields, res.fields.Bmag.shape[0]), ('forces', plotForces, res.forces.N.shape[0])):
+        if (count>0):
+            fig = Figure(figsize=size, dpi=dpi)
+            FigureCanvasAgg(fig)
+            plot(res, fig)
+            for fmt in formats:
+                file = '%s.%s.%s' % (path, name, fmt)
+                fig.savefig(file, format=fmt)
+                files.append(file)
+    return files
+
+def saveResultsBatch(jobs, workers = None, **kw):
+    # jobs is a list of (results, path) rendered by saveResults with the keywords kw, each job in a process
+    # of a pool with its own matplotlib state (None uses every processor, 1 renders in this process);
+    # returns the files of every job, in job order
+    if workers == 1:
+        return [ saveResults(res, path, **kw) for (res, path) in jobs ]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(functools.partial(_save_job, **kw), jobs))
+
+def _save_job(job, **kw):
+    return saveResults(*job, **kw)
+
+def plotFields(res: Results, fig : Figure):
+    # histories of |B|, Bax, Btr at every field point
     M = res.fields.Bmag.shape[0]   
     if (M>0):
-        fig = plt.figure()    
-        renderer = fig.canvas.get_renderer()
-        
         C = min(3, M)
         
-        grid = plt.GridSpec( nrows = 1 + ( M - 1 )// C, ncols = C , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
+        grid = GridSpec( nrows = 1 + ( M - 1 )// C, ncols = C , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
 
         colors = field_colors(M)  
         
@@ -211,7 +289,7 @@ def plotResults(res: Results, block = False):
         titles = ['A', 'B', 'C']   
 
         for i in range(M):
-            ax = plt.subplot(grid[i//C, i%C])
+            ax = fig.add_subplot(grid[i//C, i%C])
             ax.set_xlim([0, res.times[-1]])
             
             val_min = min( res.fields.Bax.min(), res.fields.Btr.min()  )*1000
@@ -224,16 +302,12 @@ def plotResults(res: Results, block = False):
             ax.set_ylim([ymin, ymax]) 
             ax.grid(True)
             ax.set_title(titles[i])
-            ax.plot(res.times, res.fields.Bmag[i,:]*1000 ,'-', linewidth=2.0, color = colors[i])
-            ax.plot(res.times, res.fields.Bax[i,:]*1000 ,'--', linewidth=2.0, color = colors[i])
-            ax.plot(res.times, res.fields.Btr[i,:]*1000 ,':', linewidth=2.0, color = colors[i])
+            ax.plot(res.times, res.fields.Bmag[i,:]*1000 ,'-', linewidth=2.0, color = colors[i], **time_markers(res.times))
+            ax.plot(res.times, res.fields.Bax[i,:]*1000 ,'--', linewidth=2.0, color = colors[i], **time_markers(res.times))
+            ax.plot(res.times, res.fields.Btr[i,:]*1000 ,':', linewidth=2.0, color = colors[i], **time_markers(res.times))
             
 
-            tick_widths = [
-                label.get_window_extent(renderer).width for label in ax.get_yticklabels() if label.get_text()
-            ]
-            max_tick_width = max(tick_widths) if tick_widths else 0
-            labelpad = -max_tick_width-10   # Convert from points to inches
+            labelpad = label_pad(ax, fig)
             
             ax.set_ylabel("magn. field (B) [mT] ", loc="top", labelpad=labelpad); 
             ax.legend(labels, loc = 'lower right')   
@@ -241,27 +315,17 @@ def plotResults(res: Results, block = False):
             annot_abs_max(res.times, np.vstack((res.fields.Bmag[i,:], res.fields.Bax[i,:], res.fields.Btr[i,:]))*1000, ax) 
             # annot_abs_max(res.times, [np.newaxis,:]*1000, ax) 
             # annot_abs_max(res.times, [np.newaxis,:]*1000, ax) 
-            
-        window = plt.get_current_fig_manager().window
-        screen_x, screen_y = window.wm_maxsize()
-        fig.set_size_inches([screen_x/2/fig.dpi, screen_y/2/fig.dpi]) 
-        window.wm_geometry("+0+0")
-                
-        fig.show()
        
-    #forces    
-    
+def plotForces(res: Results, fig : Figure):
+    # histories of the force components on every force mask
     M = res.forces.N.shape[0]  
     if (M>0): 
-        fig = plt.figure()    
-        renderer = fig.canvas.get_renderer()
-        
         N = res.forces.N
         C = int(max(N)-min(N)) + 1
         C0 = int(min(N))
         R = max( [ len(N[N==k+C0]) for k in range(C) ]  )
         
-        grid = plt.GridSpec( nrows = R, ncols = C , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
+        grid = GridSpec( nrows = R, ncols = C , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
             
         colors = [ force_colors( k+C0 , len(N[N==k+C0]) ) for k in range(C) ]
                 
@@ -272,7 +336,7 @@ def plotResults(res: Results, block = False):
             r = int((N[:i]==N[i]).sum())
             
             color = colors[c][r]
-            ax = plt.subplot(grid[ r, c ])
+            ax = fig.add_subplot(grid[ r, c ])
             ax.set_xlim([0,res.times[-1]])
             
             ymin = np.floor( min( res.forces.Fx.min(), res.forces.Fy.min(), res.forces.Fz.min()  )*10 )/100
@@ -281,28 +345,14 @@ def plotResults(res: Results, block = False):
             ax.set_ylim([ymin, ymax])
             
             ax.grid(True)
-            ax.plot(res.times, res.forces.Fx[i,:]/10 ,'-', linewidth=2.0, color=color)
-            ax.plot(res.times, res.forces.Fy[i,:]/10 ,'--', linewidth=2.0, color=color)
-            ax.plot(res.times, res.forces.Fz[i,:]/10 ,':', linewidth=2.0, color=color)
+            ax.plot(res.times, res.forces.Fx[i,:]/10 ,'-', linewidth=2.0, color=color, **time_markers(res.times))
+            ax.plot(res.times, res.forces.Fy[i,:]/10 ,'--', linewidth=2.0, color=color, **time_markers(res.times))
+            ax.plot(res.times, res.forces.Fz[i,:]/10 ,':', linewidth=2.0, color=color, **time_markers(res.times))
             
-            tick_widths = [
-                label.get_window_extent(renderer).width for label in ax.get_yticklabels() if label.get_text()
-            ]
-            max_tick_width = max(tick_widths) if tick_widths else 0
-            labelpad = -max_tick_width-10   # Convert from points to inches
+            labelpad = label_pad(ax, fig)
             
             ax.set_ylabel("force [kgf] ", loc="top", labelpad=labelpad); 
             
             ax.legend(labels, loc = 'lower right')    
             
             annot_abs_max(res.times, np.vstack((res.forces.Fx[i,:], res.forces.Fy[i,:], res.forces.Fz[i,:]))/10, ax) 
-            
-        window = plt.get_current_fig_manager().window
-        screen_x, screen_y = window.wm_maxsize()
-        fig.set_size_inches([screen_x/2/fig.dpi, screen_y/2/fig.dpi]) 
-        window.wm_geometry("+0+0")
-            
-        fig.show()
-    plt.show(block=block)
-        
-        
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Opt-in timing and memory instrumentation of the solver stages.
+
+The solver wraps its stages (Neumann inductances, Biot-Savart fields, Ampere forces, their
+geometric kernels and the reduction of the force masks) in stage() blocks. While a profile is
+recorded in the calling thread every block measures its wall time, CPU time, the peak of the
+memory allocated above its start (through tracemalloc, which sees the NumPy arrays) and the
+problem sizes; otherwise a block costs one thread-local lookup.
+
+Work done in the worker processes of a parallel solve (workers > 1) is included in the wall
+time of the stages but not in their CPU time nor in their memory.
+
+Typical usage:
+    >>> with record('profile.jsonl') as profile:
+    ...     solution.evalBranchCurrents(geometry, excitation)
+    ...     results = solution.solve(geometry, excitation)
+    >>> print(profile)
+    >>> results = solution.solve(geometry, excitation, profile=True)
+    >>> results.profile.stages[0].wall
+"""
+
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# profile recorded by the calling thread
+_local = threading.local()
+
+
+class Stage:
+    """Measurements of one completed stage.
+
+    Attributes:
+        name (str): Stage name, nested stages are named '<parent>/<part>'.
+        depth (int): Nesting level, 0 for the outermost stages.
+        start (float): time.perf_counter() at the start of the stage.
+        wall (float): Wall time [s].
+        cpu (float): CPU time of this process [s].
+        peak_bytes (int): Peak of the traced memory above its value at the start of the stage,
+            None when memory is not recorded.
+        sizes (dict): Problem sizes given by the solver (S segments, P phases, T time steps,
+            masks, points).
+    """
+
+    def __init__(self, name, depth, start, wall, cpu, peak_bytes, sizes):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.peak_bytes = peak_bytes
+        self.sizes = sizes
+
+    def asdict(self):
+        return {'stage': self.name, 'depth': self.depth, 'wall_s': self.wall, 'cpu_s': self.cpu,
+                'peak_bytes': self.peak_bytes, 'sizes': self.sizes}
+
+
+class Profile:
+    """Stages recorded by one record() block, in completion order (inner stages first).
+
+    Attributes:
+        stages (list[Stage]): The completed stages.
+        memory (bool): Whether peak memory is measured.
+    """
+
+    def __init__(self, memory = True):
+        self.stages = []
+        self.memory = memory
+        self.open = []
+
+    def total(self, name):
+        """Summed wall time of the stages called name [s]."""
+        return sum(s.wall for s in self.stages if s.name == name)
+
+    def write(self, path):
+        """Append the stages to path as JSON lines, one object per stage."""
+        with open(path, 'a') as f:
+            for s in self.stages:
+                f.write(json.dumps(s.asdict()) + '\n')
+
+    def __str__(self):
+        lines = ['%-28s %10s %10s %12s  %s' % ('stage', 'wall [s]', 'cpu [s]', 'peak [MB]', 'sizes')]
+        for s in sorted(self.stages, key=lambda s: s.start):
+            peak = '-' if s.peak_bytes is None else '%.1f' % (s.peak_bytes/2**20)
+            sizes = ' '.join('%s=%d' % item for item in s.sizes.items())
+            lines.append('%-28s %10.4f %10.4f %12s  %s' % ('  '*s.depth + s.name, s.wall, s.cpu, peak, sizes))
+        return '\n'.join(lines)
+
+
+def active():
+    """Return the profile recorded by the calling thread, or None."""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def record(path = None, memory = True):
+    """Record the stages run by the calling thread into a new Profile.
+
+    A record() block inside another one records into the outer profile.
+
+    Args:
+        path (str, optional): File the stages are appended to as JSON lines when the block
+            exits. None keeps them in the returned profile only.
+        memory (bool, optional): Measure peak memory with tracemalloc, which slows down the
+            Python allocations while recording. Defaults to True.
+
+    Yields:
+        Profile: The profile filled as the stages complete.
+    """
+    profile = active()
+    if profile is not None:
+        yield profile
+        return
+    profile = Profile(memory)
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = None
+        if tracing:
+            tracemalloc.stop()
+        if path is not None:
+            profile.write(path)
+
+
+@contextmanager
+def stage(name, sizes = None):
+    """Measure the enclosed block as a stage of the recorded profile, if any.
+
+    Args:
+        name (str): Stage name, prefixed by the name of the enclosing stage.
+        sizes (callable, optional): Returns the dict of problem sizes of the stage, called only
+            while recording.
+    """
+    profile = active()
+    if profile is None:
+        yield
+        return
+    parent = profile.open[-1] if profile.open else None
+    frame = {'name': name if parent is None else parent['name'] + '/' + name, 'peak': 0}
+    if profile.memory:
+        if parent is not None:
+            parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame['base'] = tracemalloc.get_traced_memory()[0]
+    profile.open.append(frame)
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        profile.open.pop()
+        peak_bytes = None
+        if profile.memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(peak - frame['base'], 0)
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], peak)
+            tracemalloc.reset_peak()
+        profile.stages.append(Stage(frame['name'], len(profile.open), start, wall, cpu, peak_bytes, {} if sizes is None else sizes()))
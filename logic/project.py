@@ -0,0 +1,698 @@
+"""Project files of the application, readable without the GUI.
+
+A project is a geometry file (`GEOM_MAIN.A.X = [...]` lines, usually `*.geom.txt`) and an
+excitation file (`Duration = 20.0` lines, usually `*.exct.txt`). The inputs are kept as text
+values in variables with get()/set(), plain Var objects here and Tk variables in the GUI panels,
+which inherit the loading, saving, completion of the auto connections, checking and building of
+the geometry and excitation from the classes below.
+
+Typical usage:
+    >>> (geom, exct, inductances) = loadCase('data/type1_0.geom.txt', 'work.exct.txt')
+    >>> results = solution.solve(geom, exct)
+"""
+
+from typing import Final
+import os.path
+import itertools
+import copy
+
+import numpy as np
+import logic.geometry as geometry
+import logic.excitation as excitation
+import logic.solution as solution
+from utils.formats import length_str_arr, flt_to_str, str_to_flt, str_to_int, str_to_int_arr, str_to_flt_arr, flt_arr_to_str, int_arr_to_str
+
+class Var:
+    # value holder with the get/set interface of the Tk variables
+    def __init__(self, value = None):
+        self.value = value
+        
+    def get(self):
+        return self.value
+    
+    def set(self, value):
+        self.value = value
+
+class GeometryProject:
+        
+    schema = "ABC"
+    MAX_FORCE_PER_PHASE : Final[int] = 6
+    STATUS_OK : Final = "Geometry is OK!"
+    STATUS_ERROR : Final = "Geometry contains errors!"
+    SUBFIELD_SEPARATOR : Final = '.'
+
+    GEOM_MAIN_VN : Final = 'GEOM_MAIN'
+    GEOM_FELD_VN : Final = 'GEOM_FELD'
+    MASK_FORC_VN : Final = 'SGMT_FORC'
+    MAIN_RADI_VN: Final =  'SGMT_RADI'
+    POLS_SAME_VN : Final = 'SAME_GEOM'
+    POLS_X_TR_VN : Final = 'POLE_DIST'
+    POLS__CNT_VN: Final = 'PHASE_CNT'
+    POLS_CONN_VN: Final = 'POLE_CONN'
+    
+    AUTO_SRCE_VN: Final = 'AUTO_SRCE'
+    AUTO_SPLT_VN: Final = 'AUTO_SPLT'
+    AUTO_NEUT_VN: Final = 'AUTO_SHRT'
+
+    AUTO_SCON_VN: Final = 'AUTO_SCON'
+    AUTO_NCON_VN: Final = 'AUTO_ECON'
+    CONN_FORC_VN: Final = 'FORC_CONN'
+    CONN_RADI_VN: Final = 'RADI_CONN'
+    
+    GEOM_SRCE_VN: Final = 'GEOM_SRCE'
+    GEOM_SPLT_VN: Final = 'GEOM_SPLT'
+    GEOM_NEUT_VN: Final = 'GEOM_SHRT'
+    
+    GEOM_SCON_VN: Final = 'GEOM_SCON'
+    GEOM_NCON_VN: Final = 'GEOM_ECON'
+            
+    AUTO_SROL_VN: Final = 'AUTO_SROL'
+    AUTO_EROL_VN: Final = 'AUTO_EROL'
+     
+    
+    valid: bool = True
+    
+    error_message = ""
+    status = STATUS_OK
+    phase_checks = []
+    
+    def new_str_var(self, value = ''):
+        return Var(value)
+    
+    def new_bool_var(self, value = False):
+        return Var(value)
+    
+    def init(self):
+        M = self.MAX_FORCE_PER_PHASE
+          
+        self.forc_list_var = [self.new_bool_var() for i in range(M*3)]  
+        self.sgmt_forc_var = [self.new_str_var() for i in range(M*3) ]    
+        self.sgmt_radi_var = [self.new_str_var() for i in range(3) ]    
+        self.geom_main_var = [self.new_str_var() for i in range(3*3) ]
+        self.geom_feld_var = [self.new_str_var() for i in range(3*3) ]   
+        self.geom_scon_var = [self.new_str_var() for i in range(3*4) ]
+        self.geom_econ_var = [self.new_str_var() for i in range(3*4) ]
+        self.geom_shrt_var = [self.new_str_var() for i in range(3) ]
+        self.geom_srce_var = [self.new_str_var() for i in range(3) ]
+        self.geom_splt_var = [self.new_str_var() for i in range(3) ]
+        self.auto_conn_var = self.new_bool_var(value = False)        
+        self.pcnt_var = self.new_str_var(value = '3')        
+        self.same_var = self.new_bool_var(value = True)
+        self.pdst_var = self.new_str_var(value = '0.1')   
+        self.auto_srce_var = self.new_bool_var(value = True)
+        self.auto_shrt_var = self.new_bool_var(value = True)
+        self.auto_splt_var = self.new_bool_var(value = True)
+        self.auto_econ_var = self.new_bool_var(value = True)
+        self.auto_scon_var = self.new_bool_var(value = True)
+        self.auto_erol_var = [ self.new_str_var() for i in range(4) ]
+        self.auto_srol_var = [ self.new_str_var() for i in range(4) ]        
+        self.radi_conn_var = self.new_str_var(value = '2')
+        self.forc_conn_var = self.new_bool_var(value = True)
+                
+        #default sample geom:
+        X: float = [  0.0,  0.0,  0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0 ]      
+        Y: float = [ -0.5, -0.5, -0.5, 0.1, 0.1, 0.1, 0.4, 0.4, 0.5, 0.5, 0.5 ]   
+        Z: float = [  1.0,  0.4,  0.3, 0.3, 0.1, 0.0, 0.0, 0.1, 0.1, 0.5, 1.0 ]                       
+        self.sgmt_radi_var[0].set (value= flt_arr_to_str( [2]*(len(X)-1) ) )        
+        self.geom_main_var[0*3+0].set( flt_arr_to_str( X ) )     
+        self.geom_main_var[0*3+1].set( flt_arr_to_str( Y ) )     
+        self.geom_main_var[0*3+2].set( flt_arr_to_str( Z ) )                 
+        self.geom_feld_var[0*3+0].set( '0' )               
+        self.geom_feld_var[0*3+1].set( '0' )               
+        self.geom_feld_var[0*3+2].set( '0' )    
+        self.forc_list_var[0*M+0].set( True)
+        self.sgmt_forc_var[0*M+0].set( int_arr_to_str( [0] + [1]*(len(X)-3) + [0] ) )
+
+    def load(self, file = "work.geom.txt"):       
+        M = self.MAX_FORCE_PER_PHASE
+        sub = self.SUBFIELD_SEPARATOR        
+
+        #default values, on case missing in file:
+        self.auto_conn_var.set(value = False)        
+        self.pcnt_var.set(value = '3')        
+        self.same_var.set(value = True)
+        self.pdst_var.set(value = '0.1')   
+        self.auto_srce_var.set(value = True)
+        self.auto_shrt_var.set(value = True)
+        self.auto_splt_var.set(value = True)
+        self.auto_econ_var.set(value = True)
+        self.auto_scon_var.set(value = True)    
+        self.radi_conn_var.set(value = '2')
+        self.forc_conn_var.set(value = False)
+        for i in range(4):
+            self.auto_srol_var[i].set(value = '0')
+            self.auto_erol_var[i].set(value = '0')
+                       
+        #try to load from file
+        if os.path.exists(file):        
+            forc_segs = None
+            with open(file) as f:
+                for l in f:
+                    if not l.strip()=="":
+                        (key, val) = tuple([ s.strip() for s in l.split('=') ])
+                        val =  val.strip('[]') 
+                        if key.find(sub)>0:
+                            (nam, phs, idx) = tuple([ s.strip() for s in key.split(sub) ])
+                            i = 'ABCS'.find(phs)
+                            try:
+                                j = int(idx)
+                            except ValueError:
+                                j = 'XYZ'.find(idx)
+                                
+                            if (nam == self.GEOM_MAIN_VN):
+                                self.geom_main_var[i*3+j].set(val)
+                            elif (nam == self.GEOM_FELD_VN):
+                                self.geom_feld_var[i*3+j].set(val)
+                            elif (nam == self.MASK_FORC_VN):
+                                self.sgmt_forc_var[i*M+j].set(val)
+                                if forc_segs == None:
+                                    forc_segs = [False]*(M*3)
+                                forc_segs[i*M+j] = True
+                            elif (nam == self.MAIN_RADI_VN):
+                                self.sgmt_radi_var[i].set(val)
+                                
+                            elif (nam == self.GEOM_SCON_VN):
+                                self.geom_scon_var[i*3+j].set(val)
+                            elif (nam == self.GEOM_NCON_VN):
+                                self.geom_econ_var[i*3+j].set(val)  
+                        else:           
+                            if (key == self.GEOM_SRCE_VN):
+                                for i, v in enumerate(val.split(',\t')):
+                                    self.geom_srce_var[i].set(v.strip())
+                            elif (key == self.GEOM_SPLT_VN):
+                                for i, v in enumerate(val.split(',\t')):
+                                    self.geom_splt_var[i].set(v.strip())
+                            elif (key == self.GEOM_NEUT_VN):
+                                for i, v in enumerate(val.split(',\t')):
+                                    self.geom_shrt_var[i].set(v.strip())
+                            elif (key == self.AUTO_SROL_VN):
+                                for i, v in enumerate(val.split(',\t')):
+                                    self.auto_srol_var[i].set(v.strip())
+                            elif (key == self.AUTO_EROL_VN):
+                                for i, v in enumerate(val.split(',\t')):
+                                    self.auto_erol_var[i].set(v.strip())
+                            elif (key == self.POLS_X_TR_VN):
+                                self.pdst_var.set(val)
+                            elif (key == self.POLS__CNT_VN):
+                                self.pcnt_var.set(val)
+                            elif (key == self.POLS_SAME_VN):
+                                self.same_var.set(val=='True')
+                            elif (key == self.POLS_CONN_VN):
+                                self.auto_conn_var.set(val=='True')
+                            elif (key == self.CONN_FORC_VN):
+                                self.forc_conn_var.set(val=='True')
+                            elif (key == self.CONN_RADI_VN):
+                                self.radi_conn_var.set(val)
+                            elif (key == self.AUTO_SRCE_VN):
+                                self.auto_srce_var.set(val=='True')
+                            elif (key == self.AUTO_SPLT_VN):
+                                self.auto_splt_var.set(val=='True')
+                            elif (key == self.AUTO_NEUT_VN):
+                                self.auto_shrt_var.set(val=='True')
+                            elif (key == self.AUTO_SCON_VN):
+                                self.auto_scon_var.set(val=='True')
+                            elif (key == self.AUTO_NCON_VN):
+                                self.auto_econ_var.set(val=='True')
+                                       
+            for i in range(3):                               
+                for j in range(M):    
+                    if forc_segs==None: 
+                        self.forc_list_var[i*M+j].set( False )
+                        seg = len(self.geom_main_var[i*3+0].get().split(','))-1
+                        self.sgmt_forc_var[i*M+j].set( int_arr_to_str( [0] + [1]*(seg-2) + [0] ) )  
+                        
+                    else:                         
+                        self.forc_list_var[i*M+j].set(forc_segs[i*M+j])    
+                        if not forc_segs[i*M+j]:
+                            seg = len(self.geom_main_var[i*3+0].get().split(','))-1
+                            self.sgmt_forc_var[i*M+j].set( int_arr_to_str( [0]*seg ) )
+
+    def save(self, file = "work.geom.txt"):   
+        M = self.MAX_FORCE_PER_PHASE
+        N = str_to_int( self.pcnt_var.get() )
+        sub = self.SUBFIELD_SEPARATOR
+        f = open(file, "w")
+        f.write('\n'.join([ 
+                    '\n'.join([ 
+                        ''.join([self.GEOM_MAIN_VN,sub,'ABC'[i],sub,'XYZ'[j],' = [', self.geom_main_var[i*3+j].get(), ']'])
+                    for j in range(3) ])
+                for i in range(3)  ]) ); f.write( '\n' )
+        f.write('\n'.join([
+                    '\n'.join([
+                        ''.join([self.GEOM_FELD_VN,sub,'ABC'[i],sub,'XYZ'[j],' = [', self.geom_feld_var[i*3+j].get(), ']'])
+                    for j in range(3) ])
+                for i in range(3)  ]) ); f.write( '\n' )
+        f.write('\n'.join([
+                    '\n'.join([
+                        ''.join([self.MASK_FORC_VN,sub,'ABC'[i],sub,'%d' % j,' = [', self.sgmt_forc_var[i*M+j].get(), ']']) 
+                    for j in range(M) if self.forc_list_var[i*M+j].get() ]) 
+                for i in range(3)  ]) ); f.write( '\n' )
+        f.write('\n'.join([
+                        ''.join([self.MAIN_RADI_VN,sub,'ABC'[i],sub, ' = [', self.sgmt_radi_var[i].get(), ']']) 
+                for i in range(3)  ]) ); f.write( '\n' )
+        f.write( ''.join([self.POLS_X_TR_VN,     ' = ',           self.pdst_var.get() ]) );                  f.write( '\n' )
+        f.write( ''.join([self.POLS__CNT_VN,     ' = ',           self.pcnt_var.get() ]) );                  f.write( '\n' )
+        f.write( ''.join([self.POLS_SAME_VN,     ' = ', 'True' if self.same_var.get()      else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.POLS_CONN_VN,     ' = ', 'True' if self.auto_conn_var.get() else 'False']) ); f.write( '\n' )
+                
+        f.write( ''.join([self.AUTO_SRCE_VN,' = ', 'True' if self.auto_srce_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.AUTO_SPLT_VN,' = ', 'True' if self.auto_splt_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.AUTO_NEUT_VN,' = ', 'True' if self.auto_shrt_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.AUTO_SCON_VN,' = ', 'True' if self.auto_scon_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.AUTO_NCON_VN,' = ', 'True' if self.auto_econ_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.CONN_FORC_VN,' = ', 'True' if self.forc_conn_var.get() else 'False']) ); f.write( '\n' )
+        f.write( ''.join([self.CONN_RADI_VN,' = ',           self.radi_conn_var.get() ]) );             f.write( '\n' )
+        
+        f.write( ''.join([self.GEOM_SRCE_VN,' = [', 
+                    ',\t'.join( [ self.geom_srce_var[0*3+j].get() for j in range(3)] ) , ']'] ) ) ; f.write( '\n' )  
+        f.write( ''.join([self.GEOM_SPLT_VN,' = [',
+                    ',\t'.join( [ self.geom_splt_var[0*3+j].get() for j in range(3)] ) , ']'] ) ) ; f.write( '\n' )  
+        f.write( ''.join([self.GEOM_NEUT_VN,' = [',
+                    ',\t'.join( [ self.geom_shrt_var[0*3+j].get() for j in range(3)] ) , ']'] ) ) ; f.write( '\n' )         
+        
+        f.write('\n'.join([
+                    '\n'.join([
+                        ''.join([self.GEOM_SCON_VN,sub,'ABCS'[i],sub,'XYZ'[j],' = [', self.geom_scon_var[i*3+j].get(), ']'])
+                    for j in range(3) ])
+                for i in range(4)  ]) ); f.write( '\n' ) 
+        f.write('\n'.join([
+                    '\n'.join([
+                        ''.join([self.GEOM_NCON_VN,sub, 'ABC'[i],sub,'XYZ'[j],' = [', self.geom_econ_var[i*3+j].get(), ']'])
+                    for j in range(3) ])
+                for i in range(3)  ]) ); f.write( '\n' ) 
+                
+        f.write( ''.join([self.AUTO_SROL_VN,' = [',
+                    ',\t'.join( [ self.auto_srol_var[i].get() for i in range(4) ] ) , ']'] ) ) ; f.write( '\n' )       
+        f.write( ''.join([self.AUTO_EROL_VN,' = [',
+                    ',\t'.join( [ self.auto_erol_var[i].get() for i in range(3) ] ) , ']'] ) ) ; f.write( '\n' )       
+        
+        f.close()
+
+    def auto_var_update(self):        
+        M = self.MAX_FORCE_PER_PHASE
+        P = str_to_int(self.pcnt_var.get())
+        
+        if self.same_var.get():  
+            for i in range(3):            
+                self.sgmt_radi_var[i].set( flt_arr_to_str( np.array( str_to_flt_arr(self.sgmt_radi_var[0].get()) ) ) )
+                for j in range(3):     
+                    self.geom_main_var[i*3+j].set( flt_arr_to_str( np.array( str_to_flt_arr(self.geom_main_var[0*3+j].get()) )  + str_to_flt(self.pdst_var.get())*i*(j==0) ) )          
+                    self.geom_feld_var[i*3+j].set( flt_arr_to_str( np.array( str_to_flt_arr(self.geom_feld_var[0*3+j].get()) )  + str_to_flt(self.pdst_var.get())*i*(j==0)   ) )             
+                for j in range(M):                
+                    self.sgmt_forc_var[i*M+j].set( int_arr_to_str( np.array( str_to_int_arr(self.sgmt_forc_var[0*M+j].get()) ) ) ) 
+                    self.forc_list_var[i*M+j].set(self.forc_list_var[0*M+j].get()) 
+             
+        if self.auto_conn_var.get():       
+            if self.auto_shrt_var.get():
+                for j in range(3):
+                    self.geom_shrt_var[j].set( value = flt_to_str( sum( [ str_to_flt_arr(self.geom_main_var[i*3+j].get())[-1] for i in range(P) ] ) /P ) )    
+                    
+            if self.auto_econ_var.get(): 
+                for i in range(3):    
+                    XYZ = self.auto_path([ str_to_flt_arr(self.geom_main_var[i*3+j].get())[-1]  for j in range(3) ], 
+                                        [ str_to_flt(self.geom_shrt_var[j].get())              for j in range(3) ], 
+                                        int(self.auto_erol_var[i].get()) )               
+                    for j in range(3):
+                        self.geom_econ_var[i*3+j].set( flt_arr_to_str(XYZ[j::3]) )     
+                    
+            if (P == 3 and not self.schema == "ABC"):   
+                N = "ABC".find(self.schema[0])
+                if self.auto_splt_var.get():
+                    for j in range(3):
+                        self.geom_splt_var[j].set( value= flt_to_str( sum( [str_to_flt_arr(self.geom_main_var[i*3+j].get())[0] for i in range(P) if not i==N] ) / 2 ) )  
+                        
+                if self.auto_srce_var.get():
+                    for j in range(3):
+                        self.geom_srce_var[j].set( value= flt_to_str( str_to_flt_arr(self.geom_main_var[N*3+j].get())[0]/2 + str_to_flt_arr(self.geom_splt_var[j].get())[0]/2 ) )  
+                
+                if self.auto_scon_var.get(): 
+                    for i in range(3):         
+                        XYZ = self.auto_path( 
+                                            [ str_to_flt(self.geom_srce_var[j].get() if i == N else self.geom_splt_var[j].get()) for j in range(3) ] , 
+                                            [ str_to_flt_arr(self.geom_main_var[i*3+j].get())[0] for j in range(3) ], 
+                                            int(self.auto_srol_var[i].get()) )                    
+                        for j in range(3):
+                            self.geom_scon_var[i*3+j].set( flt_arr_to_str(XYZ[j::3]) ) 
+                    i = 3     
+                    XYZ = self.auto_path( 
+                                        [ str_to_flt(self.geom_splt_var[j].get()) for j in range(3) ], 
+                                        [ str_to_flt(self.geom_srce_var[j].get()) for j in range(3) ], 
+                                        int(self.auto_srol_var[i].get()) )             
+                    for j in range(3):
+                        self.geom_scon_var[i*3+j].set( flt_arr_to_str(XYZ[j::3]) )            
+            else:
+                N = 0
+                if self.auto_srce_var.get():
+                    for j in range(3):
+                        self.geom_srce_var[j].set( value= flt_to_str( sum( [ str_to_flt_arr(self.geom_main_var[i*3+j].get())[0] for i in range(P) ] ) / P ) )  
+                
+                if self.auto_scon_var.get(): 
+                    for i in range(3):          
+                        XYZ = self.auto_path( 
+                                            [ str_to_flt(self.geom_srce_var[j].get()) for j in range(3) ], 
+                                            [ str_to_flt_arr(self.geom_main_var[i*3+j].get())[0] for j in range(3) ], 
+                                            int(self.auto_srol_var[i].get()) )                    
+                        for j in range(3):
+                            self.geom_scon_var[i*3+j].set( flt_arr_to_str(XYZ[j::3]) )
+
+    def auto_path(self, SXYZ, EXYZ, roll):
+        LXYZ = np.array([])
+        DXYZ = np.array(EXYZ) - np.array(SXYZ)
+        n = np.count_nonzero(DXYZ)
+        if n>1:
+            XYZ = np.array(SXYZ)
+            IJK = np.arange(3)
+            IJK = IJK[np.nonzero(DXYZ)]
+            DXYZ = DXYZ[np.nonzero(DXYZ)]       
+            idx = np.array(list(itertools.permutations(range(n))))            
+            IJK = IJK[idx[roll%len(idx)]]
+            DXYZ = DXYZ[idx[roll%len(idx)]]  
+            for d,j in zip(DXYZ[:-1], IJK[:-1]):
+                XYZ[j] = XYZ[j]+d
+                LXYZ = np.append(LXYZ, XYZ)
+        return LXYZ
+
+    def check_directions(self, flt_arr):                
+        dL2 = 0
+        dD = 0
+        for j in range(3):
+            X = np.array( flt_arr[j] )
+            dX = np.diff(X)
+            dL2 = dL2 + dX**2
+            dD = dD + abs(dX)
+        return not ( any( ( dL2**0.5 - dD ) != 0) )
+
+    def check(self):
+        M = self.MAX_FORCE_PER_PHASE
+        P = str_to_int(self.pcnt_var.get())
+        N = "ABC".find(self.schema[0]) if (P == 3 and not self.schema == "ABC") else -1
+        result = True
+        dimension = True
+        direction = True
+        self.error_message = ""
+        self.phase_checks = [ (True,)*6 for i in range(P) ]
+                
+        for i in range(P):
+            check1 = True
+            check2 = True
+            check3 = True
+            check4 = True
+            check5 = True
+            check1_1 = True
+            check3_1 = True
+            check4_1 = True
+            check5_1 = True
+            
+            N1 = -1
+            N2 = -1
+            N3 = -1
+            N4 = -1
+            N5 = -1
+                            
+            N1 = length_str_arr(self.sgmt_radi_var[i].get()) + 1 if N1==-1 else N1               
+            for j in range(M):       
+                N1 = length_str_arr(self.sgmt_forc_var[i*M+j].get()) + 1 if N1==-1 and self.forc_list_var[i*M+j].get() else N1
+                check1 = check1 and ( length_str_arr(self.sgmt_forc_var[i*M+j].get())==N1-1 or not self.forc_list_var[i*M+j].get() )
+                                   
+            for j in range(3):               
+                N1 = length_str_arr(self.geom_main_var[i*3+j].get()) if N1==-1 else N1
+                N2 = length_str_arr(self.geom_feld_var[i*3+j].get()) if N2==-1 else N2
+                N3 = length_str_arr(self.geom_econ_var[i*3+j].get()) if N3==-1 else N3
+                N4 = length_str_arr(self.geom_scon_var[i*3+j].get()) if N4==-1 else N4   
+                N5 = length_str_arr(self.geom_scon_var[3*3+j].get()) if N5==-1 else N5
+                    
+                check1 = check1 and ( length_str_arr(self.geom_main_var[i*3+j].get())==N1 )     
+                check2 = check2 and ( length_str_arr(self.geom_feld_var[i*3+j].get())==N2 )
+                check3 = check3 and ( length_str_arr(self.geom_econ_var[i*3+j].get())==N3 or not self.auto_conn_var.get() )
+                check4 = check4 and ( length_str_arr(self.geom_scon_var[i*3+j].get())==N4 or not self.auto_conn_var.get() )
+                check5 = check5 and ( length_str_arr(self.geom_scon_var[3*3+j].get())==N5 or not self.auto_conn_var.get() or not i == N )
+               
+            check1_1 = check1_1 and ( self.check_directions( [ str_to_flt_arr(self.geom_main_var[i*3+j].get()) for j in range(3) ] ) if check1 else True )
+            check3_1 = check3_1 and ( self.check_directions( [ str_to_flt_arr(self.geom_main_var[i*3+j].get().split(",")[-1] + "," + self.geom_econ_var[i*3+j].get() + ("," if N3>0 else "") + self.geom_shrt_var[0*3+j].get() ) for j in range(3) ] ) if check3 and self.auto_conn_var.get() else True )
+            check4_1 = check4_1 and ( self.check_directions( [ str_to_flt_arr( ( self.geom_srce_var[0*3+j].get() if N<0 or i == N else self.geom_splt_var[0*3+j].get() ) + ("," if N4>0 else "") + self.geom_scon_var[i*3+j].get() + "," + self.geom_main_var[i*3+j].get().split(",")[0]) for j in range(3) ] ) if check4 and self.auto_conn_var.get() else True )
+            check5_1 = check5_1 and ( self.check_directions( [ str_to_flt_arr( self.geom_splt_var[0*3+j].get()   + ("," if N5>0 else "") + self.geom_scon_var[3*3+j].get() + "," + self.geom_srce_var[0*3+j].get() ) for j in range(3)] ) if check5 and self.auto_conn_var.get() and i == N else True )
+                                    
+            # per phase: main path, radii and forces, field points, end, start and split connections
+            self.phase_checks[i] = ( check1 and check1_1, check1, check2, check3 and check3_1, check4 and check4_1, check5 and check5_1 )
+                
+            dimension = dimension * check1*check2*check3*check4*check5
+            direction = direction * check1_1*check3_1*check4_1*check5_1
+            
+        result = dimension*direction
+        if not result:
+            self.status = self.STATUS_ERROR
+            self.error_message = ""
+            self.error_message = self.error_message + \
+                ( "\n Dimension must agree!" if not dimension else "") + \
+                ( "\n Only segments along the axis (horizontal or vertical) allowed!" if not direction else "")
+
+        else:            
+            self.status = self.STATUS_OK
+            
+        return ( result, dimension )
+
+    def construct_geom(self):
+        M = self.MAX_FORCE_PER_PHASE
+        P = str_to_int(self.pcnt_var.get())
+        extra = self.auto_conn_var.get()
+        N = "ABC".find(self.schema[0]) if (P == 3 and not self.schema == "ABC") else -1
+
+        conductors = []
+        for i in range(P):
+            main = geometry.Conductor(
+                str_to_flt_arr(self.geom_main_var[i*3+0].get()),
+                str_to_flt_arr(self.geom_main_var[i*3+1].get()),
+                str_to_flt_arr(self.geom_main_var[i*3+2].get()),
+                i,
+                [ str_to_int_arr(self.sgmt_forc_var[i*M+j].get()) for j in range(M) if self.forc_list_var[i*M+j].get() ],                
+                str_to_flt_arr(self.sgmt_radi_var[i].get())
+            )
+            conductors.append(main)
+            if extra:
+                sX = [str_to_flt( self.geom_shrt_var[0*3+0].get() )]
+                sY = [str_to_flt( self.geom_shrt_var[0*3+1].get() )]
+                sZ = [str_to_flt( self.geom_shrt_var[0*3+2].get() )]
+
+                phase_neut_conn = geometry.Conductor(
+                    np.concatenate(( [main.X[-1]], str_to_flt_arr(self.geom_econ_var[i*3+0].get()), sX  )) ,
+                    np.concatenate(( [main.Y[-1]], str_to_flt_arr(self.geom_econ_var[i*3+1].get()), sY  )) ,
+                    np.concatenate(( [main.Z[-1]], str_to_flt_arr(self.geom_econ_var[i*3+2].get()), sZ  )) ,
+                    i,
+                    1 if self.forc_conn_var.get() else [],                
+                    str_to_flt(self.radi_conn_var.get())
+                ) 
+                conductors.append(phase_neut_conn)
+                
+                sX = [str_to_flt( self.geom_srce_var[0*3+0].get() if N<0 or i == N else self.geom_splt_var[0*3+0].get() )]
+                sY = [str_to_flt( self.geom_srce_var[0*3+1].get() if N<0 or i == N else self.geom_splt_var[0*3+1].get() )]
+                sZ = [str_to_flt( self.geom_srce_var[0*3+2].get() if N<0 or i == N else self.geom_splt_var[0*3+2].get() )]
+                sF = [] if N<0 or i == N else 1 if self.forc_conn_var.get() else []
+
+                phase_srce_conn = geometry.Conductor(
+                    np.concatenate(( sX, str_to_flt_arr(self.geom_scon_var[i*3+0].get()), [main.X[0]] )) ,
+                    np.concatenate(( sY, str_to_flt_arr(self.geom_scon_var[i*3+1].get()), [main.Y[0]] )) ,
+                    np.concatenate(( sZ, str_to_flt_arr(self.geom_scon_var[i*3+2].get()), [main.Z[0]] )) ,
+                    i,
+                    sF,                
+                    str_to_flt(self.radi_conn_var.get())
+                ) 
+                conductors.append(phase_srce_conn)
+                
+                if i == N:
+                    phase_srce_conn = geometry.Conductor(
+                        np.concatenate(( 
+                            [str_to_flt(self.geom_splt_var[0*3+0].get())], 
+                            str_to_flt_arr(self.geom_scon_var[3*3+0].get()), 
+                            [str_to_flt(self.geom_srce_var[0*3+0].get())] )) ,
+                        np.concatenate(( 
+                            [str_to_flt(self.geom_splt_var[0*3+1].get())], 
+                            str_to_flt_arr(self.geom_scon_var[3*3+1].get()), 
+                            [str_to_flt(self.geom_srce_var[0*3+1].get())] )) ,
+                        np.concatenate(( 
+                            [str_to_flt(self.geom_splt_var[0*3+2].get())], 
+                            str_to_flt_arr(self.geom_scon_var[3*3+2].get()), 
+                            [str_to_flt(self.geom_srce_var[0*3+2].get())] )) ,
+                        i,
+                        [],
+                        str_to_flt(self.radi_conn_var.get())
+                    ) 
+                    conductors.append(phase_srce_conn)
+
+
+        XYZ = [ [] for i in range(3) ]
+        for j in range(3):
+            for i in range(P):
+                XYZ[j] = XYZ[j] + str_to_flt_arr(self.geom_feld_var[i*3+j].get())       
+
+
+        filedPoints = geometry.WayPoints()
+        for i in range(P):
+            filedPoints.X = np.append( filedPoints.X, str_to_flt_arr(self.geom_feld_var[i*3+0].get())  )
+            filedPoints.Y = np.append( filedPoints.Y, str_to_flt_arr(self.geom_feld_var[i*3+1].get())  )
+            filedPoints.Z = np.append( filedPoints.Z, str_to_flt_arr(self.geom_feld_var[i*3+2].get())  )
+
+        return geometry.fromConductorsWP( conductors ,filedPoints )
+
+    def build(self):
+        # completes the auto connections, checks the inputs and builds the geometry (None when not plotable)
+        self.auto_var_update()
+        ( self.valid, plotable ) = self.check()
+        self.geometry = self.construct_geom() if plotable else None
+        return self.geometry
+
+class ExcitationProject:
+        
+    DURATION_VAR_NAME       : Final = 'Duration'
+    DISCRET_VAR_NAME        : Final = 'Discret'
+    CURRENT_VAR_NAME        : Final = 'Current'
+    FREQ_VAR_NAME           : Final = 'Frequency'
+    ALPHA_VAR_NAME          : Final = 'Alpha'
+    CURRENT_TYPE_VAR_NAME   : Final = 'Current_value_type'
+    EXCT_TYPE_VAR_NAME      : Final = 'Source_type'
+    K_OVERRIDE_VAL_VAR_NAME : Final = 'K_value_override'
+    K_OVERRIDE_VAR_NAME     : Final = 'K_override'
+    SCHEMA_VAR_NAME         : Final = 'Schema'
+    ADAPTIVE_GRID_VAR_NAME  : Final = 'Adaptive_grid'
+        
+    MAX_FORCE_PER_PHASE : Final[int] = 6    
+    
+    CUR_TYPE_RMS : Final = "RMS"
+    CUR_TYPE_PEAK : Final = "Peak"
+    
+    SCHEMA_A_BC : Final = "A(BC)"
+    SCHEMA_B_AC : Final = "B(AC)"
+    SCHEMA_C_AB : Final = "C(AB)"
+    
+    SRC_TYPE_RLC : Final = "RLC 1Ph Circuit"
+    SRC_TYPE_GEN : Final = "3ph Generator"
+    
+    def new_str_var(self, value = ''):
+        return Var(value)
+    
+    def new_bool_var(self, value = False):
+        return Var(value)
+    
+    def init(self):        
+        self.duration_var = self.new_str_var()        
+        self.discret_var = self.new_str_var()        
+        self.current_var = self.new_str_var()     
+        self.alpha_var = self.new_str_var()        
+        self.freq_var = self.new_str_var()
+        self.current_type_var = self.new_str_var()   
+        self.excitation_type_var = self.new_str_var()        
+        self.k_natural_value_var = self.new_str_var()       
+        self.k_override_value_var = self.new_str_var()      
+        self.k_override_var = self.new_bool_var()        
+        self.schema_var = self.new_str_var()      
+        self.ind_var = self.new_str_var()        
+        self.adaptive_grid_var = self.new_bool_var()        
+                
+    def load(self, file = "work.exct.txt"):
+        
+        self.duration_var.set(value="20.0")        
+        self.discret_var.set(value="21")        
+        self.current_var.set(value="80.0")        
+        self.alpha_var.set(value="0.0")          
+        self.freq_var.set(value="60")        
+        self.current_type_var.set(value=self.CUR_TYPE_PEAK)        
+        self.excitation_type_var.set(value=self.SRC_TYPE_RLC)        
+        self.k_natural_value_var.set(value="0.0")       
+        self.k_override_value_var.set(value="0.0")      
+        self.k_override_var.set(value=False)        
+        self.schema_var.set(value = self.SCHEMA_A_BC)  
+        self.ind_var.set(value="0.0,    0.0,    0.0")       
+        self.adaptive_grid_var.set(value=False)        
+        
+        if os.path.exists(file):  
+            with open(file) as f:
+                for l in f:
+                    if l.strip()=="":
+                        continue
+                    (key, val) = tuple([ s.strip() for s in l.split('=') ])
+                    val =  val.strip('[]') 
+                    if (key == self.DURATION_VAR_NAME):
+                        self.duration_var.set(val)
+                    elif (key == self.DISCRET_VAR_NAME):
+                        self.discret_var.set(val)
+                    elif (key == self.CURRENT_VAR_NAME):
+                        self.current_var.set(val)
+                    elif (key == self.FREQ_VAR_NAME):
+                        self.freq_var.set(val)
+                    elif (key == self.CURRENT_TYPE_VAR_NAME):
+                        self.current_type_var.set(val)
+                    elif (key == self.EXCT_TYPE_VAR_NAME):
+                        self.excitation_type_var.set(val)   
+                    elif (key == self.ALPHA_VAR_NAME):
+                        self.alpha_var.set(val)
+                    elif (key == self.K_OVERRIDE_VAL_VAR_NAME):
+                        self.k_override_value_var.set(val)
+                    elif (key == self.K_OVERRIDE_VAR_NAME):
+                        self.k_override_var.set(val == 'True')
+                    elif (key == self.SCHEMA_VAR_NAME):
+                        self.schema_var.set(val)
+                    elif (key == self.ADAPTIVE_GRID_VAR_NAME):
+                        self.adaptive_grid_var.set(val == 'True')
+        
+    def save(self, file = "work.exct.txt"):   
+        f = open(file, "w")
+        f.write( ''.join([self.DURATION_VAR_NAME, ' = ', self.duration_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.DISCRET_VAR_NAME, ' = ', self.discret_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.FREQ_VAR_NAME, ' = ', self.freq_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.CURRENT_VAR_NAME, ' = ', self.current_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.CURRENT_TYPE_VAR_NAME, ' = ', self.current_type_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.ALPHA_VAR_NAME, ' = ', self.alpha_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.EXCT_TYPE_VAR_NAME, ' = ', self.excitation_type_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.K_OVERRIDE_VAL_VAR_NAME, ' = ', self.k_override_value_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.K_OVERRIDE_VAR_NAME, ' = ', 'True' if self.k_override_var.get() else 'False' ]) ); f.write( '\n' )
+        f.write( ''.join([self.SCHEMA_VAR_NAME, ' = ', self.schema_var.get() ]) ); f.write( '\n' )
+        f.write( ''.join([self.ADAPTIVE_GRID_VAR_NAME, ' = ', 'True' if self.adaptive_grid_var.get() else 'False' ]) ); f.write( '\n' )
+        f.close()
+        
+    def geometry_schema(self):
+        # schema the geometry connections are built for
+        return "ABC" if self.excitation_type_var.get() == self.SRC_TYPE_GEN else self.schema_var.get()
+        
+    def peak_phase_number(self):
+        return 0 if self.schema_var.get()==self.SCHEMA_A_BC else (1 if self.schema_var.get()==self.SCHEMA_B_AC else 2)
+        
+    def asymK_override(self, Nph):
+        return self.excitation_type_var.get()==self.SRC_TYPE_RLC and Nph==3 and self.k_override_var.get()  
+        
+    def build_excitation(self):
+        T = str_to_flt( self.duration_var.get() )
+        N = str_to_int( self.discret_var.get() )
+        I = str_to_flt( self.current_var.get() )
+        current_type = "rms" if (self.current_type_var.get() == self.CUR_TYPE_RMS) else "peak"
+        excitation_type = "gen" if (self.excitation_type_var.get() == self.SRC_TYPE_GEN) else "rlc"
+        grid = "adaptive" if self.adaptive_grid_var.get() else "uniform"
+        return excitation.build(T, N, I, source_type = excitation_type, current=current_type, alpha=str_to_flt(self.alpha_var.get())/180*3.1415, freq=str_to_flt(self.freq_var.get()), grid=grid)
+        
+    def build_currents(self, geom, exct):
+        # branch currents of the geometry set on a copy of the excitation, returns it with the inductances
+        exct = copy.copy(exct)
+        inductances = None
+        if  not geom == None:
+            asymK_value = str_to_flt(self.k_override_value_var.get()) if self.asymK_override(geom.getCircuitPhaseCount()) else None
+            inductances = solution.evalBranchCurrents(geom, exct, peakPhaseNumber = self.peak_phase_number() , asymK_override = asymK_value)
+        return ( exct, inductances )
+
+def loadCase(geom_file, exct_file = None):
+    # geometry, excitation with its branch currents and inductances of a project, 
+    # the defaults of the application for the excitation when exct_file is None;
+    # raises FileNotFoundError for a missing file (the GUI falls back to its sample project instead)
+    # and ValueError with the check messages when the geometry is not valid
+    for file in (geom_file, exct_file):
+        if file is not None and not os.path.isfile(file):
+            raise FileNotFoundError('No such project file: %r' % file)
+    exct_project = ExcitationProject()
+    exct_project.init()
+    exct_project.load("" if exct_file is None else exct_file)
+    geom_project = GeometryProject()
+    geom_project.init()
+    geom_project.load(geom_file)
+    geom_project.schema = exct_project.geometry_schema()
+    geom = geom_project.build()
+    if not geom_project.valid or geom is None:
+        raise ValueError(geom_project.STATUS_ERROR + geom_project.error_message)
+    ( exct, inductances ) = exct_project.build_currents(geom, exct_project.build_excitation())
+    return ( geom, exct, inductances )
@@ -1,26 +1,55 @@
 import numpy as np
-import mpmath
-from numpy import log, arctan2, fill_diagonal
+import os
+import warnings
+from numpy import log, arctan2
 from logic.geometry import Geometry
 from logic.excitation import Excitation
+from logic.cache import kernel_cache
+import logic.parallel as parallel
+import logic.multipole as multipole
+import logic.profiling as profiling
+import contextlib
 from dataclasses import dataclass
+from typing import Final
+
+FLOAT_BYTES : Final = 8
+PAIR_TEMPS : Final = 16 # simultaneous float temporaries per evaluated pair in the block kernels
+BACKENDS : Final = ("numpy", "numba")
+BACKEND_ENV_VAR : Final = "SOLUTION_BACKEND" # kernel backend used when a call does not select one, numpy by default
+PARALLEL_TILE_BYTES : Final = 8*2**20 # tile budget of the parallel mode when max_bytes is not given
+ENVELOPE_CHUNK_BYTES : Final = 8*2**20 # time chunk of solveEnvelope when max_bytes is not given
+BISECTIONS : Final = 60 # halvings of the sampling step bracketing a force extreme, down to machine precision
+
+# geometry arrays the kernels depend on, the phase count is added to the cache key separately
+BIOTSAVART_FIELDS : Final = ('XS', 'XE', 'YS', 'YE', 'ZS', 'ZE', 'NP', 'X', 'Y', 'Z')
+AMPERE_FIELDS : Final = ('XS', 'XE', 'YS', 'YE', 'ZS', 'ZE', 'R', 'NP', 'NF')
+NEUMANN_FIELDS : Final = ('XS', 'XE', 'YS', 'YE', 'ZS', 'ZE', 'R', 'NP')
+# per segment arrays compared conductor by conductor to update cached kernels after an edit
+SEGMENT_FIELDS : Final = ('XS', 'XE', 'YS', 'YE', 'ZS', 'ZE', 'R', 'NP', 'NF')
 
 @dataclass
 class Inductances:
-    def __init__(self, L = np.array([])):
+    def __init__(self, L = np.array([]), M = np.array([])):
+        # L: inductance of every phase under the sign pattern of the schema, 
+        # M: (phases x phases) self (diagonal) and mutual inductances of the phases as branches
         self.L = L
+        self.M = M
         
 @dataclass
 class Forces:
-    def __init__(self, Fx = np.array([]), Fy = np.array([]), Fz = np.array([]), N = np.array([])):
+    def __init__(self, Fx = np.array([]), Fy = np.array([]), Fz = np.array([]), N = np.array([]), Ferr = np.array([])):
         self.Fx = Fx
         self.Fy = Fy
         self.Fz = Fz
         self.N = N
+        # bound on the error of every force component against the exact kernel, empty when exact
+        self.Ferr = Ferr
         
 @dataclass
 class Fields:
-    def __init__(self, Bx = np.array([]), By = np.array([]), Bz = np.array([])):
+    def __init__(self, Bx = np.array([]), By = np.array([]), Bz = np.array([]), Berr = np.array([])):
+        # bound on the error of |B| against the exact kernel, empty when exact
+        self.Berr = Berr
         self.Bx = Bx
         self.By = By
         self.By = Bz
@@ -28,6 +57,55 @@ class Fields:
         self.Btr = (Bx**2 + Bz**2)**0.5
         self.Bmag = (self.Bax**2 + self.Btr**2)**0.5
         
+@dataclass
+class Peaks:
+    def __init__(self, Fx = np.array([]), Fy = np.array([]), Fz = np.array([]), N = np.array([]), B = np.array([])):
+        # per case values of largest magnitude over time: signed forces (cases x masks), |B| (cases x points)
+        self.Fx = Fx
+        self.Fy = Fy
+        self.Fz = Fz
+        self.N = N
+        self.B = B
+        
+@dataclass
+class WorstCase:
+    def __init__(self, F = np.array([]), t = np.array([]), alpha = np.array([]), N = np.array([])):
+        # extreme of Fx, Fy, Fz per mask (3 x masks) over time and closing angle: signed value,
+        # time [ms] and closing angle [rad] in [0, pi) (nan where the source does not depend on it)
+        self.F = F
+        self.t = t
+        self.alpha = alpha
+        self.N = N
+        
+@dataclass
+class Envelope:
+    def __init__(self, B = np.array([]), tB = np.array([]), Fmax = np.array([]), tFmax = np.array([]), Fmin = np.array([]), tFmin = np.array([]), 
+                 Frms = np.array([]), Fimpulse = np.array([]), N = np.array([])):
+        # running statistics over time of one solve: largest |B| per field point [T] and its time [ms];
+        # per force component and mask (3 x masks): largest and smallest force [N] with their times [ms],
+        # RMS over the span of the time axis [N] and impulse, the integral of F dt [N s]
+        self.B = B
+        self.tB = tB
+        self.Fmax = Fmax
+        self.tFmax = tFmax
+        self.Fmin = Fmin
+        self.tFmin = tFmin
+        self.Frms = Frms
+        self.Fimpulse = Fimpulse
+        self.N = N
+        
+@dataclass
+class PhasorResults:
+    def __init__(self, I = np.array([]), Bx = np.array([]), By = np.array([]), Bz = np.array([]), dc = Forces(), ac = Forces()):
+        # complex amplitudes: branch currents, fields per point and 2*omega forces per mask (ac), 
+        # dc holds the constant part of the forces
+        self.I = I
+        self.Bx = Bx
+        self.By = By
+        self.Bz = Bz
+        self.dc = dc
+        self.ac = ac
+        
 @dataclass
 class Results:
     phases : int
@@ -35,95 +113,507 @@ class Results:
     fields : Fields    
     times  : float
     inductances : Inductances    
-    def __init__(self, times : float, fields = Fields(), forces = Forces(), inductances = Inductances()):
+    profile : profiling.Profile
+    def __init__(self, times : float, fields = Fields(), forces = Forces(), inductances = Inductances(), profile = None):
         self.times = times
         self.fields = fields
         self.forces = forces
         self.inductances = inductances
+        self.profile = profile
         
-def solve(geometry : Geometry, excitation : Excitation):
-       
-    results = Results(
-        excitation.T,
-        biotsavart3d(geometry, excitation),
-        ampere3d(geometry, excitation)
-        )
+def solve(geometry : Geometry, excitation : Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None, tolerance = None, progress = None, profile = None):
+    # max_bytes bounds the working memory of the kernels (output histories are allocated in full), 
+    # None evaluates every kernel in one tile;
+    # geometric kernels are reused from cache while the geometry is unchanged, None disables caching;
+    # backend selects the NumPy ("numpy") or compiled ("numba") kernels, None reads SOLUTION_BACKEND;
+    # workers > 1 evaluates the tiles of the NumPy kernels in a process pool, the partial sums are reduced 
+    # in the serial order, so results are bit-identical to the serial run with the same max_bytes 
+    # (None is then replaced by PARALLEL_TILE_BYTES to have tiles to share);
+    # tolerance switches fields and forces to the Barnes-Hut kernels (logic.multipole) for large geometries, 
+    # every far interaction within tolerance of its scale, fields.Berr and forces.Ferr then bound the error 
+    # against the exact kernels (NumPy only, backend and workers do not apply);
+    # progress(fraction) is called as the stages and the tiles of the NumPy kernels complete, it may raise 
+    # (e.g. parallel.Cancelled) to abandon the solve;
+    # profile=True records time, CPU time, peak memory and sizes of the stages (logic.profiling) into 
+    # results.profile, a file path also appends them there as JSON lines; with None results.profile is the 
+    # profile recorded by the calling thread (profiling.record), if any
+    recording = profiling.record(profile if isinstance(profile, str) else None) if profile else contextlib.nullcontext()
+    with recording:
+        results = _solve(geometry, excitation, max_bytes, cache, backend, workers, tolerance, progress)
+        results.profile = profiling.active()
+    return results
+
+def _solve(geometry, excitation, max_bytes, cache, backend, workers, tolerance, progress):
+    stages = [lambda: biotsavart3d(geometry, excitation, max_bytes, cache, backend, workers, tolerance),
+              lambda: ampere3d(geometry, excitation, max_bytes, cache, backend, workers, tolerance)]
+    parts = []
+    for s, stage in enumerate(stages):
+        tiles = None if progress is None else lambda done, total: progress((s + done/total)/len(stages))
+        with parallel.reporting(tiles):
+            parts.append(stage())
+        if progress is not None:
+            progress((s + 1)/len(stages))
+    
+    results = Results(excitation.T, *parts)
         
     return results
-            
-def evalBranchCurrents(geometry: Geometry, excitation : Excitation , peakPhaseNumber = 0, asymK_override = None):
+
+def solveSweep(geometry : Geometry, excitation : Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # excitation carries a batch of cases (cases x phases x T currents, e.g. built for an array of alpha 
+    # and passed through evalBranchCurrents), kernels are computed once and applied to the whole batch, 
+    # only the peaks over time are kept; max_bytes bounds the histories evaluated at once
+    I = excitation.I
+    if I.ndim == 2:
+        I = I[np.newaxis]
+    P = I.shape[1]
+    [Kx, Ky, Kz] = _biotsavart3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+    [C, N] = _ampere3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+    # forces are linear in the phase current products I_p*I_q
+    C = np.reshape(C, (3, -1, P*P))
+    
+    F = np.zeros((3, I.shape[0], C.shape[1]))
+    B = np.zeros((I.shape[0], Kx.shape[0]))
+    item_bytes = (3*Kx.shape[0] + 3*C.shape[1] + P*P)*I.shape[2]*FLOAT_BYTES
+    for a in _tiles(I.shape[0], item_bytes, max_bytes):
+        Q = np.reshape(I[a,:,np.newaxis,:]*I[a,np.newaxis,:,:], (-1, P*P, I.shape[2]))
+        for k in range(3):
+            F[k,a] = _signed_peak(C[k] @ Q)
+        B[a] = np.max( ( (Kx @ I[a])**2 + (Ky @ I[a])**2 + (Kz @ I[a])**2 )**0.5, axis=2, initial=0)
+        
+    return Peaks(F[0], F[1], F[2], N, B)
+
+def evalPeaks(results : Results):
+    # values of largest magnitude over time of one solve: signed forces per mask, |B| per field point
+    return Peaks(_signed_peak(results.forces.Fx), _signed_peak(results.forces.Fy), _signed_peak(results.forces.Fz), 
+                 results.forces.N, np.max(results.fields.Bmag, axis=-1, initial=0))
+
+def solveEnvelope(geometry : Geometry, excitation : Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # statistics of fields and forces over time without their histories: time is processed in chunks of 
+    # at most max_bytes (ENVELOPE_CHUNK_BYTES when None) and only running values are kept, so the memory does 
+    # not grow with the time steps; max_bytes, cache, backend and workers apply to the kernels as in solve
+    with profiling.stage('envelope', lambda: _sizes(geometry, excitation)):
+        I = excitation.I
+        T = excitation.T
+        P = I.shape[0]
+        [Kx, Ky, Kz] = _biotsavart3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+        [C, N] = _ampere3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+        # forces are linear in the phase current products I_p*I_q, components and masks are stacked
+        C = np.reshape(C, (-1, P*P))
+        
+        B = np.zeros(Kx.shape[0])
+        iB = np.zeros(Kx.shape[0], dtype=int)
+        Fmax = np.full(C.shape[0], -np.inf)
+        iFmax = np.zeros(C.shape[0], dtype=int)
+        Fmin = np.full(C.shape[0], -np.inf) # largest -F
+        iFmin = np.zeros(C.shape[0], dtype=int)
+        F1 = np.zeros(C.shape[0])
+        F2 = np.zeros(C.shape[0])
+        last = None
+        item_bytes = (4*Kx.shape[0] + 3*C.shape[0] + P*P)*FLOAT_BYTES
+        for t in _tiles(T.size, item_bytes, ENVELOPE_CHUNK_BYTES if max_bytes is None else max_bytes):
+            _running_max(B, iB, ( (Kx @ I[:,t])**2 + (Ky @ I[:,t])**2 + (Kz @ I[:,t])**2 )**0.5, t.start)
+            F = C @ np.reshape(I[:,np.newaxis,t]*I[np.newaxis,:,t], (P*P, -1))
+            _running_max(Fmax, iFmax, F, t.start)
+            _running_max(Fmin, iFmin, -F, t.start)
+            # trapezoids of F and F^2 over the chunk and the step joining it to the previous chunk
+            Fs = F if last is None else np.concatenate([last[:,np.newaxis], F], axis=1)
+            dt = np.diff(T[t.start - (last is not None):t.stop])
+            F1 += (Fs[:,1:] + Fs[:,:-1]) @ dt/2
+            F2 += (Fs[:,1:]**2 + Fs[:,:-1]**2) @ dt/2
+            last = F[:,-1]
+        
+        if T.size == 0:
+            return Envelope(B, np.zeros(B.shape), *[np.zeros((3, N.size))]*6, N)
+        span = T[-1] - T[0]
+        Frms = (F2/span)**0.5 if span > 0 else np.abs(Fmax)
+        per_mask = lambda A: np.reshape(A, (3, -1))
+        # the time axis is in ms
+        return Envelope(B, T[iB], per_mask(Fmax), per_mask(T[iFmax]), per_mask(-Fmin), per_mask(T[iFmin]), 
+                        per_mask(Frms), per_mask(1e-3*F1), N)
+
+def _running_max(value, index, X, start):
+    # value, index (time step) of the largest element of every row seen so far, updated with the chunk X from step start
+    if X.shape[1] == 0:
+        return
+    j = np.argmax(X, axis=1)
+    m = X[np.arange(X.shape[0]), j]
+    better = m > value
+    value[better] = m[better]
+    index[better] = start + j[better]
+
+def findWorstCase(geometry : Geometry, excitation : Excitation, points_per_period = 32, candidates = 3, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # global extremes of the forces over time (span of excitation.T) and closing angle, 
+    # excitation comes from excitation.build (closed form waveform) passed through evalBranchCurrents;
+    # with source currents u = A*cos(alpha) + B*sin(alpha) a mask force is u'Du = c0 + c1*cos(2alpha) + c2*sin(2alpha),
+    # its extremes over alpha are c0 +- r (r = (c1^2 + c2^2)^0.5), which are sampled in time, the best
+    # local maxima are refined by bisection on their analytic time derivative
+    waveform = excitation.waveform
+    if waveform is None:
+        exit('Exit on error: findWorstCase - Excitation must be built from a closed form waveform')
+    if geometry.NF.size == 0:
+        return WorstCase()
+    
+    [C, N] = _ampere3d_kernel(geometry, excitation.K.shape[0], max_bytes, cache, backend, workers)
+    M = excitation.K
+    D = np.einsum('pi,kmpq,qj->kmij', M, C, M)
+    D = np.reshape(D + np.swapaxes(D, 2, 3), (-1,) + D.shape[2:])/2
+    
+    # series to maximize: s*c0 + r for s = +1 (largest positive force) and s = -1 (largest negative force)
+    D = np.concatenate([D, D])
+    s = np.repeat([1.0, -1.0], D.shape[0]//2)
     
+    t0 = excitation.T[0]
+    t1 = excitation.T[-1]
+    n = int(max(points_per_period*np.ceil((t1 - t0)*waveform.omega/(2*np.pi)), 16)) + 1
+    T = np.linspace(t0, t1, n)
+    [H, _, _] = _worst_case_terms(waveform.basis(T), D[:,np.newaxis], s[:,np.newaxis])
+    
+    # best sampled local maxima (end points included) bracketed by their neighbours
+    Hn = np.pad(H, ((0,0),(1,1)), constant_values=-np.inf)
+    H = np.where((H >= Hn[:,:-2]) & (H >= Hn[:,2:]), H, -np.inf)
+    i = np.argsort(-H, axis=1)[:,:min(candidates, n)]
+    ser = np.repeat(np.arange(D.shape[0]), i.shape[1])
+    i = i.ravel()
+    lo = T[np.maximum(i-1, 0)]
+    hi = T[np.minimum(i+1, n-1)]
+    [_, dlo, _] = _worst_case_terms(waveform.basis(lo), D[ser], s[ser])
+    [_, dhi, _] = _worst_case_terms(waveform.basis(hi), D[ser], s[ser])
+    bracket = (dlo > 0) & (dhi < 0)
+    for _ in range(BISECTIONS):
+        mid = (lo + hi)/2
+        [_, dmid, _] = _worst_case_terms(waveform.basis(mid), D[ser], s[ser])
+        lo = np.where(bracket & (dmid > 0), mid, lo)
+        hi = np.where(bracket & (dmid <= 0), mid, hi)
+    t = np.where(bracket, (lo + hi)/2, T[i])
+    [H, _, alpha] = _worst_case_terms(waveform.basis(t), D[ser], s[ser])
+    [Hs, _, alpha_s] = _worst_case_terms(waveform.basis(T[i]), D[ser], s[ser])
+    t = np.where(H >= Hs, t, T[i])
+    alpha = np.where(H >= Hs, alpha, alpha_s)
+    H = np.maximum(H, Hs)
+    
+    # best candidate of both signs for every component and mask
+    per_series = lambda A: np.reshape(np.swapaxes(np.reshape(A, (2, D.shape[0]//2, -1)), 0, 1), (D.shape[0]//2, -1))
+    j = np.argmax(per_series(H), axis=1)[:,np.newaxis]
+    pick = lambda A: np.take_along_axis(per_series(A), j, axis=1)[:,0]
+    F = pick(s[ser]*H)
+    t = pick(t)
+    alpha = pick(alpha) if waveform.source_type == "gen" else np.full(F.shape, np.nan)
+    
+    return WorstCase(np.reshape(F, (3, -1)), np.reshape(t, (3, -1)), np.reshape(alpha, (3, -1)), N)
+
+def solvePhasor(geometry : Geometry, I, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # steady state at one angular frequency omega, every quantity is x(t) = Re(X*exp(j*omega*t)):
+    # I holds complex branch currents (... x phases), fields are complex, forces are 
+    # F(t) = Fdc + Re(F2w*exp(2j*omega*t)) from the phasor products, no time axis is involved
+    I = np.asarray(I, dtype=complex)
+    P = I.shape[-1]
+    [Kx, Ky, Kz] = _biotsavart3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+    [C, N] = _ampere3d_kernel(geometry, P, max_bytes, cache, backend, workers)
+    dc = np.einsum('kmpq,...p,...q->k...m', C, I, np.conj(I)).real/2
+    ac = np.einsum('kmpq,...p,...q->k...m', C, I, I)/2
+    return PhasorResults(I, I @ Kx.T, I @ Ky.T, I @ Kz.T, Forces(dc[0], dc[1], dc[2], N), Forces(ac[0], ac[1], ac[2], N))
+
+def phasorCurrents(excitation : Excitation):
+    # complex branch currents of the steady state of the excitation (built by excitation.build and passed 
+    # through evalBranchCurrents): the AC part of the generator currents, the undamped RLC oscillation
+    return excitation.waveform.phasors() @ excitation.K.T
+
+def _biotsavart3d_kernel(geometry : Geometry, P, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # cached (points x phases) couplings Kx, Ky, Kz, a sum of segment terms
+    terms = lambda g, s: _biotsavart3d_coupling(g.XS[s], g.XE[s], g.YS[s], g.YE[s], g.ZS[s], g.ZE[s], 
+                                                g.X, g.Y, g.Z, _phase_matrix(g.NP[s], P), g.NA[s], max_bytes, backend, workers)
+    return _geometry_kernel(cache, 'biotsavart3d', BIOTSAVART_FIELDS, geometry, P, 
+        lambda: terms(geometry, slice(None)),
+        lambda K, old, so, sn: _add(_add(K, terms(old, so), -1), terms(geometry, sn), +1))
+
+def _ampere3d_kernel(geometry : Geometry, P, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # cached (components x masks x phases x phases) pair coefficients and the phases of the masks
+    if geometry.NF.size == 0:
+        return np.zeros((3, 0, P, P)), np.array([])
+    pairs = lambda g: lambda rows, cols: _ampere3d_coefficients(g.XS, g.XE, g.YS, g.YE, g.ZS, g.ZE, g.R, _phase_matrix(g.NP, P), 
+                                                                g.NF, g.NA, max_bytes, backend, workers, rows, cols)
+    C = _geometry_kernel(cache, 'ampere3d', AMPERE_FIELDS, geometry, P, 
+        lambda: pairs(geometry)(None, None),
+        lambda C, old, so, sn: _pair_update(C, pairs(old), old.XS.size, so, pairs(geometry), geometry.XS.size, sn))
+    return np.array(C), _mask_phases(geometry.NP, geometry.NF)
+
+def _neumann3d_kernel(geometry : Geometry, P, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # cached self inductances and mutual inductance sums of the phases
+    pairs = lambda g: lambda rows, cols: _neumann3d_phase(g.XS, g.XE, g.YS, g.YE, g.ZS, g.ZE, g.R, _phase_matrix(g.NP, P), 
+                                                          g.NA, max_bytes, backend, workers, rows, cols)
+    return _geometry_kernel(cache, 'neumann3d', NEUMANN_FIELDS, geometry, P, 
+        lambda: pairs(geometry)(None, None),
+        lambda K, old, so, sn: _pair_update(K, pairs(old), old.XS.size, so, pairs(geometry), geometry.XS.size, sn))
+
+def _geometry_kernel(cache, name, fields, geometry, P, compute, update):
+    # kernel stored for the geometry content, on a miss the latest kernel of the same family (kernel, phase 
+    # count and arrays other than segments) is updated when only some conductors were edited: 
+    # update(kernel, old geometry, old segments, new segments) swaps their terms, O(S*S_k) instead of O(S^2)
+    with profiling.stage('kernel'):
+        if cache is None:
+            return compute()
+        family = (name, P, geometry.getContentHash(tuple(f for f in fields if f not in SEGMENT_FIELDS)))
+        def build():
+            base = cache.latest(family)
+            edited = None if base is None else _edited_segments(base[1], geometry)
+            return compute() if edited is None else update(base[0], base[1], *edited)
+        return cache.fetch((name, geometry.getContentHash(fields), P), build, family, _snapshot(geometry, fields))
+
+def _snapshot(geometry : Geometry, fields):
+    # state of a cached kernel: copies of the arrays an update reads from the old geometry (the kernel fields, 
+    # the compared segment fields, axes and conductors), in place edits of the solved geometry do not reach them
+    state = Geometry.__new__(Geometry)
+    for f in dict.fromkeys(fields + SEGMENT_FIELDS + ('NA', 'NC')):
+        setattr(state, f, np.array(getattr(geometry, f)))
+    return state
+
+def _edited_segments(old : Geometry, new : Geometry):
+    # segments of the conductors that differ, (old indices, new indices), None when the conductors do not 
+    # correspond or when so many segments changed that a full evaluation is cheaper
+    A = old.getConductorSegments()
+    B = new.getConductorSegments()
+    if len(A) != len(B) or old.NF.shape[0] != new.NF.shape[0]:
+        return None
+    data = lambda g, s: [getattr(g, f)[...,s] if getattr(g, f).shape[-1] == g.XS.size else None for f in SEGMENT_FIELDS]
+    edited = [(a, b) for a, b in zip(A, B) if a.size != b.size or 
+              not all(np.array_equal(x, y) for x, y in zip(data(old, a), data(new, b)))]
+    so = np.concatenate([a for a, _ in edited] + [np.zeros(0, dtype=int)])
+    sn = np.concatenate([b for _, b in edited] + [np.zeros(0, dtype=int)])
+    # pairs touching the edited segments are evaluated twice (removed and added)
+    if 2*(so.size + sn.size) >= new.XS.size:
+        return None
+    return so, sn
+
+def _pair_update(K, old_pairs, n_old, so, new_pairs, n_new, sn):
+    # pair kernel of the old geometry turned into the kernel of the new one: the terms of pairs touching
+    # the edited segments (edited rows, then the other rows against edited columns) are removed and added
+    for (pairs, n, s, sign) in [(old_pairs, n_old, so, -1), (new_pairs, n_new, sn, +1)]:
+        rest = np.setdiff1d(np.arange(n), s)
+        K = _add(K, pairs(s, np.arange(n)), sign)
+        K = _add(K, pairs(rest, s), sign)
+    return K
+
+def _add(A, B, sign):
+    # A + sign*B over (nested) lists of arrays
+    if isinstance(A, np.ndarray):
+        return A + sign*B
+    return [_add(a, b, sign) for a, b in zip(A, B)]
+
+def _worst_case_terms(basis, D, s):
+    # s*c0 + r, its time derivative and the closing angle of the extreme, for source basis A, B (phases x ...)
+    [A, B, dA, dB] = [np.moveaxis(X, 0, -1) for X in basis]
+    quad = lambda x, y: np.einsum('...i,...ij,...j->...', x, D, y)
+    AA = quad(A, A)
+    BB = quad(B, B)
+    AB = quad(A, B)
+    c0 = (AA + BB)/2
+    c1 = (AA - BB)/2
+    c2 = AB
+    dc0 = quad(A, dA) + quad(B, dB)
+    dc1 = quad(A, dA) - quad(B, dB)
+    dc2 = quad(dA, B) + quad(A, dB)
+    r = ( c1**2 + c2**2 )**0.5
+    dr = np.divide(c1*dc1 + c2*dc2, r, out=np.zeros_like(r), where=r>0)
+    alpha = np.mod(arctan2(s*c2, s*c1)/2, np.pi)
+    return s*c0 + r, s*dc0 + dr, alpha
+
+def _sizes(geometry : Geometry, excitation : Excitation):
+    # problem sizes reported with the profiled stages
+    return {'S': int(geometry.XS.size), 'P': int(geometry.getCircuitPhaseCount()), 'T': int(excitation.current.shape[-1]), 
+            'masks': int(geometry.NF.shape[0]), 'points': int(geometry.X.size)}
+
+def _signed_peak(F):
+    # value of largest magnitude along the last (time) axis
+    if F.shape[-1] == 0:
+        return np.zeros(F.shape[:-1])
+    i = np.argmax(np.abs(F), axis=-1)
+    return np.take_along_axis(F, i[...,np.newaxis], axis=-1)[...,0]
+            
+def evalBranchCurrents(geometry: Geometry, excitation : Excitation , peakPhaseNumber = 0, asymK_override = None, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    # the peak phase carries the source current, the other phases return it in parallel; generator phases 
+    # feed the branches p with p % 3 == phase (the first one feeds the circuit below 3 phases);
+    # parallel branches share the current with equal inductive voltage drops, a linear solve on the full 
+    # inductance matrix (cached with the geometry, so other schemas only redo the small solve);
+    # excitation.K maps the source currents to the branch currents
     N = geometry.getCircuitPhaseCount()
+    peak = peakPhaseNumber % N if N >= 3 else 0
     
+    excitation.K = -np.ones((N, 1))
+    excitation.K[peak] = 1
     
-    if (N<3):         
-        excitation.K = np.array([1, -1])[:N,np.newaxis]
-    else:
-        excitation.K = np.array([1, -0.5, -0.5])[:N,np.newaxis]   
-        excitation.K = np.roll(excitation.K, peakPhaseNumber, axis=0) 
+    inductances = neumann3d(geometry, excitation, max_bytes, cache, backend, workers)         
     
-    inductances = neumann3d(geometry, excitation)         
+    # peak phase forward, all the others backward
+    schema = np.zeros((N, 2))
+    schema[:,1] = 1
+    schema[peak] = [1, 0]
+    K = _parallel_split(inductances.M, schema) @ np.array([[1.0], [-1.0]])
      
     if (N==3):      
-        i = np.delete(np.arange(3),np.where(excitation.K[:,0] == 1))
-        j = i[::-1]
-        
-        if asymK_override==None:
-            excitation.K[i,0] = np.sign(excitation.K[i,0])/(1 + inductances.L[i]/inductances.L[j])
-        else:
-            excitation.K[i[0],0] = -(1 + asymK_override)/2
-            excitation.K[i[1],0] = -(1 - asymK_override)/2
-        
-        excitation.asymK = ( - inductances.L[i[0]] + inductances.L[j[0]])/(inductances.L[i[0]] + inductances.L[j[0]])
+        i = np.delete(np.arange(3), peak)
+        excitation.asymK = -2*K[i[0],0] - 1
+        if not asymK_override==None:
+            K[i[0],0] = -(1 + asymK_override)/2
+            K[i[1],0] = -(1 - asymK_override)/2
         
     if (excitation.current.ndim == 1):
-        excitation.I = np.repeat(excitation.current[np.newaxis,:], repeats=N, axis=0) 
-        excitation.I = np.multiply(excitation.I, excitation.K) 
+        excitation.K = K
+        excitation.I = excitation.K @ excitation.current[np.newaxis,:]
         excitation.U = np.repeat(excitation.voltage[np.newaxis,:], repeats=N, axis=0) 
-    elif (N<3):         
-        excitation.I = np.repeat(excitation.current[0,:][np.newaxis,:], repeats=N, axis=0)
-        excitation.I = np.multiply(excitation.I, excitation.K) 
-        excitation.U = np.repeat(excitation.voltage[0,:][np.newaxis,:], repeats=N, axis=0)
     else:
-        excitation.I = np.roll(excitation.current, 0, axis=0)
-        excitation.U = np.roll(excitation.voltage, 0, axis=0)
+        # generator phase of every branch, for every case of a batch
+        phase = np.zeros((N, 3))
+        phase[np.arange(N), np.arange(N) % 3 if N >= 3 else 0] = 1
+        excitation.K = _parallel_split(inductances.M, phase) if N >= 3 else K*phase
+        excitation.I = excitation.K @ excitation.current
+        excitation.U = phase @ excitation.voltage
         
     return inductances
+
+def _parallel_split(M, G):
+    # (branches x groups) branch currents for unit currents of groups of parallel branches (one-hot G): 
+    # branches of a group have equal voltage drops M @ i and their currents add up to the group current
+    n = np.sum(G != 0, axis=0)
+    if np.all(n <= 1):
+        return G.astype(float)
+    g = np.flatnonzero(n)
+    # the collinear terms of the Neumann kernel count a pair only when the second segment is ahead, 
+    # the symmetric part keeps the split independent of the order of the branches
+    M = (M + M.T)/2
+    A = np.block([[M, -G[:,g]], [G[:,g].T, np.zeros((g.size, g.size))]])
+    b = np.concatenate([np.zeros((M.shape[0], g.size)), np.eye(g.size)])
+    try:
+        X = np.linalg.solve(A, b)
+    except np.linalg.LinAlgError:
+        exit('Exit on error: evalBranchCurrents - Singular inductance matrix of parallel branches')
+    K = np.zeros(G.shape)
+    K[:,g] = X[:M.shape[0]]
+    return K
  
 def fun(y,a,c):
+    import mpmath
     return mpmath.ellippi(1-c**2/a**2, arctan2(y, c), 0) 
         
-def biotsavart3d(geometry : Geometry, excitation : Excitation):
-    [Bx, By, Bz] = _biotsavart3d(
-        excitation.T, 
-        excitation.I, 
-        geometry.XS, 
-        geometry.XE, 
-        geometry.YS, 
-        geometry.YE, 
-        geometry.ZS,
-        geometry.ZE, 
-        geometry.NP,
-        geometry.X,
-        geometry.Y,
-        geometry.Z)
-    return Fields(Bx, By, Bz)       
+def biotsavart3d(geometry : Geometry, excitation : Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None, tolerance = None):
+    with profiling.stage('biotsavart3d', lambda: _sizes(geometry, excitation)):
+        kernel = None if tolerance is not None else _biotsavart3d_kernel(geometry, excitation.I.shape[0], max_bytes, cache, backend, workers)
+        [Bx, By, Bz, Berr] = _biotsavart3d(
+            excitation.T, 
+            excitation.I, 
+            geometry.XS, 
+            geometry.XE, 
+            geometry.YS, 
+            geometry.YE, 
+            geometry.ZS,
+            geometry.ZE, 
+            geometry.NP,
+            geometry.X,
+            geometry.Y,
+            geometry.Z,
+            geometry.NA,
+            max_bytes,
+            cache,
+            ('biotsavart3d', geometry.getContentHash(BIOTSAVART_FIELDS)),
+            backend,
+            workers,
+            tolerance,
+            kernel)
+    return Fields(Bx, By, Bz, Berr)       
       
-def _biotsavart3d(T, I, XS, XE, YS, YE, ZS, ZE, N3ph, X, Y, Z):
+def _fetch(cache, key, compute):
+    # kernel stored under key (phase count included) or computed directly when caching is off
+    return compute() if (cache is None or key is None) else cache.fetch(key, compute)
+
+def _compiled_kernels(backend):
+    # numba kernels when selected (per call, else by the environment variable) and installed, None for the NumPy ones
+    backend = os.environ.get(BACKEND_ENV_VAR, "numpy") if backend is None else backend
+    if backend not in BACKENDS:
+        exit('Exit on error: solution - backend must be one of %s' % (BACKENDS,))
+    if backend == "numpy":
+        return None
+    try:
+        import logic.kernels_numba as kernels
+    except ImportError:
+        warnings.warn('numba is not installed, the NumPy kernels are used')
+        return None
+    return kernels
+
+def _points(X, Y, Z):
+    # (3 x n) coordinates for the compiled kernels
+    return np.ascontiguousarray(np.array([X, Y, Z], dtype=float))
+
+def _phase_matrix(N3ph, P):
+    # one-hot (segments x phases) map folding segment terms into phase terms
+    Ph = np.zeros((N3ph.shape[0], P))
+    Ph[np.arange(N3ph.shape[0]), N3ph.astype(int)] = 1
+    return Ph
+
+def _axis_groups(NA):
+    # indices of segments along X, Y and Z, segments of other orientation do not interact
+    return [np.flatnonzero(NA==a) for a in range(3)]
+
+def _tiles(n, item_bytes, max_bytes):
+    # slices over n items, each tile needs at most max_bytes (but holds at least one item)
+    size = n if max_bytes is None else int(max_bytes // max(item_bytes, 1))
+    size = max(size, 1)
+    return [slice(i, min(i + size, n)) for i in range(0, n, size)]
+
+def _subset(groups, indices):
+    # axis groups restricted to indices, None keeps all segments
+    return groups if indices is None else [G[np.isin(G, indices)] for G in groups]
+
+def _tile_bytes(max_bytes, workers):
+    # a process pool needs several tiles to share, whole blocks are kept in the serial run
+    if max_bytes is None and workers is not None and workers > 1:
+        return PARALLEL_TILE_BYTES
+    return max_bytes
+
+def _tiles2d(n, m, max_bytes):
+    # (rows, columns) tiles over an n x m block of pairs evaluated by the block kernels
+    pair = PAIR_TEMPS*FLOAT_BYTES
+    cols = _tiles(m, pair, max_bytes)
+    rows = _tiles(n, pair*(cols[0].stop - cols[0].start) if m > 0 else pair, max_bytes)
+    return [(r, c) for r in rows for c in cols]
+
+def _biotsavart3d(T, I, XS, XE, YS, YE, ZS, ZE, N3ph, X, Y, Z, NA, max_bytes = None, cache = None, key = None, backend = None, workers = None, tolerance = None, kernel = None):
     if not( (XS.shape==XE.shape) & (YS.shape==YE.shape) & (ZS.shape==ZE.shape) &
             (XS.shape==YS.shape) & (XS.shape==ZS.shape) & (XS.shape==N3ph.shape) &
             (X.shape==Y.shape) & (X.shape==Z.shape) ):
         exit('Exit on error: biotsavart3d - Input vectors dimensions must agree')     
+    if not( tolerance is None or tolerance > 0 ):
+        exit('Exit on error: biotsavart3d - tolerance must be positive')
     
-    [x, _, x1] = np.meshgrid(X, T, XS, indexing='ij')
-    [x, _, x2] = np.meshgrid(X, T, XE, indexing='ij')
-    [y, _, y1] = np.meshgrid(Y, T, YS, indexing='ij')
-    [y, _, y2] = np.meshgrid(Y, T, YE, indexing='ij')
-    [z, _, z1] = np.meshgrid(Z, T, ZS, indexing='ij')
-    [z, _, z2] = np.meshgrid(Z, T, ZE, indexing='ij')
-    [_, nt, nc] = np.meshgrid(X, np.linspace(1, T.shape[0], T.shape[0])-1, N3ph, indexing='ij')
-      
-    i = I[nc.astype(int), nt.astype(int)]
+    # geometric factor does not depend on time: fold segments into phases once, 
+    # then apply the (points x phases) coupling to all time steps as a matrix product
+    Ph = _phase_matrix(N3ph, I.shape[0])
+    if kernel is not None:
+        [Kx, Ky, Kz] = kernel
+    elif tolerance is None:
+        [Kx, Ky, Kz] = _fetch(cache, key and key + (I.shape[0],),
+            lambda: _biotsavart3d_coupling(XS, XE, YS, YE, ZS, ZE, X, Y, Z, Ph, NA, max_bytes, backend, workers))
+    else:
+        [Kx, Ky, Kz, Kerr] = _fetch(cache, key and key + (I.shape[0], tolerance),
+            lambda: _biotsavart3d_multipole(XS, XE, YS, YE, ZS, ZE, X, Y, Z, Ph, NA, tolerance))
+    
+    with profiling.stage('fields'):
+        Bx = np.zeros((X.shape[0], I.shape[1]))
+        By = np.zeros((X.shape[0], I.shape[1]))
+        Bz = np.zeros((X.shape[0], I.shape[1]))
+        for t in _tiles(I.shape[1], 3*X.shape[0]*FLOAT_BYTES, max_bytes):
+            Bx[:,t] = Kx @ I[:,t]
+            By[:,t] = Ky @ I[:,t]
+            Bz[:,t] = Kz @ I[:,t]
+    
+    # the coupling error of every phase bounds the field error for any sign of the currents
+    Berr = np.array([]) if tolerance is None else Kerr @ np.abs(I)
+
+    return Bx, By, Bz, Berr
+
+def _biotsavart3d_coupling(XS, XE, YS, YE, ZS, ZE, X, Y, Z, Ph, NA, max_bytes = None, backend = None, workers = None):
+    kernels = _compiled_kernels(backend)
+    if kernels is not None:
+        return list(kernels.biotsavart3d_coupling(_points(XS, YS, ZS), _points(XE, YE, ZE), _points(X, Y, Z), 
+                                                  NA, np.argmax(Ph, axis=1), Ph.shape[1]))
     
     # Bx = 1e-7*i*(0
     #         + (x1==x2)*(y1==y2)*(z1!=z2)*( y-y1 )/( (x-x1)**2+(y-y1)**2 )*(
@@ -161,308 +651,371 @@ def _biotsavart3d(T, I, XS, XE, YS, YE, ZS, ZE, N3ph, X, Y, Z):
     #         )     
     #     )
     
-    Bx1 = +1* (x1==x2)*(y1==y2)*(z1!=z2)*( y-y1 )/( (x-x1)**2+(y-y1)**2 )*(z-z2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; Bx1[np.isnan(Bx1)] = 0
-    Bx2 = -1* (x1==x2)*(y1==y2)*(z1!=z2)*( y-y1 )/( (x-x1)**2+(y-y1)**2 )*(z-z1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; Bx2[np.isnan(Bx2)] = 0   
-    Bx3 = -1* (x1==x2)*(y1!=y2)*(z1==z2)*( z-z1 )/( (z-z1)**2+(x-x1)**2 )*(y-y2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; Bx3[np.isnan(Bx3)] = 0
-    Bx4 = +1* (x1==x2)*(y1!=y2)*(z1==z2)*( z-z1 )/( (z-z1)**2+(x-x1)**2 )*(y-y1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; Bx4[np.isnan(Bx4)] = 0
-    Bx = 1e-7*i*(Bx1 + Bx2 + Bx3 + Bx4)
-        
-    By1 = -1* (x1==x2)*(y1==y2)*(z1!=z2)*( x-x1 )/( (x-x1)**2+(y-y1)**2 )*(z-z2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; By1[np.isnan(By1)] = 0
-    By2 = +1* (x1==x2)*(y1==y2)*(z1!=z2)*( x-x1 )/( (x-x1)**2+(y-y1)**2 )*(z-z1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; By2[np.isnan(By2)] = 0
-    By3 = +1* (x1!=x2)*(y1==y2)*(z1==z2)*( z-z1 )/( (y-y1)**2+(z-z1)**2 )*(x-x2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; By3[np.isnan(By3)] = 0
-    By4 = -1* (x1!=x2)*(y1==y2)*(z1==z2)*( z-z1 )/( (y-y1)**2+(z-z1)**2 )*(x-x1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; By4[np.isnan(By4)] = 0
-    By = 1e-7*i*(By1 + By2 + By3 + By4)
-                
-    Bz1 = -1* (x1!=x2)*(y1==y2)*(z1==z2)*( y-y1 )/( (y-y1)**2+(z-z1)**2 )*(x-x2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; Bz1[np.isnan(Bz1)] = 0
-    Bz2 = +1* (x1!=x2)*(y1==y2)*(z1==z2)*( y-y1 )/( (y-y1)**2+(z-z1)**2 )*(x-x1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; Bz2[np.isnan(Bz2)] = 0
-    Bz3 = +1* (x1==x2)*(y1!=y2)*(z1==z2)*( x-x1 )/( (z-z1)**2+(x-x1)**2 )*(y-y2)/( (x-x2)**2+(y-y2)**2+(z-z2)**2 )**0.5; Bz3[np.isnan(Bz3)] = 0
-    Bz4 = -1* (x1==x2)*(y1!=y2)*(z1==z2)*( x-x1 )/( (z-z1)**2+(x-x1)**2 )*(y-y1)/( (x-x1)**2+(y-y1)**2+(z-z1)**2 )**0.5; Bz4[np.isnan(Bz4)] = 0 
-    Bz = 1e-7*i*(Bz1 + Bz2 + Bz3 + Bz4)
+    # the formulas are the same for the three orientations up to a cyclic permutation of axes:
+    # segment along axis a contributes to the field components along b = a+1 and c = a+2 only
+    arrays = dict(XS=XS, XE=XE, YS=YS, YE=YE, ZS=ZS, ZE=ZE, X=X, Y=Y, Z=Z, Ph=Ph)
+    max_bytes = _tile_bytes(max_bytes, workers)
+    tasks = [(a, p, G[j]) for a, G in enumerate(_axis_groups(NA)) for (p, j) in _tiles2d(X.shape[0], G.size, max_bytes)]
+    K = [np.zeros((X.shape[0], Ph.shape[1])) for _ in range(3)]
+    for (a, p, _), (Kb, Kc) in zip(tasks, parallel.map_tiles(_biotsavart3d_tile, tasks, arrays, workers)):
+        K[(a+1)%3][p] += Kb
+        K[(a+2)%3][p] += Kc
 
+    return K
 
-    Bx = np.sum(Bx, axis=2)
-    By = np.sum(By, axis=2)
-    Bz = np.sum(Bz, axis=2) 
+def _biotsavart3d_tile(arrays, task):
+    # coupling of points p to phases through segments g along axis a
+    (a, p, g) = task
+    b = (a+1)%3
+    c = (a+2)%3
+    S = [arrays['XS'], arrays['YS'], arrays['ZS']]
+    E = [arrays['XE'], arrays['YE'], arrays['ZE']]
+    P = [arrays['X'], arrays['Y'], arrays['Z']]
+    Ph = arrays['Ph']
+    [Kb, Kc] = _biotsavart3d_block(
+        P[a][p,np.newaxis] - S[a][np.newaxis,g], 
+        P[a][p,np.newaxis] - E[a][np.newaxis,g], 
+        P[b][p,np.newaxis] - S[b][np.newaxis,g], 
+        P[c][p,np.newaxis] - S[c][np.newaxis,g])
+    return Kb @ Ph[g], Kc @ Ph[g]
 
-    return Bx, By, Bz
+def _biotsavart3d_multipole(XS, XE, YS, YE, ZS, ZE, X, Y, Z, Ph, NA, tolerance):
+    # Barnes-Hut couplings: far octree nodes by their expansion, near segments by the exact closed form,
+    # with the (points x phases) bound on the norm of the coupling error
+    S = [XS, YS, ZS]
+    E = [XE, YE, ZE]
+    Q = [X, Y, Z]
+    g = np.flatnonzero(NA>=0)
+    tree = multipole.Octree(_points(XS, YS, ZS)[:,g].T, _points(XE, YE, ZE)[:,g].T, Ph[g])
+    theta = multipole.opening_angle(tolerance)
+    [n, P] = [X.shape[0], Ph.shape[1]]
+    ph = np.argmax(Ph, axis=1)
+    
+    K = np.zeros((3, n, P))
+    bound = np.zeros((n, P))
+    points = _points(X, Y, Z).T
+    h = np.zeros(n)
+    for p in _tiles(n, 1, multipole.TARGET_BLOCK):
+        [far_t, far_n, near_t, near_j] = tree.interactions(points[p], h[p], theta)
+        [B, bound[p]] = tree.far_field(points[p], np.zeros_like(points[p]), h[p], far_t, far_n)
+        K[:,p] += np.moveaxis(B, 2, 0)
+        t = near_t + p.start
+        j = g[near_j]
+        for a in range(3):
+            b = (a+1)%3
+            c = (a+2)%3
+            s = NA[j]==a
+            [Kb, Kc] = _biotsavart3d_block(Q[a][t[s]] - S[a][j[s]], Q[a][t[s]] - E[a][j[s]], 
+                                           Q[b][t[s]] - S[b][j[s]], Q[c][t[s]] - S[c][j[s]])
+            K[b] += np.reshape(np.bincount(t[s]*P + ph[j[s]], Kb, minlength=n*P), (n, P))
+            K[c] += np.reshape(np.bincount(t[s]*P + ph[j[s]], Kc, minlength=n*P), (n, P))
+    
+    return [K[0], K[1], K[2], bound]
+
+def _biotsavart3d_block(u1, u2, v, w):
+    # field of unit current in segments along axis a at points shifted by u1 (u2) from the start (end) 
+    # point along a and by v, w along the other axes; points on the segment axis get no field
+    rr = v**2 + w**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g = u2/( u2**2 + rr )**0.5 - u1/( u1**2 + rr )**0.5
+    g = np.divide(g, rr, out=np.zeros_like(rr), where=rr>0)
+    return 1e-7*w*g, -1e-7*v*g
 
 def caf(A, X, r):
     return (A-X)*((A-X)!=0) + ( 1/2*r**2/( A + r*(A==0) ) )*((A-X)==0)*(A!=0) + r*((A-X)==0)*(A==0)
 
-def ampere3d(geometry : Geometry, excitation : Excitation):
-    [Fx, Fy, Fz, N] = _ampere3d(
-        excitation.T, 
-        excitation.I, 
-        geometry.XS, 
-        geometry.XE, 
-        geometry.YS, 
-        geometry.YE, 
-        geometry.ZS,
-        geometry.ZE,
-        geometry.R,
-        geometry.NP,
-        geometry.NF)
-    return Forces(Fx, Fy, Fz, N)
-
-def _ampere3d(T, I, XS, XE, YS, YE, ZS, ZE, R, N3ph, NF):
+def ampere3d(geometry : Geometry, excitation : Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None, tolerance = None):
+    with profiling.stage('ampere3d', lambda: _sizes(geometry, excitation)):
+        kernel = None
+        if tolerance is None and geometry.NF.size > 0:
+            [kernel, _] = _ampere3d_kernel(geometry, excitation.I.shape[0], max_bytes, cache, backend, workers)
+        [Fx, Fy, Fz, N, Ferr] = _ampere3d(
+            excitation.T, 
+            excitation.I, 
+            geometry.XS, 
+            geometry.XE, 
+            geometry.YS, 
+            geometry.YE, 
+            geometry.ZS,
+            geometry.ZE,
+            geometry.R,
+            geometry.NP,
+            geometry.NF,
+            geometry.NA,
+            max_bytes,
+            cache,
+            ('ampere3d', geometry.getContentHash(AMPERE_FIELDS)),
+            backend,
+            workers,
+            tolerance,
+            kernel)
+    return Forces(Fx, Fy, Fz, N, Ferr)
+
+def _ampere3d(T, I, XS, XE, YS, YE, ZS, ZE, R, N3ph, NF, NA, max_bytes = None, cache = None, key = None, backend = None, workers = None, tolerance = None, kernel = None):
     if not( (XS.shape==XE.shape) & (YS.shape==YE.shape) & (ZS.shape==ZE.shape) &
         (XS.shape==YS.shape) & (XS.shape==ZS.shape) & (XS.shape==N3ph.shape)  ):
         exit('Exit on error: ampere3d - Input vectors dimensions must agree')     
+    if not( tolerance is None or tolerance > 0 ):
+        exit('Exit on error: ampere3d - tolerance must be positive')
 
-    [xs_1, _, xs_2] = np.meshgrid(XS, T, XS, indexing='ij')
-    [xe_1, _, xe_2] = np.meshgrid(XE, T, XE, indexing='ij')
-    [ys_1, _, ys_2] = np.meshgrid(YS, T, YS, indexing='ij')
-    [ye_1, _, ye_2] = np.meshgrid(YE, T, YE, indexing='ij')
-    [zs_1, _, zs_2] = np.meshgrid(ZS, T, ZS, indexing='ij')
-    [ze_1, _, ze_2] = np.meshgrid(ZE, T, ZE, indexing='ij')
-    [ r_1, _,  r_2] = np.meshgrid(R , T, R , indexing='ij')
-        
-    [nc1, nt, nc2] = np.meshgrid(N3ph, np.linspace(1, T.shape[0], T.shape[0])-1, N3ph, indexing='ij')
-      
-    i_1 = I[nc1.astype(int), nt.astype(int)]
-    i_2 = I[nc2.astype(int), nt.astype(int)]
-
-    L1x = (xe_1-xs_1)
-    L1y = (ye_1-ys_1)
-    L1z = (ze_1-zs_1)
-    L2x = (xe_2-xs_2)
-    L2y = (ye_2-ys_2)
-    L2z = (ze_2-zs_2)
-
-    SEx = (xe_2-xs_1)
-    SSx = (xs_2-xs_1)
-    SSy = (ys_2-ys_1)
-    ESy = (ys_2-ye_1)
-    ESx = (xs_2-xe_1)
-    EEx = (xe_2-xe_1)
-    EEy = (ye_2-ye_1)
-    SEy = (ye_2-ys_1)
-    SEz = (ze_2-zs_1)
-    EEz = (ze_2-ze_1)
-    SSz = (zs_2-zs_1)
-    ESz = (zs_2-ze_1)
-    SS = ( SSx**2 + SSy**2 + SSz**2 )**(1/2)
-    ES = ( ESx**2 + ESy**2 + ESz**2 )**(1/2)
-    EE = ( EEx**2 + EEy**2 + EEz**2 )**(1/2)
-    SE = ( SEx**2 + SEy**2 + SEz**2 )**(1/2)
-
-    # parallel segments interaction
-    condX = (L1x!=0)*(L2x!=0)*(L1y==0)*(L2y==0)*(L1z==0)*(L2z==0) # filter segments along X
-    condY = (L1x==0)*(L2x==0)*(L1y!=0)*(L2y!=0)*(L1z==0)*(L2z==0) # filter segments along Y
-    condZ = (L1x==0)*(L2x==0)*(L1y==0)*(L2y==0)*(L1z!=0)*(L2z!=0) # filter segments along Z
-    fx1 = + (SE-SS+ES-EE)*SSx*(condZ/( SSy**2 + SSx**2 ) + condY/( SSz**2 + SSx**2 ))
-    fy1 = + (SE-SS+ES-EE)*SSy*(condZ/( SSy**2 + SSx**2 ) + condX/( SSz**2 + SSy**2 ))
-    fz1 = + (SE-SS+ES-EE)*SSz*(condY/( SSz**2 + SSx**2 ) + condX/( SSz**2 + SSy**2 ))
-   
-    fx1[np.isnan(fx1)]=0
-    fy1[np.isnan(fy1)]=0
-    fz1[np.isnan(fz1)]=0
-    fx1[np.isinf(fx1)]=0
-    fy1[np.isinf(fy1)]=0
-    fz1[np.isinf(fz1)]=0
-    
-    # crossed Segments interaction
-    condXY = (L1x!=0)*(L1y==0)*(L1z==0)*   (L2x==0)*(L2y!=0)*(L2z==0) # filter segments pairs
-    condXZ = (L1x!=0)*(L1y==0)*(L1z==0)*   (L2x==0)*(L2y==0)*(L2z!=0) 
-    condYX = (L1x==0)*(L1y!=0)*(L1z==0)*   (L2x!=0)*(L2y==0)*(L2z==0) 
-    condYZ = (L1x==0)*(L1y!=0)*(L1z==0)*   (L2x==0)*(L2y==0)*(L2z!=0) 
-    condZX = (L1x==0)*(L1y==0)*(L1z!=0)*   (L2x!=0)*(L2y==0)*(L2z==0) 
-    condZY = (L1x==0)*(L1y==0)*(L1z!=0)*   (L2x==0)*(L2y!=0)*(L2z==0)
-
-    fx2 = (condZX+condYX)*( log( caf(SS,SSx,r_2) ) - log( caf(ES,ESx,r_2) ) - log( caf(SE,SEx,r_2) ) + log( caf(EE,EEx,r_2) )) 
-    fy2 = (condXY+condZY)*( log( caf(SS,SSy,r_2) ) - log( caf(ES,ESy,r_2) ) - log( caf(SE,SEy,r_2) ) + log( caf(EE,EEy,r_2) )) 
-    fz2 = (condYZ+condXZ)*( log( caf(SS,SSz,r_2) ) - log( caf(ES,ESz,r_2) ) - log( caf(SE,SEz,r_2) ) + log( caf(EE,EEz,r_2) ))
-
-    fx2[np.isnan(fx2)]=0
-    fy2[np.isnan(fy2)]=0
-    fz2[np.isnan(fz2)]=0
-    fx2[np.isinf(fx2)]=0
-    fy2[np.isinf(fy2)]=0
-    fz2[np.isinf(fz2)]=0
-
-    fx = fx1 + fx2 
-    fy = fy1 + fy2
-    fz = fz1 + fz2 
-
-    fx = fx*1e-7*i_2*i_1
-    fy = fy*1e-7*i_2*i_1
-    fz = fz*1e-7*i_2*i_1
-
-    if len(NF)>0:
-        [_, nc] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,N3ph, indexing='ij')
-        nc = nc.reshape(NF.shape[0], N3ph.shape[0])    
-        N = np.sum(nc*NF, axis=1)/np.sum(NF, axis=1)    
-        N[np.where(np.sum(abs(nc*NF - N[:,np.newaxis]*NF), axis=1)>0)] = -1
-    else:        
-        N = np.array([])
-        
-    FX = []
-    FY = []
-    FZ = []
-    for NF1 in NF:
-                
-        [nf1, nt, nf2] = np.meshgrid(NF1, np.linspace(1, T.shape[0], T.shape[0])-1, NF1, indexing='ij')
-        FX1 = np.sum(fx*(1-nf2), axis=2)
-        FY1 = np.sum(fy*(1-nf2), axis=2)
-        FZ1 = np.sum(fz*(1-nf2), axis=2) 
-       
-        FX1 = np.sum((FX1*nf1[:,:,0]), axis=0)
-        FY1 = np.sum((FY1*nf1[:,:,0]), axis=0)
-        FZ1 = np.sum((FZ1*nf1[:,:,0]), axis=0)
-        
-        FX.append(FX1)
-        FY.append(FY1)
-        FZ.append(FZ1)
-        
+    if NF.size == 0:
+        return np.array([]), np.array([]), np.array([]), np.array([]), np.array([])
     
-    FX = np.array(FX)
-    FY = np.array(FY)
-    FZ = np.array(FZ)
-    
-        
-    # FX = np.sum(fx, axis=2)
-    # FY = np.sum(fy, axis=2)
-    # FZ = np.sum(fz, axis=2) 
-
-    # if len(NF)>0:
-
-    #     [nf, _] = np.meshgrid(NF, np.linspace(1, T.shape[0], T.shape[0])-1, indexing='ij')
-    #     nf = nf.reshape(NF.shape[0], NF.shape[1], T.shape[0])
-    #     [_, fx] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,FX, indexing='ij')
-    #     fx = fx.reshape(NF.shape[0], FX.shape[0], T.shape[0])
-    #     [_, fy] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,FY, indexing='ij')
-    #     fy = fy.reshape(NF.shape[0], FY.shape[0], T.shape[0])
-    #     [_, fz] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,FZ, indexing='ij')
-    #     fz = fz.reshape(NF.shape[0], FZ.shape[0], T.shape[0])      
-          
-    #     [_, nc] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,N3ph, indexing='ij')
-    #     nc = nc.reshape(NF.shape[0], N3ph.shape[0])
-        
-        
-    #     N = np.sum(nc*NF, axis=1)/np.sum(NF, axis=1)    
-    #     N[np.where(np.sum(abs(nc*NF - N[:,np.newaxis]*NF), axis=1)>0)] = -1
-       
-    #     FX = np.sum((fx*nf), axis=1)
-    #     FY = np.sum((fy*nf), axis=1)
-    #     FZ = np.sum((fz*nf), axis=1)
-    # else:
-    #     FX = np.array([])
-    #     FY = np.array([])
-    #     FZ = np.array([])
-    #     N = np.array([])
-        
-    return FX, FY, FZ, N
-
-def neumann3d(geometry : Geometry, excitation: Excitation):
-    L = _neumann3d(
-        excitation.K,
-        geometry.XS, 
-        geometry.XE, 
-        geometry.YS, 
-        geometry.YE, 
-        geometry.ZS,
-        geometry.ZE, 
-        geometry.R,
-        geometry.NP,
-        geometry.NL
-        )
-    return Inductances(L)
-
-def _neumann3d(K, XS, XE, YS, YE, ZS, ZE, R, N3ph, NL):
+    N = _mask_phases(N3ph, NF)
     
-    [xs_1, xs_2] = np.meshgrid(XS, XS, indexing='ij')
-    [xe_1, xe_2] = np.meshgrid(XE, XE, indexing='ij')
-    [ys_1, ys_2] = np.meshgrid(YS, YS, indexing='ij')
-    [ye_1, ye_2] = np.meshgrid(YE, YE, indexing='ij')
-    [zs_1, zs_2] = np.meshgrid(ZS, ZS, indexing='ij')
-    [ze_1, ze_2] = np.meshgrid(ZE, ZE, indexing='ij')    
-    [nc1, nc2] = np.meshgrid(N3ph, N3ph, indexing='ij')
-    
-    k1 = K[nc1.astype(int),0]
-    k2 = K[nc2.astype(int),0]
-    
-    L1x = (xe_1-xs_1)
-    L1y = (ye_1-ys_1)
-    L1z = (ze_1-zs_1)
-    L2x = (xe_2-xs_2)
-    L2y = (ye_2-ys_2)
-    L2z = (ze_2-zs_2)
+    # pair force is geometric_term(i,j)*i_1(t)*i_2(t): reduce every mask to (phases x phases) 
+    # coefficients once, then forces are quadratic forms in the phase currents
+    Ph = _phase_matrix(N3ph, I.shape[0])
+    if kernel is not None:
+        [Cx, Cy, Cz] = kernel
+    elif tolerance is None:
+        [Cx, Cy, Cz] = _fetch(cache, key and key + (I.shape[0],),
+            lambda: _ampere3d_coefficients(XS, XE, YS, YE, ZS, ZE, R, Ph, NF, NA, max_bytes, backend, workers))
+    else:
+        [Cx, Cy, Cz, Cerr] = _fetch(cache, key and key + (I.shape[0], tolerance),
+            lambda: _ampere3d_multipole(XS, XE, YS, YE, ZS, ZE, R, Ph, NF, NA, tolerance))
     
-    L = ( (XE-XS)**2 + (YE-YS)**2 + (ZE-ZS)**2 )**(1/2)
+    with profiling.stage('masks'):
+        FX = _quadratic_form(Cx, I, max_bytes)
+        FY = _quadratic_form(Cy, I, max_bytes)
+        FZ = _quadratic_form(Cz, I, max_bytes)
+    FE = np.array([]) if tolerance is None else _quadratic_form(Cerr, np.abs(I), max_bytes)
         
-    SEx = (xe_2-xs_1)
-    SEy = (ye_2-ys_1)
-    SEz = (ze_2-zs_1)
-    SSx = (xs_2-xs_1)
-    SSy = (ys_2-ys_1)
-    SSz = (zs_2-zs_1)
-    ESx = (xs_2-xe_1)
-    ESy = (ys_2-ye_1)
-    ESz = (zs_2-ze_1)
-    EEx = (xe_2-xe_1)
-    EEy = (ye_2-ye_1)
-    EEz = (ze_2-ze_1)
-    
-    Syz = ( SSz**2 + SSy**2 )**0.5
-    Sxy = ( SSx**2 + SSy**2 )**0.5
-    Szx = ( SSz**2 + SSx**2 )**0.5
+    return FX, FY, FZ, N, FE
+
+def _mask_phases(N3ph, NF):
+    # phase of the segments of every mask, -1 for masks over several phases
+    [_, nc] = np.meshgrid(np.linspace(1,NF.shape[0],NF.shape[0])-1  ,N3ph, indexing='ij')
+    nc = nc.reshape(NF.shape[0], N3ph.shape[0])    
+    N = np.sum(nc*NF, axis=1)/np.sum(NF, axis=1)    
+    N[np.where(np.sum(abs(nc*NF - N[:,np.newaxis]*NF), axis=1)>0)] = -1
+    return N
+
+def _quadratic_form(C, I, max_bytes = None):
+    # F[m,t] = sum over p,q of C[m,p,q]*I[p,t]*I[q,t]
+    F = np.zeros((C.shape[0], I.shape[1]))
+    for t in _tiles(I.shape[1], 2*C.shape[0]*C.shape[1]*FLOAT_BYTES, max_bytes):
+        F[:,t] = np.sum((C @ I[:,t])*I[np.newaxis,:,t], axis=1)
+    return F
+
+def _ampere3d_coefficients(XS, XE, YS, YE, ZS, ZE, R, Ph, NF, NA, max_bytes = None, backend = None, workers = None, rows = None, cols = None):
+    # rows, cols restrict the pairs to pushed segments rows and pushing segments cols (NumPy kernels only)
+    kernels = _compiled_kernels(backend) if rows is None and cols is None else None
+    if kernels is not None:
+        return list(kernels.ampere3d_coefficients(_points(XS, YS, ZS), _points(XE, YE, ZE), R.astype(float), 
+                                                  NA, np.argmax(Ph, axis=1), NF.astype(float), Ph.shape[1]))
+    # C[m,p,q] = sum of f(i,j) over segments i of mask m on phase p and segments j outside the mask on phase q,
+    # parallel segments along a push each other along the other two axes, 
+    # segment along a1 is pushed by crossed segment along a2 in the a2 direction
+    arrays = dict(XS=XS, XE=XE, YS=YS, YE=YE, ZS=ZS, ZE=ZE, R=R, Ph=Ph, NF=NF)
+    max_bytes = _tile_bytes(max_bytes, workers)
+    groups = _axis_groups(NA)
+    tasks = [(a1, a2, G1[i], G2[j]) for a1, G1 in enumerate(_subset(groups, rows)) for a2, G2 in enumerate(_subset(groups, cols)) 
+                                     for (i, j) in _tiles2d(G1.size, G2.size, max_bytes)]
+    C = [np.zeros((NF.shape[0], Ph.shape[1], Ph.shape[1])) for _ in range(3)]
+    for parts in parallel.map_tiles(_ampere3d_tile, tasks, arrays, workers):
+        for (k, Ck) in parts:
+            C[k] += Ck
+    return C
+
+def _ampere3d_tile(arrays, task):
+    # (component, coefficients) of segments g1 along a1 pushed by segments g2 along a2
+    (a1, a2, g1, g2) = task
+    S = [arrays['XS'], arrays['YS'], arrays['ZS']]
+    E = [arrays['XE'], arrays['YE'], arrays['ZE']]
+    R = arrays['R']
+    Ph = arrays['Ph']
+    NF = arrays['NF']
+    W = np.transpose(NF[:,g1,np.newaxis]*Ph[np.newaxis,g1,:], (0,2,1))
+    V = (1-NF[:,g2,np.newaxis])*Ph[np.newaxis,g2,:]
+    if a1 == a2:
+        b = (a1+1)%3
+        c = (a1+2)%3
+        [fb, fc] = _ampere3d_parallel(
+            S[a1][np.newaxis,g2] - S[a1][g1,np.newaxis],
+            S[a1][np.newaxis,g2] - E[a1][g1,np.newaxis],
+            E[a1][np.newaxis,g2] - S[a1][g1,np.newaxis],
+            E[a1][np.newaxis,g2] - E[a1][g1,np.newaxis],
+            S[b][np.newaxis,g2] - S[b][g1,np.newaxis],
+            S[c][np.newaxis,g2] - S[c][g1,np.newaxis])
+        return [(b, W @ fb @ V), (c, W @ fc @ V)]
+    f = _ampere3d_crossed(
+        S[a1][np.newaxis,g2] - S[a1][g1,np.newaxis],
+        S[a1][np.newaxis,g2] - E[a1][g1,np.newaxis],
+        S[a2][np.newaxis,g2] - S[a2][g1,np.newaxis],
+        E[a2][np.newaxis,g2] - S[a2][g1,np.newaxis],
+        S[3-a1-a2][np.newaxis,g2] - S[3-a1-a2][g1,np.newaxis],
+        R[np.newaxis,g2])
+    return [(a2, W @ f @ V)]
+
+def _ampere3d_multipole(XS, XE, YS, YE, ZS, ZE, R, Ph, NF, NA, tolerance):
+    # Barnes-Hut coefficients: the tree sources carry (masks x phases) columns of currents outside the masks, 
+    # a mask segment is pushed by the far field averaged along it and by its near segments through the exact 
+    # closed forms; with the (masks x phases x phases) bound on the coefficient error
+    S = [XS, YS, ZS]
+    E = [XE, YE, ZE]
+    [m, P] = [NF.shape[0], Ph.shape[1]]
+    g = np.flatnonzero(NA>=0)
+    ph = np.argmax(Ph, axis=1)
+    W = np.reshape((1-NF[:,g]).T[:,:,np.newaxis]*Ph[g,np.newaxis,:], (g.size, m*P))
+    tree = multipole.Octree(_points(XS, YS, ZS)[:,g].T, _points(XE, YE, ZE)[:,g].T, W)
+    theta = multipole.opening_angle(tolerance)
     
-    ESxyz = ( ESx**2 + Syz**2 )**0.5
-    SSxyz = ( SSx**2 + Syz**2 )**0.5
-    EExyz = ( EEx**2 + Syz**2 )**0.5
-    SExyz = ( SEx**2 + Syz**2 )**0.5 
-    ESyzx = ( ESy**2 + Szx**2 )**0.5
-    SSyzx = ( SSy**2 + Szx**2 )**0.5 
-    EEyzx = ( EEy**2 + Szx**2 )**0.5
-    SEyzx = ( SEy**2 + Szx**2 )**0.5 
-    ESzxy = ( ESz**2 + Sxy**2 )**0.5
-    SSzxy = ( SSz**2 + Sxy**2 )**0.5
-    EEzxy = ( EEz**2 + Sxy**2 )**0.5
-    SEzxy = ( SEz**2 + Sxy**2 )**0.5 
+    # target segments belong to a mask
+    i = g[np.any(NF[:,g]!=0, axis=0)]
+    dl = (_points(XE, YE, ZE) - _points(XS, YS, ZS)).T[i]
+    L = np.linalg.norm(dl, axis=1)
+    u = np.divide(dl, L[:,np.newaxis], out=np.zeros_like(dl), where=L[:,np.newaxis]>0)
+    midpoints = (_points(XS, YS, ZS) + _points(XE, YE, ZE)).T[i]/2
     
-    condX = (L1x!=0)*(L2x!=0)*(L1y==0)*(L2y==0)*(L1z==0)*(L2z==0)#параллельные сегменты вдоль X  
-    condY = (L1x==0)*(L2x==0)*(L1y!=0)*(L2y!=0)*(L1z==0)*(L2z==0)#параллельные сегменты вдоль Y  
-    condZ = (L1x==0)*(L2x==0)*(L1y==0)*(L2y==0)*(L1z!=0)*(L2z!=0)#параллельные сегменты вдоль Z
+    G = np.zeros((i.size, m*P, 3))
+    bound = np.zeros((i.size, m*P))
+    for p in _tiles(i.size, 1, multipole.TARGET_BLOCK):
+        [far_t, far_n, near_t, near_j] = tree.interactions(midpoints[p], L[p]/2, theta)
+        [B, bk] = tree.far_field(midpoints[p], u[p], L[p]/2, far_t, far_n)
+        G[p] += np.cross(dl[p,np.newaxis,:], B)
+        bound[p] = bk*L[p,np.newaxis]
+        t = near_t + p.start
+        [i1, i2] = [i[t], g[near_j]]
+        F = np.zeros((t.size, 3))
+        for a1 in range(3):
+            for a2 in range(3):
+                s = (NA[i1]==a1) & (NA[i2]==a2)
+                [j1, j2] = [i1[s], i2[s]]
+                if a1 == a2:
+                    b = (a1+1)%3
+                    c = (a1+2)%3
+                    [F[s,b], F[s,c]] = _ampere3d_parallel(
+                        S[a1][j2] - S[a1][j1], S[a1][j2] - E[a1][j1], E[a1][j2] - S[a1][j1], E[a1][j2] - E[a1][j1],
+                        S[b][j2] - S[b][j1], S[c][j2] - S[c][j1])
+                else:
+                    F[s,a2] = _ampere3d_crossed(
+                        S[a1][j2] - S[a1][j1], S[a1][j2] - E[a1][j1], S[a2][j2] - S[a2][j1], E[a2][j2] - S[a2][j1],
+                        S[3-a1-a2][j2] - S[3-a1-a2][j1], R[j2])
+        for mm in range(m):
+            w = 1 - NF[mm,i2]
+            for k in range(3):
+                Gk = np.bincount(t*P + ph[i2], F[:,k]*w, minlength=i.size*P)
+                G[:,mm*P:(mm+1)*P,k] += np.reshape(Gk, (i.size, P))
     
-    Self = 2*1e-7*( L*log( 2*L/R ) - L*1 )
-    Self[np.isinf(Self)]=0
-    Self[np.isnan(Self)]=0
+    # C[k,m,p,q] sums the pushes of the mask segments on phase p from column (m, q)
+    C = np.einsum('mi,ip,imqk->kmpq', NF[:,i], Ph[i], np.reshape(G, (i.size, m, P, 3)))
+    Cerr = np.einsum('mi,ip,imq->mpq', np.abs(NF[:,i]), Ph[i], np.reshape(bound, (i.size, m, P)))
+    return [C[0], C[1], C[2], Cerr]
+
+def _ampere3d_parallel(SSa, ESa, SEa, EEa, SSb, SSc):
+    # segments along the same axis a: axial offsets of start/end points and transverse offsets along b, c, 
+    # collinear segments do not push each other
+    rr = SSb**2 + SSc**2
+    D = ( SEa**2 + rr )**(1/2) - ( SSa**2 + rr )**(1/2) + ( ESa**2 + rr )**(1/2) - ( EEa**2 + rr )**(1/2)
+    D = np.divide(1e-7*D, rr, out=np.zeros_like(rr), where=rr>0)
+    return D*SSb, D*SSc
+
+def _ampere3d_crossed(SSa1, ESa1, SSa2, SEa2, SSc, r):
+    # first segment along a1, second along a2, offsets between their start/end points along a1, a2 and
+    # the third axis c (the ones not listed are equal: SEa1 = SSa1, EEa1 = ESa1, ESa2 = SSa2, EEa2 = SEa2)
+    SS = ( SSa1**2 + SSa2**2 + SSc**2 )**(1/2)
+    ES = ( ESa1**2 + SSa2**2 + SSc**2 )**(1/2)
+    SE = ( SSa1**2 + SEa2**2 + SSc**2 )**(1/2)
+    EE = ( ESa1**2 + SEa2**2 + SSc**2 )**(1/2)
+    f = _log(caf(SS, SSa2, r)) - _log(caf(ES, SSa2, r)) - _log(caf(SE, SEa2, r)) + _log(caf(EE, SEa2, r))
+    return 1e-7*f
+
+def _log(A):
+    # log of distances, zero radius gives no singular contribution instead of infinity
+    return log(A, out=np.zeros_like(A), where=A>0)
+
+def neumann3d(geometry : Geometry, excitation: Excitation, max_bytes = None, cache = kernel_cache, backend = None, workers = None):
+    with profiling.stage('neumann3d', lambda: _sizes(geometry, excitation)):
+        kernel = _neumann3d_kernel(geometry, geometry.NL.shape[0], max_bytes, cache, backend, workers)
+        [L, M] = _neumann3d(
+            excitation.K,
+            geometry.XS, 
+            geometry.XE, 
+            geometry.YS, 
+            geometry.YE, 
+            geometry.ZS,
+            geometry.ZE, 
+            geometry.R,
+            geometry.NP,
+            geometry.NL,
+            geometry.NA,
+            max_bytes,
+            cache,
+            ('neumann3d', geometry.getContentHash(NEUMANN_FIELDS)),
+            backend,
+            workers,
+            kernel
+            )
+    return Inductances(L, M)
+
+def _neumann3d(K, XS, XE, YS, YE, ZS, ZE, R, N3ph, NL, NA, max_bytes = None, cache = None, key = None, backend = None, workers = None, kernel = None):
     
-       
-    mutualx = +np.sign(k1*k2)*1* 1e-7*condX*( + ESx*log( ESx + ESxyz ) - ESxyz
-                                            - SSx*log( SSx + SSxyz ) + SSxyz
-                                            - EEx*log( EEx + EExyz ) + EExyz
-                                            + SEx*log( SEx + SExyz ) - SExyz )
-                                
-    mutualy = +np.sign(k1*k2)*1*  1e-7* condY*( + ESy*log( ESy + ESyzx ) - ESyzx
-                                            - SSy*log( SSy + SSyzx ) + SSyzx
-                                            - EEy*log( EEy + EEyzx ) + EEyzx
-                                            + SEy*log( SEy + SEyzx ) - SEyzx ) 
-                                
-    mutualz = +np.sign(k1*k2)*1*  1e-7*condZ*(  + ESz*log( ESz + ESzxy ) - ESzxy
-                                                - SSz*log( SSz + SSzxy ) + SSzxy
-                                                - EEz*log( EEz + EEzxy ) + EEzxy
-                                                + SEz*log( SEz + SEzxy ) - SEzxy ) 
-
-
-    mutualx[np.isnan(mutualx)]=0
-    mutualx[np.isinf(mutualx)]=0
-    fill_diagonal(mutualx, 0)
-    mutualy[np.isnan(mutualy)]=0
-    mutualy[np.isinf(mutualy)]=0
-    fill_diagonal(mutualy, 0)
-    mutualz[np.isnan(mutualz)]=0
-    mutualz[np.isinf(mutualz)]=0
-    fill_diagonal(mutualz, 0)
+    # mutual inductances reduced to phase pairs, the sign of the pair is applied after reduction
+    Ph = _phase_matrix(N3ph, NL.shape[0])
+    [Self, Mutual] = kernel if kernel is not None else _fetch(cache, key and key + (NL.shape[0],),
+        lambda: _neumann3d_phase(XS, XE, YS, YE, ZS, ZE, R, Ph, NA, max_bytes, backend, workers))
     
-    Mutual = np.sum(mutualx+mutualy+mutualz, axis=1)
+    k = np.sign(K[:,0])
     
-    Inductance = Mutual + Self
+    L = Self + np.sum(k[:,np.newaxis]*k[np.newaxis,:]*Mutual, axis=1)
     
-    LS = np.sum((Self*NL), axis=1)
+    return L, np.diag(Self) + Mutual
+
+def _neumann3d_phase(XS, XE, YS, YE, ZS, ZE, R, Ph, NA, max_bytes = None, backend = None, workers = None, rows = None, cols = None):
+    # rows, cols restrict the pairs (NumPy kernels only), a self term is the pair of a segment with itself
+    L = ( (XE-XS)**2 + (YE-YS)**2 + (ZE-ZS)**2 )**(1/2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Self = np.where((L>0)*(R>0), 2*1e-7*( L*log( 2*L/R ) - L*1 ), 0)
+    for indices in (rows, cols):
+        if indices is not None:
+            Self = np.where(np.isin(np.arange(Self.size), indices), Self, 0)
     
-    L = np.sum((Inductance*NL), axis=1)
+    kernels = _compiled_kernels(backend) if rows is None and cols is None else None
+    if kernels is not None:
+        return Ph.T @ Self, kernels.neumann3d_mutual(_points(XS, YS, ZS), _points(XE, YE, ZE), NA, np.argmax(Ph, axis=1), Ph.shape[1])
     
-    return L
+    # only parallel segments are coupled, a segment has no mutual term with itself (singular closed form)
+    arrays = dict(XS=XS, XE=XE, YS=YS, YE=YE, ZS=ZS, ZE=ZE, Ph=Ph)
+    max_bytes = _tile_bytes(max_bytes, workers)
+    groups = _axis_groups(NA)
+    tasks = [(a, G1[i], G2[j]) for a, (G1, G2) in enumerate(zip(_subset(groups, rows), _subset(groups, cols))) 
+                               for (i, j) in _tiles2d(G1.size, G2.size, max_bytes)]
+    Mutual = np.zeros((Ph.shape[1], Ph.shape[1]))
+    for M in parallel.map_tiles(_neumann3d_tile, tasks, arrays, workers):
+        Mutual += M
     
-    
\ No newline at end of file
+    return Ph.T @ Self, Mutual
+
+def _neumann3d_tile(arrays, task):
+    # mutual terms of segments g1 and g2 along axis a summed over phase pairs
+    (a, g1, g2) = task
+    b = (a+1)%3
+    c = (a+2)%3
+    S = [arrays['XS'], arrays['YS'], arrays['ZS']]
+    E = [arrays['XE'], arrays['YE'], arrays['ZE']]
+    Ph = arrays['Ph']
+    M = _neumann3d_parallel(
+        S[a][np.newaxis,g2] - S[a][g1,np.newaxis],
+        S[a][np.newaxis,g2] - E[a][g1,np.newaxis],
+        E[a][np.newaxis,g2] - S[a][g1,np.newaxis],
+        E[a][np.newaxis,g2] - E[a][g1,np.newaxis],
+        S[b][np.newaxis,g2] - S[b][g1,np.newaxis],
+        S[c][np.newaxis,g2] - S[c][g1,np.newaxis])
+    return Ph[g1].T @ M @ Ph[g2]
+
+def _neumann3d_parallel(SSa, ESa, SEa, EEa, SSb, SSc):
+    # segments along the same axis a, collinear segments are coupled only when the second one 
+    # lies entirely ahead of the first one (otherwise the closed form is singular and taken as zero)
+    rr = SSb**2 + SSc**2
+    valid = (rr>0) | ( (SSa>0)*(ESa>0)*(SEa>0)*(EEa>0) )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ES = ( ESa**2 + rr )**0.5
+        SS = ( SSa**2 + rr )**0.5
+        EE = ( EEa**2 + rr )**0.5
+        SE = ( SEa**2 + rr )**0.5
+        M = 1e-7*( + ESa*log( ESa + ES ) - ES
+                   - SSa*log( SSa + SS ) + SS
+                   - EEa*log( EEa + EE ) + EE
+                   + SEa*log( SEa + SE ) - SE )
+    return np.where(valid, M, 0)
@@ -1,13 +1,9 @@
 
 import logic.geometry as geometry
 import logic.excitation as excitation
-import logic.presentation as presentation
 import logic.solution as solution
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings("ignore")
-mpl.rcParams['axes3d.mouserotationstyle'] = 'trackball' # , 'trackball', 'azel', 'sphere', or 'arcball'
 
 T = 20.0
 N  = 201
@@ -17,6 +13,7 @@ I  = 80.0
 current_type    = "peak"   # "rms" 
 excitation_type = "rlc" # "gen"        
 schema          = "ABC"
+plot            = True     # False prints the peaks without loading matplotlib
 
 conductors = []
 conductors.append( geometry.Conductor(
@@ -56,17 +53,29 @@ current = excitation.build(T, N, I, source_type = excitation_type, current=curre
 
 inductances = solution.evalBranchCurrents(geom, current, peakPhaseNumber = 1 , asymK_override = None)
 
-figure = plt.figure()
-grid = plt.GridSpec(nrows = 2, ncols = 4 , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
-
-ax = plt.subplot(grid[:,0:2], projection='3d')
-presentation.plotGeometry(geom, ax)
-axi = plt.subplot(grid[:,3])
-presentation.plotCurrent(current, axi, figure)
-axu = plt.subplot(grid[0,2])
-presentation.plotVoltagePhase(current, axu, figure)
-axul = plt.subplot(grid[1,2])
-presentation.plotVoltageLinear(current, axul, figure)
-      
 results = solution.solve(geom, current)  
-presentation.plotResults(results, block = True) 
+
+if plot:
+    import logic.presentation as presentation
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    mpl.rcParams['axes3d.mouserotationstyle'] = 'trackball' # , 'trackball', 'azel', 'sphere', or 'arcball'
+    
+    figure = plt.figure()
+    grid = plt.GridSpec(nrows = 2, ncols = 4 , wspace=0.3, hspace=0.2, left=0.05, right=0.95, top=0.95, bottom = 0.05)
+    
+    ax = plt.subplot(grid[:,0:2], projection='3d')
+    presentation.plotGeometry(geom, ax)
+    axi = plt.subplot(grid[:,3])
+    presentation.plotCurrent(current, axi, figure)
+    axu = plt.subplot(grid[0,2])
+    presentation.plotVoltagePhase(current, axu, figure)
+    axul = plt.subplot(grid[1,2])
+    presentation.plotVoltageLinear(current, axul, figure)
+          
+    presentation.plotResults(results, block = True)
+else:
+    peaks = solution.evalPeaks(results)
+    print("L [mkH]:", inductances.L*1e6)
+    print("peak forces [N], Fx:", peaks.Fx, "Fy:", peaks.Fy, "Fz:", peaks.Fz)
+    print("peak fields [mT]:", peaks.B*1000) 